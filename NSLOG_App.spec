@@ -1,19 +1,38 @@
 # -*- mode: python ; coding: utf-8 -*-
+import importlib.util
+import py_compile
 from PyInstaller.utils.hooks import collect_all
 from PyInstaller.utils.hooks import copy_metadata
 
+# Nível de otimização do bytecode (1 = remove asserts, mantém docstrings), no pacote e em tempo de execução.
+OPTIMIZE = 1
+
+# Módulos do aplicativo: vão como arquivos ao lado do app.py, que o Streamlit executa a partir do disco.
+APP_MODULES = ['config.py', 'database.py', 'schema.py', 'query_cache.py', 'importer.py', 'exporter.py', 'maintenance.py', 'metrics.py', 'writer.py', 'sync.py', 'backup.py']
+
 datas = [('app.py', '.'), ('logoNslog.png', '.'), ('uniforms.db', '.'), ('.streamlit', './.streamlit')]
+datas += [(module, '.') for module in APP_MODULES]
+# Bytecode pré-compilado dos módulos do app (hash não verificado: a pasta de instalação pode ser
+# somente leitura e o código não muda depois do build, então nada é recompilado ao abrir).
+for module in APP_MODULES:
+    pyc = py_compile.compile(module, cfile=importlib.util.cache_from_source(module, optimization=OPTIMIZE),
+                             optimize=OPTIMIZE, invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+                             doraise=True)
+    datas.append((pyc, '__pycache__'))
 binaries = []
-hiddenimports = ['pkg_resources.py2_warn', 'importlib_resources', 'watchfiles.cli']
+# O app.py só é lido em tempo de execução; as bibliotecas que ele usa precisam ser declaradas.
+hiddenimports = ['pkg_resources.py2_warn', 'importlib_resources', 'pandas', 'pyarrow.parquet', 'openpyxl']
 datas += copy_metadata('streamlit')
 datas += copy_metadata('pandas')
 datas += copy_metadata('numpy')
-tmp_ret = collect_all('streamlit')
+# Sem os fontes .py do Streamlit (já vão compilados no PYZ) e sem os subpacotes de demonstração e de testes.
+tmp_ret = collect_all('streamlit', include_py_files=False,
+                      filter_submodules=lambda name: not name.startswith(('streamlit.hello', 'streamlit.testing')))
 datas += tmp_ret[0]; binaries += tmp_ret[1]; hiddenimports += tmp_ret[2]
 
 
 a = Analysis(
-    ['venv\\Scripts\\streamlit.exe'],
+    ['run_app.py'],
     pathex=[],
     binaries=binaries,
     datas=datas,
@@ -21,16 +40,18 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # O Streamlit só usa o GitPython para mostrar dados do repositório; o watchdog não é usado
+    # com server.fileWatcherType = none. O resto são dependências opcionais que nunca carregamos.
+    excludes=['git', 'gitdb', 'watchdog', 'tkinter', 'matplotlib', 'IPython', 'notebook', 'pytest', 'scipy'],
     noarchive=False,
-    optimize=0,
+    optimize=OPTIMIZE,
 )
 pyz = PYZ(a.pure)
 
 exe = EXE(
     pyz,
     a.scripts,
-    [],
+    [('O', None, 'OPTION')],  # mesmo nível de OPTIMIZE, para casar com os .opt-1.pyc acima
     exclude_binaries=True,
     name='NSLOG_App',
     debug=False,
@@ -0,0 +1,357 @@
+"""
+API HTTP (JSON) para leitores de código de barras, ERP e outras integrações.
+
+Roda ao lado da interface Streamlit, sobre a mesma camada de dados (database.py)
+e o mesmo arquivo de banco. As chamadas ao SQLite rodam em um pool de threads
+para não bloquear o loop do Tornado, e as gravações passam pela fila única de
+escrita, que agrupa os pedidos simultâneos em um só COMMIT.
+
+    python api.py [--port 8600] [--address 127.0.0.1] [--db uniforms.db]
+
+Por padrão a API só atende na própria máquina. Para ouvir na rede (--address
+0.0.0.0 ou o IP da máquina) é preciso definir API_TOKEN em config.py.
+
+Endpoints (`location` é o nome do local de estoque; sem ele, vale o local padrão
+nas gravações e o total de todos os locais nas leituras):
+    GET  /api/health
+    GET  /api/locations          (locais com itens e unidades em estoque)
+    GET  /api/items?type=&size=&model=&color=&min_quantity=&max_quantity=&sort=&desc=&after=&limit=&location=
+    POST /api/items              {"type": "Masculino", "size": "M", "model": "Polo", "color": "Azul",
+                                  "quantity": 10, "sku": "7891234567895", "location": "..."}
+                                 (soma ao item existente)
+    GET  /api/items/search?q=&limit=
+    GET  /api/items/sku/<sku>
+    GET  /api/items/<id>
+    GET  /api/items/<id>/balances
+    GET  /api/items/<id>/movements?limit=
+    GET  /api/balances?ids=1,2,3&location=
+    GET  /api/reorder?after=&limit=   (itens no ponto de reposição, com a compra sugerida)
+    POST /api/movements          {"item_id": 1, "type": "Entrada", "quantity": 5, "actor": "leitor-01",
+                                  "location": "..."}
+    POST /api/movements/batch    {"lines": [{"item_id": 1, "type": "Saída", "quantity": 2}], "actor": "erp",
+                                  "location": "..."}
+    POST /api/transfers          {"item_id": 1, "quantity": 3, "from": "...", "to": "...", "actor": "..."}
+    GET  /metrics                (texto no formato Prometheus)
+"""
+import argparse
+import ipaddress
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import tornado.ioloop
+import tornado.web
+
+import database
+import metrics
+from config import API_PORT, API_TOKEN, API_WORKERS, DB_NAME
+from writer import WriteQueueFullError
+
+MAX_PAGE_SIZE = 500
+
+def item_to_json(uniform):
+    return uniform._asdict()
+
+class APIError(tornado.web.HTTPError):
+    """Erro com resposta JSON: {"error": mensagem, ...campos extras}."""
+    def __init__(self, status_code, message, **extra):
+        super().__init__(status_code)
+        self.payload = {"error": message, **extra}
+
+def translate_error(error):
+    """Converte os erros da camada de dados no APIError correspondente (ou None)."""
+    if isinstance(error, database.UniformNotFoundError):
+        return APIError(404, str(error))
+    if isinstance(error, database.BatchValidationError):
+        return APIError(409, str(error), problems=[
+            {"line": index, "item_id": uniform_id, "message": message}
+            for index, uniform_id, message in error.problems
+        ])
+    if isinstance(error, database.InsufficientStockError):
+        return APIError(409, str(error), available=error.available)
+    if isinstance(error, database.DuplicateUniformError):
+        return APIError(409, str(error), item_id=error.uniform_id)
+    if isinstance(error, (database.StockError, ValueError)):
+        return APIError(400, str(error))
+    if isinstance(error, WriteQueueFullError):
+        return APIError(503, str(error))
+    return None
+
+# --- Handlers ---
+
+class BaseHandler(tornado.web.RequestHandler):
+    def initialize(self, pool, executor):
+        self.pool = pool
+        self.executor = executor
+
+    def prepare(self):
+        if API_TOKEN and self.request.headers.get("X-API-Key") != API_TOKEN:
+            raise APIError(401, "X-API-Key ausente ou inválida.")
+
+    def set_default_headers(self):
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+
+    async def db(self, func, *args, **kwargs):
+        """Executa uma função de database.py no pool de threads, já com o pool de conexões."""
+        try:
+            return await tornado.ioloop.IOLoop.current().run_in_executor(
+                self.executor, lambda: func(*args, pool=self.pool, **kwargs)
+            )
+        except Exception as e:
+            error = translate_error(e)
+            if error is None:
+                raise
+            raise error from e
+
+    def json_body(self):
+        try:
+            body = json.loads(self.request.body or b"{}")
+        except ValueError:
+            raise APIError(400, "Corpo da requisição não é um JSON válido.") from None
+        if not isinstance(body, dict):
+            raise APIError(400, "O corpo da requisição deve ser um objeto JSON.")
+        return body
+
+    def int_argument(self, name, default=None, minimum=None, maximum=None):
+        value = self.get_query_argument(name, None)
+        if value is None or value == "":
+            return default
+        try:
+            value = int(value)
+        except ValueError:
+            raise APIError(400, f"Parâmetro '{name}' deve ser inteiro.") from None
+        if minimum is not None:
+            value = max(minimum, value)
+        if maximum is not None:
+            value = min(maximum, value)
+        return value
+
+    def cursor_argument(self, name="after"):
+        """Cursor de paginação por chave: o next_cursor (par em JSON) devolvido pela página anterior."""
+        value = self.get_query_argument(name, None)
+        try:
+            cursor = tuple(json.loads(value)) if value else None
+            if cursor is not None and len(cursor) != 2:
+                raise ValueError
+        except (TypeError, ValueError):
+            raise APIError(400, f"Parâmetro '{name}' deve ser o next_cursor de uma página anterior.") from None
+        return cursor
+
+    def write_json(self, payload, status=200):
+        self.set_status(status)
+        self.finish(json.dumps(payload, ensure_ascii=False))
+
+    def write_error(self, status_code, **kwargs):
+        error = kwargs.get("exc_info", (None, None, None))[1]
+        payload = getattr(error, "payload", None) or {"error": self._reason}
+        self.finish(json.dumps(payload, ensure_ascii=False))
+
+    def log_exception(self, typ, value, tb):
+        if not isinstance(value, APIError):  # erros de negócio não poluem o log
+            super().log_exception(typ, value, tb)
+
+class HealthHandler(BaseHandler):
+    async def get(self):
+        self.write_json({"status": "ok", "write_queue": self.pool.writer.pending() if self.pool.writer else 0})
+
+class LocationsHandler(BaseHandler):
+    async def get(self):
+        # Itens com saldo no local e unidades, lidos do resumo mantido pelo banco.
+        summary = {name: (items - zero_items, quantity)
+                   for _, name, items, quantity, zero_items, _ in await self.db(database.stock_summary,
+                                                                                 database.LOCATION)}
+        names = (await self.db(database.get_catalog)).names[database.LOCATION]
+        self.write_json({"locations": [
+            {"name": name, "items": summary.get(name, (0, 0))[0], "quantity": summary.get(name, (0, 0))[1]}
+            for name in names
+        ]})
+
+class ItemsHandler(BaseHandler):
+    async def get(self):
+        filters = {column: self.get_query_arguments(column) for column in ("type", "size", "model", "color")}
+        filters["min_quantity"] = self.int_argument("min_quantity")
+        filters["max_quantity"] = self.int_argument("max_quantity")
+        sort = self.get_query_argument("sort", "id")
+        descending = self.get_query_argument("desc", "0") in ("1", "true")
+        after = self.cursor_argument()
+        limit = self.int_argument("limit", 50, 1, MAX_PAGE_SIZE)
+        location = self.get_query_argument("location", None) or None
+        rows, next_cursor = await self.db(database.list_uniforms, filters, sort, descending, after, limit,
+                                          location)
+        total = await self.db(database.count_uniforms, filters, location)
+        self.write_json({
+            "items": [item_to_json(row) for row in rows],
+            "total": total,
+            "next_cursor": json.dumps(next_cursor, ensure_ascii=False) if next_cursor else None,
+        })
+
+    async def post(self):
+        body = self.json_body()
+        try:
+            attributes = [str(body[column]) for column in ("type", "size", "model", "color")]
+            quantity = int(body.get("quantity", 0))
+        except (KeyError, TypeError, ValueError):
+            raise APIError(400, "O item precisa de type, size, model e color, e quantity inteira.") from None
+        if quantity < 0:
+            raise APIError(400, "A quantidade não pode ser negativa.")
+        uniform_id, created = await self.db(
+            database.upsert_uniform, body.get("name") or "", *attributes, quantity, body.get("description") or "",
+            body.get("sku"), actor=body.get("actor"), location=body.get("location"),
+        )
+        row = await self.db(database.select_uniform_by_id, uniform_id)
+        self.write_json({"item": item_to_json(row), "created": created}, status=201 if created else 200)
+
+class SearchHandler(BaseHandler):
+    async def get(self):
+        text = self.get_query_argument("q", "")
+        limit = self.int_argument("limit", 20, 1, 100)
+        rows = await self.db(database.search_uniforms, text, limit)
+        self.write_json({"items": [item_to_json(row) for row in rows]})
+
+class ItemHandler(BaseHandler):
+    async def get(self, uniform_id):
+        row = await self.db(database.select_uniform_by_id, int(uniform_id))
+        if row is None:
+            raise APIError(404, f"Item {uniform_id} não encontrado.")
+        self.write_json(item_to_json(row))
+
+class ItemBySkuHandler(BaseHandler):
+    async def get(self, sku):
+        row = await self.db(database.select_uniform_by_sku, sku)
+        if row is None:
+            raise APIError(404, f"Nenhum item com o SKU '{sku}'.")
+        self.write_json(item_to_json(row))
+
+class ItemBalancesHandler(BaseHandler):
+    async def get(self, uniform_id):
+        row = await self.db(database.select_uniform_by_id, int(uniform_id))
+        if row is None:
+            raise APIError(404, f"Item {uniform_id} não encontrado.")
+        balances = await self.db(database.select_item_balances, int(uniform_id))
+        self.write_json({"item_id": row.id, "quantity": row.quantity, "balances": dict(balances)})
+
+class ItemMovementsHandler(BaseHandler):
+    async def get(self, uniform_id):
+        limit = self.int_argument("limit", 20, 1, 500)
+        rows = await self.db(database.select_movements, int(uniform_id), limit)
+        fields = ("id", "item_id", "delta", "type", "created_at", "actor", "location")
+        self.write_json({"movements": [dict(zip(fields, row)) for row in rows]})
+
+class BalancesHandler(BaseHandler):
+    async def get(self):
+        raw = self.get_query_argument("ids", "")
+        try:
+            ids = [int(value) for value in raw.split(",") if value.strip()]
+        except ValueError:
+            raise APIError(400, "Parâmetro 'ids' deve ser uma lista de inteiros separados por vírgula.") from None
+        balances = await self.db(database.select_balances, ids, self.get_query_argument("location", None) or None)
+        self.write_json({"balances": {str(uniform_id): quantity for uniform_id, quantity in balances.items()}})
+
+class ReorderHandler(BaseHandler):
+    async def get(self):
+        after = self.cursor_argument()
+        limit = self.int_argument("limit", 100, 1, MAX_PAGE_SIZE)
+        alerts, next_cursor = await self.db(database.reorder_alerts, after, limit)
+        total = await self.db(database.count_reorder_alerts)
+        self.write_json({
+            "items": [{**item_to_json(alert.uniform), "outflow": alert.outflow, "suggested": alert.suggested,
+                       "critical": alert.critical} for alert in alerts],
+            "total": total,
+            "next_cursor": json.dumps(next_cursor) if next_cursor else None,
+        })
+
+def parse_line(line):
+    """Valida uma linha {"item_id", "type", "quantity"} e retorna (uniform_id, tipo, quantidade)."""
+    try:
+        uniform_id, movement_type, quantity = int(line["item_id"]), line["type"], int(line["quantity"])
+    except (KeyError, TypeError, ValueError):
+        raise APIError(400, "Cada movimentação precisa de item_id, type e quantity inteiros.") from None
+    if movement_type not in (database.MOVEMENT_IN, database.MOVEMENT_OUT):
+        raise APIError(400, f"Tipo de movimentação inválido: {movement_type}")
+    return uniform_id, movement_type, quantity
+
+class MovementHandler(BaseHandler):
+    async def post(self):
+        body = self.json_body()
+        uniform_id, movement_type, quantity = parse_line(body)
+        balance = await self.db(database.move_stock, uniform_id, movement_type, quantity,
+                                actor=body.get("actor"), location=body.get("location"))
+        self.write_json({"item_id": uniform_id, "balance": balance})
+
+class MovementBatchHandler(BaseHandler):
+    async def post(self):
+        body = self.json_body()
+        lines = [parse_line(line) for line in body.get("lines") or []]
+        if not lines:
+            raise APIError(400, "O lote precisa de pelo menos uma linha.")
+        balances = await self.db(database.move_stock_batch, lines, actor=body.get("actor"),
+                                 location=body.get("location"))
+        self.write_json({"balances": {str(uniform_id): quantity for uniform_id, quantity in balances.items()}})
+
+class TransferHandler(BaseHandler):
+    async def post(self):
+        body = self.json_body()
+        try:
+            uniform_id, quantity = int(body["item_id"]), int(body["quantity"])
+            source, target = str(body["from"]), str(body["to"])
+        except (KeyError, TypeError, ValueError):
+            raise APIError(400, "A transferência precisa de item_id e quantity inteiros, from e to.") from None
+        balances = await self.db(database.transfer_stock, uniform_id, quantity, source, target,
+                                 actor=body.get("actor"))
+        self.write_json({"item_id": uniform_id, "balances": dict(zip((source, target), balances))})
+
+class MetricsHandler(BaseHandler):
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.finish(metrics.REGISTRY.render_text())
+
+# --- Aplicação ---
+
+def make_app(pool, executor=None):
+    """Cria a aplicação Tornado sobre o pool de conexões informado."""
+    executor = executor or ThreadPoolExecutor(max_workers=API_WORKERS, thread_name_prefix="api-db")
+    args = {"pool": pool, "executor": executor}
+    return tornado.web.Application([
+        (r"/api/health", HealthHandler, args),
+        (r"/api/locations", LocationsHandler, args),
+        (r"/api/items", ItemsHandler, args),
+        (r"/api/items/search", SearchHandler, args),
+        (r"/api/items/sku/([^/]+)", ItemBySkuHandler, args),
+        (r"/api/items/(\d+)", ItemHandler, args),
+        (r"/api/items/(\d+)/balances", ItemBalancesHandler, args),
+        (r"/api/items/(\d+)/movements", ItemMovementsHandler, args),
+        (r"/api/balances", BalancesHandler, args),
+        (r"/api/reorder", ReorderHandler, args),
+        (r"/api/movements", MovementHandler, args),
+        (r"/api/movements/batch", MovementBatchHandler, args),
+        (r"/api/transfers", TransferHandler, args),
+        (r"/metrics", MetricsHandler, args),
+    ])
+
+def is_loopback(address):
+    """Indica se o endereço de escuta só aceita conexões da própria máquina."""
+    if address == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(address).is_loopback
+    except ValueError:
+        return False  # nome de máquina: pode ser alcançado pela rede
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API HTTP do controle de estoque.")
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--address", default="127.0.0.1",
+                        help="Endereço de escuta (padrão: só a própria máquina; na rede exige API_TOKEN)")
+    parser.add_argument("--db", default=DB_NAME, help="Arquivo do banco SQLite")
+    args = parser.parse_args(argv)
+    if not API_TOKEN and not is_loopback(args.address):
+        parser.error(f"sem API_TOKEN (config.py) a API não pode ouvir em {args.address}: "
+                     "as gravações e /metrics ficariam abertas para a rede.")
+
+    app = make_app(database.get_pool(args.db))
+    # Conexões keep-alive ociosas são mantidas por até 5 minutos (leitores reutilizam a conexão).
+    app.listen(args.port, address=args.address, idle_connection_timeout=300, xheaders=True)
+    print(f"API do estoque ouvindo em http://{args.address}:{args.port}/api/")
+    tornado.ioloop.IOLoop.current().start()
+
+if __name__ == "__main__":
+    main()
@@ -1,157 +1,255 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import sqlite3
-import pandas as pd
-import os # Para garantir o caminho do DB
+import tempfile
+from datetime import date, datetime
 
-# --- Configurações e Constantes ---
-DB_NAME = 'uniforms.db'
+import database
+import exporter
+import metrics
+from config import AUTO_MAINTENANCE, DB_NAME, LOW_STOCK_THRESHOLD, REORDER_COVER_DAYS, REORDER_LOOKBACK_DAYS
 
-UNIFORM_TYPES = ["Masculino", "Feminino"]
-SIZES = ["PP", "P", "M", "G", "GG", "XG", "XXG", "37","38","39","40","41","42","43","44","45"]
-MODELS = ["Polo", "Camiseta básica", "Calçado", "Luva Vaqueta", "Luva"]
-COLORS = ["Branca", "Preta", "Azul", "Vermelha", "Amarela", "Cinza", "Verde", "Roxa", "Laranja"]
+# pandas (e o importer, que depende dele) é importado dentro das páginas que
+# montam tabelas: a página inicial não precisa dele e abre bem mais rápido.
 
 # --- Funções de Banco de Dados (SQLite) ---
+# O acesso ao banco fica em database.py; aqui apenas exibimos os erros na interface.
 
-def create_connection():
-    """Cria e retorna uma conexão com o banco de dados SQLite."""
-    conn = None
+@st.cache_resource
+def get_connection_pool():
+    """
+    Pool de conexões único do servidor, compartilhado por todas as sessões.
+    O esquema é migrado aqui, uma vez por processo, e não a cada rerun.
+    """
+    return database.get_pool(DB_NAME)
+
+def start_maintenance():
+    """
+    Com AUTO_MAINTENANCE, inicia as tarefas de manutenção vencidas (backup,
+    instantâneo, ANALYZE) em segundo plano; maintenance.py garante uma única
+    thread por processo, então pode ser chamada a cada rerun.
+    """
+    if AUTO_MAINTENANCE:
+        import maintenance  # fora do caminho de abertura do app
+        maintenance.start_background(get_connection_pool())
+
+def current_actor():
+    """Identifica a sessão do Streamlit que está fazendo a alteração (gravado no livro-razão)."""
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else None
+
+def catalog():
+    """Catálogos (tipo, tamanho, modelo, cor e locais) em memória, com os valores na ordem de exibição."""
     try:
-        conn = sqlite3.connect(DB_NAME)
-        conn.row_factory = sqlite3.Row # Para acessar colunas por nome
-        return conn
+        return database.get_catalog(pool=get_connection_pool())
     except sqlite3.Error as e:
-        st.error(f"Erro ao conectar ao banco de dados: {e}")
-    return conn
+        st.error(f"Erro ao carregar os catálogos: {e}")
+        return database.Catalog([])
 
-def create_table():
-    """Cria a tabela de itens se ela não existir."""
-    conn = create_connection()
-    if conn:
-        try:
-            cursor = conn.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS uniforms (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT,
-                    type TEXT NOT NULL,
-                    size TEXT NOT NULL,
-                    model TEXT NOT NULL,
-                    color TEXT NOT NULL,
-                    quantity INTEGER NOT NULL,
-                    description TEXT
-                )
-            """)
-            conn.commit()
-            st.success("Banco de dados e tabela inicializados com sucesso (se necessário)!")
-        except sqlite3.Error as e:
-            st.error(f"Erro ao criar tabela: {e}")
-        finally:
-            conn.close()
-
-def insert_uniform(name, uniform_type, size, model, color, quantity, description):
-    """Insere um novo itens no banco de dados."""
-    conn = create_connection()
-    if conn:
-        try:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO uniforms (name, type, size, model, color, quantity, description)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (name, uniform_type, size, model, color, quantity, description))
-            conn.commit()
-            return True
-        except sqlite3.Error as e:
-            st.error(f"Erro ao cadastrar itens: {e}")
-            return False
-        finally:
-            conn.close()
+def upsert_uniform(name, uniform_type, size, model, color, quantity, description, sku, location):
+    """
+    Cadastra um itens ou soma a quantidade ao itens já existente com os mesmos
+    atributos. Retorna (ID, criado?) ou None em caso de erro.
+    """
+    try:
+        return database.upsert_uniform(name, uniform_type, size, model, color, quantity, description, sku,
+                                       actor=current_actor(), location=location, pool=get_connection_pool())
+    except (database.CatalogValueError, database.DuplicateUniformError) as e:
+        st.error(str(e))
+        return None
+    except sqlite3.Error as e:
+        st.error(f"Erro ao cadastrar itens: {e}")
+        return None
 
 def select_all_uniforms():
     """Retorna todos os itens cadastrados."""
-    conn = create_connection()
-    uniforms = []
-    if conn:
-        try:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM uniforms")
-            uniforms = cursor.fetchall()
-            uniforms = [tuple(row) for row in uniforms] # Convert Row objects to tuples
-        except sqlite3.Error as e:
-            st.error(f"Erro ao buscar itens: {e}")
-        finally:
-            conn.close()
-    return uniforms
+    try:
+        return database.select_all_uniforms(pool=get_connection_pool())
+    except sqlite3.Error as e:
+        st.error(f"Erro ao buscar itens: {e}")
+        return []
+
+def list_uniforms(filters, sort, descending, after, limit, location=None):
+    """Retorna uma página de itens (do local, se informado) e o cursor da próxima página."""
+    try:
+        return database.list_uniforms(filters, sort, descending, after, limit, location,
+                                      pool=get_connection_pool())
+    except sqlite3.Error as e:
+        st.error(f"Erro ao buscar itens: {e}")
+        return [], None
+
+def count_uniforms(filters, location=None):
+    """Retorna quantos itens atendem aos filtros."""
+    try:
+        return database.count_uniforms(filters, location, pool=get_connection_pool())
+    except sqlite3.Error as e:
+        st.error(f"Erro ao contar itens: {e}")
+        return 0
+
+def search_uniforms(text, limit):
+    """Busca itens por texto ou ID, retornando os mais relevantes."""
+    try:
+        return database.search_uniforms(text, limit, pool=get_connection_pool())
+    except sqlite3.Error as e:
+        st.error(f"Erro ao buscar itens: {e}")
+        return []
 
 def select_uniform_by_id(uniform_id):
     """Retorna um itens pelo seu ID."""
-    conn = create_connection()
-    uniform = None
-    if conn:
-        try:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM uniforms WHERE id = ?", (uniform_id,))
-            uniform = cursor.fetchone()
-            if uniform:
-                uniform = tuple(uniform) # Convert Row object to tuple
-        except sqlite3.Error as e:
-            st.error(f"Erro ao buscar itens por ID: {e}")
-        finally:
-            conn.close()
-    return uniform
-
-def update_uniform(uniform_id, name, uniform_type, size, model, color, description):
-    """Atualiza os atributos de um itens (exceto a quantidade)."""
-    conn = create_connection()
-    if conn:
-        try:
-            cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE uniforms
-                SET name = ?, type = ?, size = ?, model = ?, color = ?, description = ?
-                WHERE id = ?
-            """, (name, uniform_type, size, model, color, description, uniform_id))
-            conn.commit()
-            return True
-        except sqlite3.Error as e:
-            st.error(f"Erro ao atualizar itens: {e}")
-            return False
-        finally:
-            conn.close()
-
-def update_uniform_quantity(uniform_id, new_quantity):
-    """Atualiza a quantidade em estoque de um itens."""
-    conn = create_connection()
-    if conn:
-        try:
-            cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE uniforms
-                SET quantity = ?
-                WHERE id = ?
-            """, (new_quantity, uniform_id))
-            conn.commit()
-            return True
-        except sqlite3.Error as e:
-            st.error(f"Erro ao atualizar quantidade do itens: {e}")
-            return False
-        finally:
-            conn.close()
+    try:
+        return database.select_uniform_by_id(uniform_id, pool=get_connection_pool())
+    except sqlite3.Error as e:
+        st.error(f"Erro ao buscar itens por ID: {e}")
+        return None
+
+def update_uniform(uniform_id, name, uniform_type, size, model, color, description, sku, levels=None):
+    """Atualiza os atributos de um itens (exceto a quantidade) e, com `levels`, os níveis de reposição."""
+    try:
+        database.update_uniform(uniform_id, name, uniform_type, size, model, color, description, sku, levels,
+                                pool=get_connection_pool())
+        return True
+    except (ValueError, database.DuplicateUniformError) as e:
+        st.error(str(e))
+        return False
+    except sqlite3.Error as e:
+        st.error(f"Erro ao atualizar itens: {e}")
+        return False
+
+def update_uniform_quantity(uniform_id, new_quantity, location=None):
+    """Atualiza a quantidade em estoque de um itens no local."""
+    try:
+        database.update_uniform_quantity(uniform_id, new_quantity, actor=current_actor(), location=location,
+                                         pool=get_connection_pool())
+        return True
+    except (database.StockError, database.CatalogValueError) as e:
+        st.error(str(e))
+        return False
+    except sqlite3.Error as e:
+        st.error(f"Erro ao atualizar quantidade do itens: {e}")
+        return False
+
+def move_stock(uniform_id, movement_type, quantity, location=None):
+    """Movimenta o estoque do local de forma atômica. Retorna o novo saldo no local ou None em caso de erro."""
+    try:
+        return database.move_stock(uniform_id, movement_type, quantity, actor=current_actor(), location=location,
+                                   pool=get_connection_pool())
+    except database.InsufficientStockError as e:
+        st.error(f"Não há estoque suficiente para a saída. Quantidade disponível: {e.available}")
+    except (database.StockError, database.CatalogValueError) as e:
+        st.error(str(e))
+    except sqlite3.Error as e:
+        st.error(f"Erro ao movimentar estoque: {e}")
+    return None
+
+def transfer_stock(uniform_id, quantity, from_location, to_location):
+    """Transfere entre dois locais em uma transação. Retorna (saldo na origem, no destino) ou None."""
+    try:
+        return database.transfer_stock(uniform_id, quantity, from_location, to_location, actor=current_actor(),
+                                       pool=get_connection_pool())
+    except database.InsufficientStockError as e:
+        st.error(f"Não há estoque suficiente na origem. Quantidade disponível: {e.available}")
+    except (database.StockError, ValueError) as e:
+        st.error(str(e))
+    except sqlite3.Error as e:
+        st.error(f"Erro ao transferir estoque: {e}")
+    return None
+
+def select_item_balances(uniform_id):
+    """Saldos do item em cada local."""
+    try:
+        return database.select_item_balances(uniform_id, pool=get_connection_pool())
+    except sqlite3.Error as e:
+        st.error(f"Erro ao buscar os saldos por local: {e}")
+        return []
+
+def select_balances(uniform_ids, location):
+    """Saldos dos itens informados no local."""
+    try:
+        return database.select_balances(uniform_ids, location, pool=get_connection_pool())
+    except sqlite3.Error as e:
+        st.error(f"Erro ao buscar os saldos: {e}")
+        return {}
+
+def move_stock_batch(lines, location=None):
+    """Aplica o lote inteiro em uma transação. Retorna {id: novo saldo} ou None em caso de erro."""
+    try:
+        return database.move_stock_batch(lines, actor=current_actor(), location=location,
+                                         pool=get_connection_pool())
+    except database.BatchValidationError as e:
+        st.error("Nenhuma movimentação foi aplicada. Corrija as linhas abaixo:")
+        for index, _, message in e.problems:
+            st.write(f"- Linha {index + 1}: {message}")
+    except sqlite3.Error as e:
+        st.error(f"Erro ao movimentar estoque: {e}")
+    return None
+
+def validate_stock_batch(lines, location=None):
+    """Confere o lote sem gravar. Retorna (saldos previstos, problemas)."""
+    try:
+        return database.validate_stock_batch(lines, location, pool=get_connection_pool())
+    except sqlite3.Error as e:
+        st.error(f"Erro ao validar o lote: {e}")
+        return {}, []
+
+def stock_summary(dimension=None):
+    """Resumo do estoque mantido pelo banco (sem varrer a tabela de itens)."""
+    try:
+        return database.stock_summary(dimension, pool=get_connection_pool())
+    except sqlite3.Error as e:
+        st.error(f"Erro ao buscar o resumo do estoque: {e}")
+        return []
+
+def select_movements(uniform_id, limit=20):
+    """Retorna as movimentações mais recentes de um item."""
+    try:
+        return database.select_movements(uniform_id, limit, pool=get_connection_pool())
+    except sqlite3.Error as e:
+        st.error(f"Erro ao buscar movimentações: {e}")
+        return []
 
 def delete_uniform(uniform_id):
     """Exclui um itens do banco de dados."""
-    conn = create_connection()
-    if conn:
-        try:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM uniforms WHERE id = ?", (uniform_id,))
-            conn.commit()
-            return True
-        except sqlite3.Error as e:
-            st.error(f"Erro ao excluir itens: {e}")
-            return False
-        finally:
-            conn.close()
+    try:
+        database.delete_uniform(uniform_id, actor=current_actor(), pool=get_connection_pool())
+        return True
+    except sqlite3.Error as e:
+        st.error(f"Erro ao excluir itens: {e}")
+        return False
+
+def reorder_alerts(after, limit):
+    """Página de itens a repor e o cursor da próxima página."""
+    try:
+        return database.reorder_alerts(after, limit, pool=get_connection_pool())
+    except sqlite3.Error as e:
+        st.error(f"Erro ao buscar os itens a repor: {e}")
+        return [], None
+
+def count_reorder_alerts():
+    """Quantos itens estão no ponto de reposição ou abaixo."""
+    try:
+        return database.count_reorder_alerts(pool=get_connection_pool())
+    except sqlite3.Error as e:
+        st.error(f"Erro ao contar os itens a repor: {e}")
+        return 0
+
+def catalog_usage(dimension):
+    """Valores de um catálogo com a quantidade de itens que usa cada um."""
+    try:
+        return database.catalog_usage(dimension, pool=get_connection_pool())
+    except sqlite3.Error as e:
+        st.error(f"Erro ao buscar o catálogo: {e}")
+        return []
+
+def change_catalog(operation, *args):
+    """Executa uma alteração de catálogo (incluir, alterar ou remover valor). Retorna True se deu certo."""
+    try:
+        operation(*args, pool=get_connection_pool())
+        return True
+    except database.CatalogValueError as e:
+        st.error(str(e))
+    except sqlite3.Error as e:
+        st.error(f"Erro ao alterar o catálogo: {e}")
+    return False
 
 # --- Funções de Navegação Streamlit ---
 
@@ -161,12 +259,31 @@ def go_to_page(page_name, uniform_id=None):
     st.session_state.selected_uniform_id = uniform_id # Para passar ID entre páginas
     st.rerun()
 
+ALL_LOCATIONS = "Todos os locais"
+
+def select_location(label="Local de estoque", key="location", include_all=False):
+    """
+    Seletor do local de estoque; a escolha é lembrada entre as páginas. Com um
+    único local cadastrado não exibe nada. Retorna o nome do local, ou None
+    (todos os locais nas consultas, o local padrão nas gravações).
+    """
+    names = catalog().names[database.LOCATION]
+    if len(names) <= 1:
+        return None
+    options = ([ALL_LOCATIONS] if include_all else []) + names
+    current = st.session_state.get("location")
+    choice = st.selectbox(label, options, index=options.index(current) if current in options else 0,
+                          key=f"{key}_location")
+    st.session_state.location = choice
+    return None if choice == ALL_LOCATIONS else choice
+
 # --- Componentes de UI (Páginas) ---
 
 def show_home_page():
     """Exibe a página inicial com as opções de menu."""
     st.image("logoNslog.png", width=200) # <--- AQUI!
     st.title("👕 Controle de Estoque de itens")
+    show_stock_totals()
     st.write("Selecione uma opção abaixo para gerenciar seu estoque:")
 
     col1, col2, col3 = st.columns(3)
@@ -180,53 +297,286 @@ def show_home_page():
         if st.button("📊 Listar Itens", use_container_width=True):
             go_to_page("list")
 
-    col4, col5 = st.columns(2) # Usando 2 colunas para os 2 últimos botões
+    col4, col5, col6 = st.columns(3)
     with col4:
         if st.button("🗑️ Excluir itens", use_container_width=True):
             go_to_page("delete_select") # Vai para a tela de seleção primeiro
     with col5:
         if st.button("📦 Movimentar Estoque", use_container_width=True):
             go_to_page("move_stock_select") # Vai para a tela de seleção primeiro
+    with col6:
+        if st.button("🧺 Movimentação em Lote", use_container_width=True):
+            go_to_page("batch_move")
+
+    col7, col8, col9 = st.columns(3)
+    with col7:
+        if st.button("📥 Importar Itens", use_container_width=True):
+            go_to_page("import")
+    with col8:
+        if st.button("📈 Painel do Estoque", use_container_width=True):
+            go_to_page("dashboard")
+    with col9:
+        if st.button("🗂️ Catálogos", use_container_width=True):
+            go_to_page("catalogs")
+
+    col10, col11, _ = st.columns(3)
+    with col10:
+        if st.button(f"🔔 Reposição ({count_reorder_alerts()})", use_container_width=True):
+            go_to_page("reorder")
+    with col11:
+        if st.button("🔄 Sincronização", use_container_width=True):
+            go_to_page("sync")
+
+def show_stock_totals():
+    """Exibe os totais gerais do estoque a partir da tabela de resumo."""
+    totals = stock_summary("total")
+    if not totals:
+        return
+    _, _, items, quantity, zero_items, low_items = totals[0]
+    col_t_1, col_t_2, col_t_3, col_t_4 = st.columns(4)
+    col_t_1.metric("Itens", items)
+    col_t_2.metric("Unidades em estoque", quantity)
+    col_t_3.metric("Zerados", zero_items)
+    col_t_4.metric(f"Estoque baixo (até {LOW_STOCK_THRESHOLD})", low_items)
+
+DASHBOARD_DIMENSIONS = {"Modelo": "model", "Tipo": "type", "Tamanho": "size", "Cor": "color",
+                        "Local": database.LOCATION}
+
+def show_dashboard_page():
+    """Página com os totais do estoque por modelo, tipo, tamanho, cor e local."""
+    import pandas as pd
+    st.title("📈 Painel do Estoque")
+    show_stock_totals()
+
+    summary = stock_summary()
+    tabs = st.tabs(list(DASHBOARD_DIMENSIONS))
+    for tab, (label, dimension) in zip(tabs, DASHBOARD_DIMENSIONS.items()):
+        with tab:
+            rows = [row[1:] for row in summary if row[0] == dimension]
+            if not rows:
+                st.info("Nenhum itens cadastrado ainda.")
+                continue
+            df = pd.DataFrame(rows, columns=[label, "Itens", "Quantidade", "Zerados", "Estoque baixo"]).set_index(label)
+            st.bar_chart(df["Quantidade"])
+            st.dataframe(df, use_container_width=True)
+
+    with st.expander("📅 Estoque em uma data"):
+        day = st.date_input("Data", value=date.today(), format="DD/MM/YYYY", key="balances_at_day")
+        st.caption("Saldos por local no início do dia, antes das movimentações da data escolhida.")
+        if st.button("Consultar"):
+            try:
+                rows = database.stock_balances_at(int(datetime.combine(day, datetime.min.time()).timestamp()),
+                                                  pool=get_connection_pool())
+            except sqlite3.Error as e:
+                st.error(f"Erro ao consultar o estoque na data: {e}")
+            else:
+                df = pd.DataFrame(rows, columns=["ID", "SKU", "Nome", "Local", "Quantidade"])
+                st.metric("Unidades em estoque", int(df["Quantidade"].sum()))
+                st.dataframe(df.head(1000), use_container_width=True, hide_index=True)
+                st.download_button("⬇️ Baixar saldos", df.to_csv(index=False), file_name=f"estoque_{day:%Y%m%d}.csv",
+                                   mime="text/csv")
+
+    if st.button("⬅️ Voltar à Página Inicial"):
+        go_to_page("home")
 
 def show_add_uniform_page():
     """Página para cadastrar um novo itens."""
     st.title("➕ Cadastrar Novo itens")
     st.write("Preencha os detalhes do novo itens.")
 
+    options = catalog().names
     with st.form("add_uniform_form"):
         uniform_name = st.text_input("Nome do itens (Opcional)", placeholder="Ex: Camiseta Polo Azul MASC P")
-        uniform_type = st.selectbox("Tipo", UNIFORM_TYPES, help="Selecione o tipo de itens (Masculino/Feminino)")
-        size = st.selectbox("Tamanho", SIZES, help="Selecione o tamanho do itens")
-        model = st.selectbox("Modelo", MODELS, help="Selecione o modelo do itens")
-        color = st.selectbox("Cor", COLORS, help="Selecione a cor do itens")
+        uniform_type = st.selectbox("Tipo", options["type"], help="Selecione o tipo de itens (Masculino/Feminino)")
+        size = st.selectbox("Tamanho", options["size"], help="Selecione o tamanho do itens")
+        model = st.selectbox("Modelo", options["model"], help="Selecione o modelo do itens")
+        color = st.selectbox("Cor", options["color"], help="Selecione a cor do itens")
         quantity = st.number_input("Quantidade Inicial em Estoque", min_value=0, value=0, step=1, help="Quantidade inicial disponível no estoque")
         description = st.text_area("Descrição (Opcional)", placeholder="Detalhes adicionais sobre o itens", height=100)
+        sku = st.text_input("SKU / Código de barras (Opcional)", help="Pode ser lido direto pelo leitor de código de barras")
+        location = select_location("Local da quantidade inicial", key="add")
 
         submitted = st.form_submit_button("Cadastrar itens")
         if submitted:
             if quantity < 0:
                 st.error("A quantidade inicial em estoque não pode ser negativa.")
             else:
-                if insert_uniform(uniform_name, uniform_type, size, model, color, quantity, description):
-                    st.success("itens cadastrado com sucesso!")
+                result = upsert_uniform(uniform_name, uniform_type, size, model, color, quantity, description, sku,
+                                        location)
+                if result and result[1]:
+                    st.success(f"itens cadastrado com sucesso! (ID: {result[0]})")
                     st.balloons()
+                elif result:
+                    # Mesma combinação de tipo, tamanho, modelo e cor: não cria um itens duplicado
+                    st.info(f"Já existia o itens ID {result[0]} com estes atributos; "
+                            f"a quantidade ({quantity}) foi somada ao estoque dele.")
                     # go_to_page("home") # Redireciona para a página inicial
 
     if st.button("⬅️ Voltar à Página Inicial"):
         go_to_page("home")
 
+LIST_SORT_OPTIONS = {"ID": "id", "Tipo": "type", "Tamanho": "size", "Modelo": "model", "Cor": "color", "Quantidade": "quantity"}
+LIST_PAGE_SIZES = [25, 50, 100, 200]
+
+def show_import_page():
+    """Página para importar itens em lote a partir de um arquivo."""
+    import importer
+    import pandas as pd
+    st.title("📥 Importar Itens em Lote")
+    st.write("Envie um arquivo CSV, Excel (.xlsx) ou Parquet com as colunas "
+             "Nome, Tipo, Tamanho, Modelo, Cor, Quantidade e Descrição.")
+
+    uploaded = st.file_uploader("Arquivo", type=["csv", "xlsx", "parquet"])
+    location = select_location("Local que recebe as quantidades", key="import")
+    dry_run = st.checkbox("Apenas validar (não grava nada)", value=True,
+                          help="Confira o relatório de erros antes de importar de verdade.")
+
+    if uploaded and st.button("Validar Arquivo" if dry_run else "Importar Itens", type="primary"):
+        progress = st.empty()
+        report = None
+        try:
+            report = importer.import_file(
+                uploaded, importer.detect_format(uploaded.name), dry_run=dry_run,
+                actor=current_actor(), location=location, pool=get_connection_pool(),
+                progress=lambda rows: progress.caption(f"{rows} linhas lidas..."),
+            )
+        except (ValueError, ImportError) as e:
+            st.error(str(e))
+        except sqlite3.Error as e:
+            # Cada bloco é gravado em sua própria transação: os anteriores ao erro permanecem.
+            st.error(f"Erro ao importar itens: {e}")
+
+        if report:
+            rejected = len({row for row, _, _ in report["errors"]})
+            col_r_1, col_r_2, col_r_3 = st.columns(3)
+            col_r_1.metric("Linhas lidas", report["rows"])
+            col_r_2.metric("Importadas" if not dry_run else "Válidas",
+                           report["imported"] if not dry_run else report["rows"] - rejected)
+            col_r_3.metric("Com erro", rejected)
+            if report["errors"]:
+                errors_df = pd.DataFrame(report["errors"], columns=["Linha", "Coluna", "Erro"])
+                st.dataframe(errors_df.head(1000), use_container_width=True, hide_index=True)
+                st.download_button("⬇️ Baixar relatório de erros", errors_df.to_csv(index=False),
+                                   file_name="erros_importacao.csv", mime="text/csv")
+            elif not dry_run:
+                st.success("Importação concluída sem erros!")
+
+    if st.button("⬅️ Voltar à Página Inicial"):
+        go_to_page("home")
+
+def show_list_filters():
+    """
+    Exibe os filtros da listagem e retorna (filtros, coluna de ordenação, decrescente,
+    itens por página, local).
+    """
+    options = catalog().names
+    with st.expander("🔎 Filtros e ordenação"):
+        location = select_location(key="list", include_all=True)
+        col_f_1, col_f_2 = st.columns(2)
+        with col_f_1:
+            types = st.multiselect("Tipo", options["type"], key="list_filter_type")
+            models = st.multiselect("Modelo", options["model"], key="list_filter_model")
+            min_quantity = st.number_input("Quantidade mínima", min_value=0, value=None, step=1, key="list_filter_min")
+        with col_f_2:
+            sizes = st.multiselect("Tamanho", options["size"], key="list_filter_size")
+            colors = st.multiselect("Cor", options["color"], key="list_filter_color")
+            max_quantity = st.number_input("Quantidade máxima", min_value=0, value=None, step=1, key="list_filter_max")
+
+        col_s_1, col_s_2, col_s_3 = st.columns(3)
+        with col_s_1:
+            sort_label = st.selectbox("Ordenar por", list(LIST_SORT_OPTIONS), key="list_sort",
+                                      help="Tipo, tamanho, modelo e cor seguem a ordem de cadastro dos valores "
+                                           "no catálogo, não a ordem definida em Catálogos.")
+        with col_s_2:
+            page_size = st.selectbox("Itens por página", LIST_PAGE_SIZES, index=1, key="list_page_size")
+        with col_s_3:
+            descending = st.toggle("Decrescente", key="list_descending")
+
+    filters = {
+        "type": types, "size": sizes, "model": models, "color": colors,
+        "min_quantity": min_quantity, "max_quantity": max_quantity,
+    }
+    return filters, LIST_SORT_OPTIONS[sort_label], descending, page_size, location
+
+EXPORT_KINDS = {"Itens": "inventory", "Saldos por local": "balances", "Movimentações": "movements"}
+EXPORT_MIME_TYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+def show_export_section(filters, location=None):
+    """Exporta os itens (ou seus saldos e movimentações) que atendem aos filtros e ao local atuais."""
+    with st.expander("⬇️ Exportar"):
+        col_e_1, col_e_2 = st.columns(2)
+        with col_e_1:
+            kind_label = st.selectbox("Dados", list(EXPORT_KINDS), key="export_kind")
+        with col_e_2:
+            file_format = st.selectbox("Formato", exporter.EXPORT_FORMATS, key="export_format")
+        st.caption("Os filtros da listagem também valem para a exportação.")
+
+        if st.button("Preparar Arquivo"):
+            # O arquivo é gerado em disco, lote a lote; só o download passa pela memória.
+            output = tempfile.TemporaryFile()
+            try:
+                rows = exporter.export(EXPORT_KINDS[kind_label], file_format, output, filters, location=location,
+                                       pool=get_connection_pool())
+            except database.CatalogValueError as e:
+                st.error(str(e))
+                return
+            except sqlite3.Error as e:
+                st.error(f"Erro ao exportar: {e}")
+                return
+            output.seek(0)
+            st.download_button(
+                f"⬇️ Baixar {rows} linhas", output.read(),
+                file_name=f"{EXPORT_KINDS[kind_label]}.{file_format}", mime=EXPORT_MIME_TYPES[file_format],
+            )
+
 def show_list_uniforms_page():
-    """Página para listar todos os itens cadastrados."""
+    """Página para listar os itens cadastrados, uma página por vez."""
+    import pandas as pd
     st.title("📊 itens Cadastrados")
 
-    uniforms = select_all_uniforms()
+    filters, sort, descending, page_size, location = show_list_filters()
+    st.session_state.list_filters = filters  # reaproveitado por outras telas
 
-    if not uniforms:
-        st.info("Nenhum itens cadastrado ainda. Utilize a opção 'Cadastrar Novo itens' na tela inicial.")
+    # Cada página guarda o cursor da anterior; qualquer mudança de filtro volta à primeira.
+    query_key = repr((filters, sort, descending, page_size, location))
+    if st.session_state.get("list_query_key") != query_key:
+        st.session_state.list_query_key = query_key
+        st.session_state.list_cursors = [None]
+    cursors = st.session_state.list_cursors
+
+    uniforms, next_cursor = list_uniforms(filters, sort, descending, cursors[-1], page_size, location)
+    total = count_uniforms(filters, location)
+
+    if not total:
+        if location is not None:
+            st.info(f"Nenhum itens com estoque em {location} atende aos filtros selecionados.")
+        elif any(filters.values()):
+            st.info("Nenhum itens atende aos filtros selecionados.")
+        else:
+            st.info("Nenhum itens cadastrado ainda. Utilize a opção 'Cadastrar Novo itens' na tela inicial.")
     else:
-        # Criar um DataFrame para exibir de forma organizada
-        df = pd.DataFrame(uniforms, columns=["ID", "Nome", "Tipo", "Tamanho", "Modelo", "Cor", "Quantidade", "Descrição"])
-        st.dataframe(df.set_index('ID'), use_container_width=True) # Exibe o ID como índice
+        # Criar um DataFrame apenas com a página visível
+        with metrics.REGISTRY.measure("render", "list_dataframe"):
+            df = pd.DataFrame(uniforms, columns=["ID", "Nome", "Tipo", "Tamanho", "Modelo", "Cor", "Quantidade", "Descrição",
+                                                 "SKU", "Mínimo", "Ponto de reposição"])
+            if location is not None:
+                df = df.rename(columns={"Quantidade": f"Quantidade em {location}"})
+            st.dataframe(df.set_index('ID'), use_container_width=True) # Exibe o ID como índice
+
+        page_count = -(-total // page_size)
+        col_page_1, col_page_2, col_page_3 = st.columns([1, 2, 1])
+        with col_page_1:
+            if st.button("◀️ Anterior", disabled=len(cursors) == 1, use_container_width=True):
+                cursors.pop()
+                st.rerun()
+        with col_page_2:
+            st.caption(f"Página {len(cursors)} de {page_count} — {total} itens")
+        with col_page_3:
+            if st.button("Próxima ▶️", disabled=next_cursor is None, use_container_width=True):
+                cursors.append(next_cursor)
+                st.rerun()
+
+        show_export_section(filters, location)
 
     st.markdown("---") # Separador visual
     col_list_1, col_list_2, col_list_3, col_list_4 = st.columns(4)
@@ -243,6 +593,13 @@ def show_list_uniforms_page():
         if st.button("⬅️ Voltar à Página Inicial", use_container_width=True):
             go_to_page("home")
 
+SEARCH_RESULTS_LIMIT = 25
+
+def format_uniform_label(u):
+    """Texto de um itens nas listas de seleção."""
+    sku = f" [{u.sku}]" if u.sku else ""
+    return f"{u.id} - {u.name} ({u.type}, {u.size}, {u.model}, {u.color}){sku} - Qtd: {u.quantity}"
+
 def show_select_uniform_for_action_page(action_type):
     """
     Página genérica para selecionar um itens antes de Editar, Excluir ou Movimentar Estoque.
@@ -265,16 +622,33 @@ def show_select_uniform_for_action_page(action_type):
         go_to_page("home")
         return
 
-    uniforms = select_all_uniforms()
+    location = select_location(key="select", include_all=True)
+    search_text = st.text_input(
+        "Buscar itens:",
+        placeholder="Nome, descrição, tipo, tamanho, modelo, cor, SKU ou ID",
+        help="Digite o início das palavras; todos os termos precisam aparecer no itens.",
+    )
+    if search_text.strip():
+        uniforms = search_uniforms(search_text, SEARCH_RESULTS_LIMIT)
+        if location is not None and uniforms:
+            # A busca não depende do local: só a quantidade exibida passa a ser a do local.
+            balances = select_balances([u.id for u in uniforms], location)
+            uniforms = [u._replace(quantity=balances.get(u.id, 0)) for u in uniforms]
+    else:
+        # Sem busca, oferece apenas os itens cadastrados mais recentemente (no local escolhido)
+        uniforms, _ = list_uniforms(None, "id", True, None, SEARCH_RESULTS_LIMIT, location)
 
     if not uniforms:
-        st.warning("Nenhum itens cadastrado para esta ação.")
+        if search_text.strip():
+            st.warning("Nenhum itens encontrado para esta busca.")
+        else:
+            st.warning("Nenhum itens cadastrado para esta ação.")
         if st.button("⬅️ Voltar à Página Inicial"):
             go_to_page("home")
         return
 
     # Cria uma lista de opções legíveis para o selectbox
-    uniform_options = {f"{u[0]} - {u[1]} ({u[2]}, {u[3]}, {u[4]}, {u[5]}) - Qtd: {u[6]}": u[0] for u in uniforms}
+    uniform_options = {format_uniform_label(u): u.id for u in uniforms}
     
     selected_option_key = st.selectbox(
         "Selecione um itens:",
@@ -299,28 +673,41 @@ def show_edit_uniform_page(uniform_id):
             go_to_page("home")
         return
 
-    st.title(f"📝 Editar itens: {uniform[1]} (ID: {uniform[0]})") # uniform[1] é o nome do itens
+    st.title(f"📝 Editar itens: {uniform.name} (ID: {uniform.id})")
     st.write("Altere os detalhes do itens abaixo. A quantidade em estoque só pode ser alterada via 'Movimentar Estoque'.")
 
-    # Encontra os índices para preencher os selectbox corretamente
-    type_idx = UNIFORM_TYPES.index(uniform[2]) if uniform[2] in UNIFORM_TYPES else 0
-    size_idx = SIZES.index(uniform[3]) if uniform[3] in SIZES else 0
-    model_idx = MODELS.index(uniform[4]) if uniform[4] in MODELS else 0
-    color_idx = COLORS.index(uniform[5]) if uniform[5] in COLORS else 0
+    # Posição de cada valor atual nas listas do catálogo, para preencher os selectbox
+    options = catalog()
+    type_idx = options.positions["type"].get(uniform.type, 0)
+    size_idx = options.positions["size"].get(uniform.size, 0)
+    model_idx = options.positions["model"].get(uniform.model, 0)
+    color_idx = options.positions["color"].get(uniform.color, 0)
 
     with st.form("edit_uniform_form"):
-        uniform_name = st.text_input("Nome do itens (Opcional)", value=uniform[1])
-        uniform_type = st.selectbox("Tipo", UNIFORM_TYPES, index=type_idx)
-        size = st.selectbox("Tamanho", SIZES, index=size_idx)
-        model = st.selectbox("Modelo", MODELS, index=model_idx)
-        color = st.selectbox("Cor", COLORS, index=color_idx)
+        uniform_name = st.text_input("Nome do itens (Opcional)", value=uniform.name)
+        uniform_type = st.selectbox("Tipo", options.names["type"], index=type_idx)
+        size = st.selectbox("Tamanho", options.names["size"], index=size_idx)
+        model = st.selectbox("Modelo", options.names["model"], index=model_idx)
+        color = st.selectbox("Cor", options.names["color"], index=color_idx)
         # Quantidade é exibida, mas desabilitada para edição direta
-        st.text_input("Quantidade Atual em Estoque", value=uniform[6], disabled=True, help="Para alterar a quantidade, use a opção 'Movimentar Estoque' na tela inicial.")
-        description = st.text_area("Descrição (Opcional)", value=uniform[7], height=100)
+        st.text_input("Quantidade Atual em Estoque", value=uniform.quantity, disabled=True, help="Para alterar a quantidade, use a opção 'Movimentar Estoque' na tela inicial.")
+        description = st.text_area("Descrição (Opcional)", value=uniform.description, height=100)
+        sku = st.text_input("SKU / Código de barras (Opcional)", value=uniform.sku or "")
+        col_r_1, col_r_2 = st.columns(2)
+        with col_r_1:
+            min_quantity = st.number_input("Estoque mínimo", min_value=0, value=uniform.min_quantity, step=1,
+                                           help="Abaixo disto o itens aparece como crítico na reposição")
+        with col_r_2:
+            reorder_level = st.number_input("Ponto de reposição", min_value=0, value=uniform.reorder_level, step=1,
+                                            placeholder="Não monitorar",
+                                            help="Com o saldo neste valor ou abaixo, o itens entra na lista de "
+                                                 "reposição. Deixe vazio ou 0 para não monitorar.")
 
         submitted = st.form_submit_button("Salvar Alterações")
         if submitted:
-            if update_uniform(uniform_id, uniform_name, uniform_type, size, model, color, description):
+            # Atributos e níveis de reposição em uma só gravação: ou tudo é salvo, ou nada.
+            if update_uniform(uniform_id, uniform_name, uniform_type, size, model, color, description, sku,
+                              levels=(min_quantity, reorder_level)):
                 st.success("itens atualizado com sucesso!")
                 st.balloons()
                 #go_to_page("home")
@@ -339,7 +726,7 @@ def show_delete_uniform_page(uniform_id):
         return
 
     st.title("🗑️ Excluir itens")
-    st.warning(f"Você está prestes a excluir o itens: **{uniform[1]}** (ID: {uniform[0]})")
+    st.warning(f"Você está prestes a excluir o itens: **{uniform.name}** (ID: {uniform.id})")
     st.write("Esta ação é irreversível e removerá permanentemente o itens do sistema.")
 
     if st.button("CONFIRMAR EXCLUSÃO", type="secondary"):
@@ -352,6 +739,7 @@ def show_delete_uniform_page(uniform_id):
 
 def show_move_stock_page(uniform_id):
     """Página para movimentar o estoque (entrada/saída)."""
+    import pandas as pd
     uniform = select_uniform_by_id(uniform_id)
 
     if not uniform:
@@ -360,44 +748,369 @@ def show_move_stock_page(uniform_id):
             go_to_page("home")
         return
 
-    st.title(f"📦 Movimentar Estoque: {uniform[1]} (ID: {uniform[0]})")
-    st.markdown(f"Quantidade Atual em Estoque: **<span style='font-size: 24px; color: {'green' if uniform[6] > 0 else 'red'};'>{uniform[6]}</span>**", unsafe_allow_html=True)
+    st.title(f"📦 Movimentar Estoque: {uniform.name} (ID: {uniform.id})")
+    # Cor do saldo pelos níveis do próprio itens: crítico, a repor ou normal
+    if uniform.quantity <= uniform.min_quantity:
+        color = "red"
+    elif uniform.reorder_level and uniform.quantity <= uniform.reorder_level:
+        color = "orange"
+    else:
+        color = "green"
+    st.markdown(f"Quantidade Atual em Estoque: **<span style='font-size: 24px; color: {color};'>{uniform.quantity}</span>**", unsafe_allow_html=True)
+    if uniform.reorder_level:
+        st.caption(f"Estoque mínimo: {uniform.min_quantity} | Ponto de reposição: {uniform.reorder_level}")
 
+    locations = catalog().names[database.LOCATION]
+    if len(locations) > 1:
+        balances = select_item_balances(uniform_id)
+        if balances:
+            st.dataframe(pd.DataFrame(balances, columns=["Local", "Saldo"]).set_index("Local"),
+                         use_container_width=True)
+    location = select_location("Local da movimentação", key="move")
 
     with st.form("move_stock_form"):
-        movement_type = st.radio("Tipo de Movimentação", ["Entrada", "Saída"], horizontal=True)
+        movement_type = st.radio("Tipo de Movimentação", [database.MOVEMENT_IN, database.MOVEMENT_OUT], horizontal=True)
         quantity_change = st.number_input("Quantidade", min_value=1, value=1, step=1, help="Quantidade a ser movimentada")
 
         submitted = st.form_submit_button("Realizar Movimentação")
         if submitted:
-            current_quantity = uniform[6]
-            new_quantity = current_quantity
-
-            if movement_type == "Entrada":
-                new_quantity = current_quantity + quantity_change
-            else: # Saída
-                if quantity_change > current_quantity:
-                    st.error(f"Não há estoque suficiente para a saída. Quantidade disponível: {current_quantity}")
-                    return # Não prossegue com a atualização
-
-                new_quantity = current_quantity - quantity_change
-
-            if update_uniform_quantity(uniform_id, new_quantity):
-                st.success("Estoque movimentado com sucesso!")
+            # O saldo exibido acima pode estar desatualizado se outro operador movimentou
+            # o item; a verificação de saldo acontece no próprio UPDATE.
+            new_quantity = move_stock(uniform_id, movement_type, quantity_change, location)
+            if new_quantity is not None:
+                where = f" em {location}" if location else ""
+                st.success(f"Estoque movimentado com sucesso! Novo saldo{where}: {new_quantity}")
                 st.balloons()
                 #go_to_page("home")
 
+    if len(locations) > 1:
+        with st.form("transfer_stock_form"):
+            st.markdown("#### 🔁 Transferir entre locais")
+            col_t_1, col_t_2, col_t_3 = st.columns(3)
+            with col_t_1:
+                origin = st.selectbox("De", locations, index=locations.index(location) if location in locations else 0)
+            with col_t_2:
+                destination = st.selectbox("Para", locations, index=1 if origin == locations[0] else 0)
+            with col_t_3:
+                transfer_quantity = st.number_input("Quantidade", min_value=1, value=1, step=1, key="transfer_quantity")
+            if st.form_submit_button("Transferir"):
+                result = transfer_stock(uniform_id, transfer_quantity, origin, destination)
+                if result is not None:
+                    st.success(f"Transferência concluída! {origin}: {result[0]} | {destination}: {result[1]}")
+
+    movements = select_movements(uniform_id)
+    if movements:
+        st.markdown("#### Últimas movimentações")
+        df = pd.DataFrame(movements, columns=["ID", "Item", "Quantidade", "Tipo", "Data", "Sessão", "Local"])
+        df["Data"] = pd.to_datetime(df["Data"], unit="s")
+        st.dataframe(df.drop(columns=["Item"]).set_index("ID"), use_container_width=True)
+
     if st.button("⬅️ Voltar"):
         go_to_page("home")
 
+def show_batch_move_page():
+    """
+    Página para montar um lote de movimentações (vários itens, entradas e saídas)
+    e aplicá-lo de uma só vez, em uma única transação.
+    """
+    import pandas as pd
+    st.title("🧺 Movimentação em Lote")
+    st.write("Adicione as linhas do recebimento ou da entrega e confirme tudo de uma vez. "
+             "Se alguma linha não puder ser aplicada, nenhuma é.")
+
+    if "batch_cart" not in st.session_state:
+        st.session_state.batch_cart = []  # lista de (id, rótulo, tipo, quantidade)
+    cart = st.session_state.batch_cart
+    location = select_location("Local do lote", key="batch")
+
+    search_text = st.text_input("Buscar itens:", placeholder="Nome, descrição, tipo, tamanho, modelo, cor ou ID",
+                                key="batch_search")
+    if search_text.strip():
+        uniforms = search_uniforms(search_text, SEARCH_RESULTS_LIMIT)
+        if location is not None and uniforms:
+            # Entradas podem ser de itens ainda sem saldo no local: a busca mostra todos, com o saldo do local.
+            balances = select_balances([u.id for u in uniforms], location)
+            uniforms = [u._replace(quantity=balances.get(u.id, 0)) for u in uniforms]
+    else:
+        # Sem busca, os itens mais recentes com saldo no local do lote.
+        uniforms, _ = list_uniforms(None, "id", True, None, SEARCH_RESULTS_LIMIT, location)
+
+    if uniforms:
+        with st.form("batch_add_line_form", clear_on_submit=True):
+            uniform_options = {format_uniform_label(u): u.id for u in uniforms}
+            selected_option_key = st.selectbox("Itens", options=list(uniform_options.keys()))
+            col_b_1, col_b_2 = st.columns(2)
+            with col_b_1:
+                movement_type = st.radio("Tipo de Movimentação", [database.MOVEMENT_IN, database.MOVEMENT_OUT],
+                                         horizontal=True)
+            with col_b_2:
+                quantity = st.number_input("Quantidade", min_value=1, value=1, step=1)
+            if st.form_submit_button("➕ Adicionar ao Lote"):
+                cart.append((uniform_options[selected_option_key], selected_option_key, movement_type, quantity))
+    else:
+        st.warning("Nenhum itens encontrado para esta busca.")
+
+    if cart:
+        st.markdown(f"#### Lote atual ({len(cart)} linhas)")
+        lines = [(uniform_id, movement_type, quantity) for uniform_id, _, movement_type, quantity in cart]
+        expected, problems = validate_stock_batch(lines, location)
+        problem_by_line = {index: message for index, _, message in problems}
+        df = pd.DataFrame(
+            [(label, movement_type, quantity, problem_by_line.get(index, "✅"))
+             for index, (_, label, movement_type, quantity) in enumerate(cart)],
+            columns=["Itens", "Tipo", "Quantidade", "Situação"],
+        )
+        df.index = df.index + 1
+        st.dataframe(df, use_container_width=True)
+
+        col_c_1, col_c_2, col_c_3 = st.columns(3)
+        with col_c_1:
+            line_to_remove = st.number_input("Linha", min_value=1, max_value=len(cart), value=len(cart), step=1,
+                                             label_visibility="collapsed")
+        with col_c_2:
+            if st.button("Remover Linha", use_container_width=True):
+                cart.pop(line_to_remove - 1)
+                st.rerun()
+        with col_c_3:
+            if st.button("Esvaziar Lote", use_container_width=True):
+                cart.clear()
+                st.rerun()
+
+        if st.button("✅ Confirmar Lote", type="primary", disabled=bool(problems)):
+            balances = move_stock_batch(lines, location)
+            if balances is not None:
+                cart.clear()
+                st.success(f"Lote aplicado com sucesso! {len(lines)} movimentações em {len(balances)} itens.")
+                st.dataframe(pd.DataFrame(sorted(balances.items()), columns=["ID", "Novo Saldo"]).set_index("ID"),
+                             use_container_width=True)
+
+    if st.button("⬅️ Voltar à Página Inicial"):
+        go_to_page("home")
+
+REORDER_PAGE_SIZE = 100
+
+def show_reorder_page():
+    """Página com os itens no ponto de reposição ou abaixo dele e a compra sugerida."""
+    import pandas as pd
+    st.title("🔔 Reposição")
+    st.write(f"Itens com saldo no ponto de reposição ou abaixo dele, do menor saldo para o maior. "
+             f"A sugestão cobre {REORDER_COVER_DAYS} dias de consumo, estimado pelas saídas dos "
+             f"últimos {REORDER_LOOKBACK_DAYS} dias, mais o estoque mínimo.")
+
+    if "reorder_cursors" not in st.session_state:
+        st.session_state.reorder_cursors = [None]
+    cursors = st.session_state.reorder_cursors
+    alerts, next_cursor = reorder_alerts(cursors[-1], REORDER_PAGE_SIZE)
+    total = count_reorder_alerts()
+
+    if not total:
+        st.success("Nenhum itens precisa de reposição.")
+    else:
+        col_a_1, col_a_2 = st.columns(2)
+        col_a_1.metric("Itens a repor", total)
+        col_a_2.metric("Críticos nesta página", sum(alert.critical for alert in alerts))
+        df = pd.DataFrame([
+            (a.uniform.id, "🔴" if a.critical else "🟠", a.uniform.name, a.uniform.type, a.uniform.size,
+             a.uniform.model, a.uniform.color, a.uniform.sku, a.uniform.quantity, a.uniform.min_quantity,
+             a.uniform.reorder_level, a.outflow, a.suggested)
+            for a in alerts
+        ], columns=["ID", "", "Nome", "Tipo", "Tamanho", "Modelo", "Cor", "SKU", "Saldo", "Mínimo",
+                    "Ponto de reposição", f"Saídas ({REORDER_LOOKBACK_DAYS} dias)", "Sugestão de compra"])
+        st.dataframe(df.set_index("ID"), use_container_width=True)
+        st.download_button("⬇️ Baixar sugestões desta página (CSV)", df.to_csv(index=False),
+                           file_name="reposicao.csv", mime="text/csv")
+
+        col_page_1, col_page_2, col_page_3 = st.columns([1, 2, 1])
+        with col_page_1:
+            if st.button("◀️ Anterior", disabled=len(cursors) == 1, use_container_width=True):
+                cursors.pop()
+                st.rerun()
+        with col_page_2:
+            st.caption(f"Página {len(cursors)} de {-(-total // REORDER_PAGE_SIZE)} — {total} itens")
+        with col_page_3:
+            if st.button("Próxima ▶️", disabled=next_cursor is None, use_container_width=True):
+                cursors.append(next_cursor)
+                st.rerun()
+
+        options = {format_uniform_label(a.uniform): a.uniform.id for a in alerts}
+        selected = st.selectbox("Registrar entrada para:", list(options))
+        if st.button("📦 Movimentar Estoque do itens Selecionado"):
+            go_to_page("move_stock", uniform_id=options[selected])
+
+    if st.button("⬅️ Voltar à Página Inicial"):
+        st.session_state.reorder_cursors = [None]
+        go_to_page("home")
+
+CATALOG_LABELS = {"type": "Tipos", "size": "Tamanhos", "model": "Modelos", "color": "Cores",
+                  database.LOCATION: "Locais"}
+
+def show_catalogs_page():
+    """Página para administrar os valores de tipo, tamanho, modelo e cor, e os locais de estoque."""
+    import pandas as pd
+    st.title("🗂️ Catálogos")
+    st.write("Valores oferecidos nos cadastros, filtros e na importação. Renomear um valor "
+             "atualiza todos os itens que o usam; só é possível remover valores sem itens. "
+             "Em \"Locais\", o primeiro da lista é o local padrão e só locais sem saldo podem ser removidos. "
+             "A posição define a ordem das listas de seleção; a listagem de itens ordena pela ordem de cadastro.")
+
+    tabs = st.tabs(list(CATALOG_LABELS.values()))
+    for tab, dimension in zip(tabs, CATALOG_LABELS):
+        with tab:
+            values = catalog_usage(dimension)
+            if values:
+                df = pd.DataFrame([(position + 1, name, items) for _, name, position, items in values],
+                                  columns=["Posição", "Valor", "Itens"])
+                st.dataframe(df, use_container_width=True, hide_index=True)
+
+            with st.form(f"catalog_add_{dimension}", clear_on_submit=True):
+                new_name = st.text_input("Novo valor")
+                if st.form_submit_button("➕ Incluir"):
+                    if change_catalog(database.add_catalog_value, dimension, new_name):
+                        st.success(f"'{new_name.strip()}' incluído.")
+                        st.rerun()
+
+            if not values:
+                continue
+            options = {name: (value_id, position, items) for value_id, name, position, items in values}
+            selected = st.selectbox("Valor", list(options), key=f"catalog_selected_{dimension}")
+            value_id, position, items = options[selected]
+            with st.form(f"catalog_edit_{dimension}"):
+                renamed = st.text_input("Nome", value=selected)
+                new_position = st.number_input("Posição", min_value=1, max_value=len(values), value=position + 1,
+                                               step=1)
+                col_k_1, col_k_2 = st.columns(2)
+                with col_k_1:
+                    save = st.form_submit_button("Salvar", use_container_width=True)
+                with col_k_2:
+                    remove = st.form_submit_button("Remover", disabled=items > 0, use_container_width=True,
+                                                   help="Só valores sem itens podem ser removidos.")
+            if save and change_catalog(database.update_catalog_value, dimension, value_id, renamed,
+                                       new_position - 1):
+                st.rerun()
+            if remove and change_catalog(database.delete_catalog_value, dimension, value_id):
+                st.rerun()
+
+    if st.button("⬅️ Voltar à Página Inicial"):
+        go_to_page("home")
+
+def show_sync_page():
+    """Página para trocar pacotes de alterações com as outras instalações (ver sync.py)."""
+    import pandas as pd
+    import sync
+    st.title("🔄 Sincronização")
+    st.write("Leve para outra instalação só as alterações feitas desde a última troca, e aplique aqui "
+             "os pacotes recebidos dela. Reaplicar um pacote não altera nada.")
+    pool = get_connection_pool()
+    try:
+        site = database.site_id(pool=pool)
+        peers = database.sync_peers(pool=pool)
+        negatives = database.select_negative_balances(pool=pool)
+    except sqlite3.Error as e:
+        st.error(f"Erro ao ler o estado da sincronização: {e}")
+        return
+    st.caption(f"Identificação deste banco: {site}")
+
+    if peers:
+        df = pd.DataFrame(peers, columns=["Site", "Enviado até", "Recebido até", "Última troca", "Pendentes"])
+        df["Última troca"] = pd.to_datetime(df["Última troca"], unit="s").dt.strftime("%d/%m/%Y %H:%M").fillna("-")
+        st.dataframe(df[["Site", "Pendentes", "Enviado até", "Recebido até", "Última troca"]],
+                     use_container_width=True, hide_index=True)
+    if negatives:
+        st.warning("Saídas feitas ao mesmo tempo em instalações diferentes deixaram saldos negativos:")
+        st.dataframe(pd.DataFrame(negatives, columns=["Item", "Local", "Saldo"]), use_container_width=True,
+                     hide_index=True)
+
+    st.markdown("#### Enviar alterações")
+    marks = {peer: sent for peer, sent, _, _, _ in peers}
+    peer = st.selectbox("Para o site", list(marks) + ["Outro site"], key="sync_peer")
+    if peer == "Outro site":
+        peer = st.text_input("Identificação do site de destino",
+                             help="Vazio: todas as alterações, sem registrar o envio.").strip() or None
+    since = st.number_input("A partir da alteração", min_value=0, value=marks.get(peer, 0), step=1,
+                            help="Se o outro site recusar o pacote por falta de alterações, use o número indicado.")
+    if st.button("Preparar Pacote"):
+        output = tempfile.TemporaryFile()
+        try:
+            header = sync.export_bundle(output, peer=peer, since=int(since), pool=pool)
+        except (database.SyncError, sqlite3.Error) as e:
+            st.error(f"Erro ao gerar o pacote: {e}")
+            return
+        output.seek(0)
+        st.download_button(f"⬇️ Baixar {header['changes']} alterações", output.read(),
+                           file_name=f"alteracoes_{site}.jsonl.gz", mime="application/gzip")
+
+    st.markdown("#### Receber alterações")
+    uploaded = st.file_uploader("Pacote recebido", type=["gz"])
+    if uploaded and st.button("Aplicar Pacote", type="primary"):
+        progress = st.empty()
+        try:
+            report = sync.import_bundle(uploaded, pool=pool,
+                                        progress=lambda n: progress.caption(f"{n} alterações lidas..."))
+        except (database.SyncError, sqlite3.Error) as e:
+            # Cada bloco é gravado em sua própria transação: reaplicar o pacote completa o que faltou.
+            st.error(f"Erro ao aplicar o pacote: {e}")
+        else:
+            col_s_1, col_s_2, col_s_3 = st.columns(3)
+            col_s_1.metric("Aplicadas", report["applied"])
+            col_s_2.metric("Já existentes", report["skipped"])
+            col_s_3.metric("Conflitos", len(report["conflicts"]))
+            for conflict in report["conflicts"][:100]:
+                st.warning(conflict)
+
+    if st.button("⬅️ Voltar à Página Inicial"):
+        go_to_page("home")
+
+def show_diagnostics_page():
+    """Página oculta com as métricas de desempenho do processo (banco, páginas e cache)."""
+    import pandas as pd
+    st.title("🩺 Diagnóstico de Desempenho")
+    st.caption(f"Métricas coletadas desde {pd.to_datetime(metrics.REGISTRY.started_at, unit='s'):%d/%m/%Y %H:%M:%S} (UTC).")
+
+    snapshot = metrics.REGISTRY.snapshot()
+    if snapshot:
+        df = pd.DataFrame(snapshot).rename(columns={
+            "kind": "Tipo", "name": "Operação", "count": "Chamadas", "total_ms": "Total (ms)",
+            "avg_ms": "Média (ms)", "p50_ms": "p50", "p90_ms": "p90", "p99_ms": "p99",
+            "max_ms": "Máx (ms)", "rows": "Linhas", "lock_wait_ms": "Espera lock (ms)",
+        })
+        st.dataframe(df, use_container_width=True, hide_index=True)
+    else:
+        st.info("Nenhuma métrica coletada ainda.")
+
+    st.markdown("#### Cache de leituras")
+    st.json(database.cache_stats(pool=get_connection_pool()))
+
+    slow = metrics.REGISTRY.slow_log()
+    st.markdown(f"#### Operações lentas (≥ {metrics.REGISTRY.slow_ms} ms): {len(slow)}")
+    for entry in reversed(slow):
+        with st.expander(f"{entry['name']} — {entry['ms']} ms"):
+            for sql, plan in entry["statements"]:
+                st.code(sql, language="sql")
+                if plan:
+                    st.text("\n".join(plan))
+
+    text = metrics.REGISTRY.render_text()
+    with st.expander("Métricas em texto (formato Prometheus)"):
+        st.code(text)
+    col_d_1, col_d_2, col_d_3 = st.columns(3)
+    with col_d_1:
+        st.download_button("⬇️ Baixar métricas", text, file_name="metrics.prom", mime="text/plain",
+                           use_container_width=True)
+    with col_d_2:
+        if st.button("Zerar métricas", use_container_width=True):
+            metrics.REGISTRY.reset()
+            st.rerun()
+    with col_d_3:
+        if st.button("⬅️ Sair", use_container_width=True):
+            st.query_params.clear()
+            go_to_page("home")
+
 # --- Lógica Principal da Aplicação ---
 
 def main():
     """Função principal que controla o fluxo da aplicação Streamlit."""
     st.set_page_config(page_title="Controle de Estoque de itens", layout="centered", initial_sidebar_state="collapsed")
-
-    # Inicializa o banco de dados e a tabela na primeira execução
-    create_table()
+    start_maintenance()
 
     # Inicializa o session_state para controlar a navegação
     if 'current_page' not in st.session_state:
@@ -405,25 +1118,48 @@ def main():
     if 'selected_uniform_id' not in st.session_state:
         st.session_state.selected_uniform_id = None
 
-    # Roteamento das páginas
-    if st.session_state.current_page == "home":
+    # Página oculta de diagnóstico: abra o app com ?diagnostics=1 na URL
+    if st.query_params.get("diagnostics") == "1":
+        st.session_state.current_page = "diagnostics"
+
+    page = st.session_state.current_page
+    with metrics.REGISTRY.measure("page", page):
+        route_page(page)
+
+def route_page(page):
+    """Roteamento das páginas."""
+    if page == "home":
         show_home_page()
-    elif st.session_state.current_page == "add":
+    elif page == "add":
         show_add_uniform_page()
-    elif st.session_state.current_page == "list":
+    elif page == "list":
         show_list_uniforms_page()
-    elif st.session_state.current_page == "edit_select":
+    elif page == "import":
+        show_import_page()
+    elif page == "batch_move":
+        show_batch_move_page()
+    elif page == "dashboard":
+        show_dashboard_page()
+    elif page == "catalogs":
+        show_catalogs_page()
+    elif page == "reorder":
+        show_reorder_page()
+    elif page == "sync":
+        show_sync_page()
+    elif page == "edit_select":
         show_select_uniform_for_action_page("edit")
-    elif st.session_state.current_page == "edit":
+    elif page == "edit":
         show_edit_uniform_page(st.session_state.selected_uniform_id)
-    elif st.session_state.current_page == "delete_select":
+    elif page == "delete_select":
         show_select_uniform_for_action_page("delete")
-    elif st.session_state.current_page == "delete":
+    elif page == "delete":
         show_delete_uniform_page(st.session_state.selected_uniform_id)
-    elif st.session_state.current_page == "move_stock_select":
+    elif page == "move_stock_select":
         show_select_uniform_for_action_page("move_stock")
-    elif st.session_state.current_page == "move_stock":
+    elif page == "move_stock":
         show_move_stock_page(st.session_state.selected_uniform_id)
+    elif page == "diagnostics":
+        show_diagnostics_page()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
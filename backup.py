@@ -0,0 +1,98 @@
+"""
+Backup do banco com o programa em uso, pela API de backup online do SQLite.
+
+A cópia é feita em passos de BACKUP_STEP_PAGES páginas, com uma pausa entre eles,
+e cada passo só lê o banco (em WAL, leitores não bloqueiam o escritor): as
+gravações continuam durante o backup. Se outra conexão gravar no meio, o SQLite
+recomeça a cópia; depois de MAX_RESTARTS recomeços ela termina em um único passo,
+que só segura um instantâneo de leitura. O arquivo é gravado com outro nome,
+conferido (PRAGMA quick_check) e só então renomeado: um backup interrompido
+nunca substitui um bom.
+
+Para voltar um backup: feche o app, troque o uniforms.db pelo arquivo do backup e
+apague uniforms.db-wal e uniforms.db-shm, se existirem. Se o banco sincroniza
+com outras instalações, rode `python sync.py new-site` nele antes de reabrir o
+app: as alterações feitas depois do backup voltam dos outros sites.
+
+Uso pela linha de comando: `python maintenance.py backup` (ver maintenance.py).
+"""
+import os
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+
+import database
+from config import BACKUP_DIR, BACKUP_KEEP, BACKUP_STEP_PAGES, BACKUP_STEP_SLEEP
+
+MAX_RESTARTS = 3
+
+class _Restarted(Exception):
+    """O banco mudou durante a cópia vezes demais para seguir em passos."""
+
+# --- Cópia Online ---
+
+def backup_database(destination, pages=BACKUP_STEP_PAGES, sleep=BACKUP_STEP_SLEEP, pool=None, progress=None):
+    """
+    Copia o banco do pool para o arquivo `destination`. `progress`, se informado,
+    recebe (páginas copiadas, total) após cada passo.
+    Retorna {"path", "bytes", "seconds", "restarts"}.
+    """
+    pool = pool if pool is not None else database.get_pool()
+    partial = f"{destination}.parcial"
+    if os.path.exists(partial):
+        os.remove(partial)
+    started = time.perf_counter()
+    state = {"remaining": None, "restarts": 0}
+
+    def step(status, remaining, total):
+        # Recomeço: a cópia voltou ao início e o que falta não diminuiu.
+        if state["remaining"] is not None and remaining >= state["remaining"]:
+            state["restarts"] += 1
+            if state["restarts"] > MAX_RESTARTS:
+                raise _Restarted
+        state["remaining"] = remaining
+        if progress:
+            progress(total - remaining, total)
+
+    with pool.connection() as conn, closing(sqlite3.connect(partial)) as target:
+        try:
+            conn.backup(target, pages=pages, progress=step, sleep=sleep)
+        except _Restarted:
+            conn.backup(target, pages=-1)
+        check = target.execute("PRAGMA quick_check").fetchone()[0]
+    if check != "ok":
+        os.remove(partial)
+        raise sqlite3.DatabaseError(f"O backup não passou na verificação: {check}")
+    os.replace(partial, destination)
+    return {"path": destination, "bytes": os.path.getsize(destination),
+            "seconds": time.perf_counter() - started, "restarts": state["restarts"]}
+
+# --- Backups Periódicos ---
+
+def backup_dir(pool):
+    """Pasta dos backups periódicos: BACKUP_DIR, relativa à pasta do banco."""
+    return os.path.join(os.path.dirname(os.path.abspath(pool.db_path)), BACKUP_DIR)
+
+def rotate_backups(directory, stem, keep=BACKUP_KEEP):
+    """Apaga os backups `stem-*.db` da pasta além dos `keep` mais recentes. Retorna os apagados."""
+    # O nome leva data e hora, então a ordem alfabética é a cronológica.
+    backups = sorted(Path(directory).glob(f"{stem}-*.db"), reverse=True)
+    for old in backups[keep:]:
+        old.unlink()
+    return [str(old) for old in backups[keep:]]
+
+def run_backup(directory=None, keep=BACKUP_KEEP, pool=None, progress=None):
+    """
+    Grava um backup datado na pasta de backups e apaga os mais antigos.
+    Retorna o resultado de backup_database com a lista "removed".
+    """
+    pool = pool if pool is not None else database.get_pool()
+    directory = directory or backup_dir(pool)
+    os.makedirs(directory, exist_ok=True)
+    stem = Path(pool.db_path).stem
+    destination = os.path.join(directory, f"{stem}-{datetime.now():%Y%m%d-%H%M%S}.db")
+    report = backup_database(destination, pool=pool, progress=progress)
+    report["removed"] = rotate_backups(directory, stem, keep)
+    return report
@@ -0,0 +1,288 @@
+"""
+Benchmark da camada de dados (database.py) sobre um catálogo sintético.
+
+Mede vazão (operações/s) e latência (p50/p90/p99/máx, em ms) de cadastro,
+listagem (geral e por local), busca por ID e por SKU, edição, movimentação de
+estoque, transferência entre locais e exclusão, em uma thread e com N escritores
+concorrentes, e a sincronização dessas alterações com uma cópia do banco. O resultado é gravado em JSON para comparar versões:
+
+    python benchmarks/bench_data_layer.py --rows 100000 --locations 10 --out resultados.json
+    python benchmarks/bench_data_layer.py --rows 100000 --baseline resultados.json
+
+Por padrão o cache de leituras fica desligado, para medir o SQLite e não o cache.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import schema  # noqa: E402
+import sync  # noqa: E402
+from config import COLORS, MODELS, SIZES, UNIFORM_TYPES  # noqa: E402
+from synthetic import build_catalog, synthetic_locations  # noqa: E402
+
+# --- Medição ---
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def summarize(latencies, elapsed, errors=0):
+    """Converte latências (s) em um dicionário de estatísticas (ms)."""
+    latencies = sorted(latencies)
+    return {
+        "ops": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 4),
+        "ops_per_sec": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 4),
+        "p90_ms": round(percentile(latencies, 0.90) * 1000, 4),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 4),
+        "max_ms": round(latencies[-1] * 1000, 4) if latencies else 0.0,
+    }
+
+def timed(operation, args_list, expected_errors=()):
+    """Executa `operation(*args)` para cada item de `args_list`, medindo cada chamada."""
+    latencies = []
+    errors = 0
+    started = time.perf_counter()
+    for args in args_list:
+        t0 = time.perf_counter()
+        try:
+            operation(*args)
+        except expected_errors:
+            errors += 1
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+# --- Cenários ---
+
+def random_uniform(rng):
+    return (f"bench {rng.random():.6f}", rng.choice(UNIFORM_TYPES), rng.choice(SIZES),
+            rng.choice(MODELS), rng.choice(COLORS), rng.randint(0, 100), "benchmark")
+
+def random_filters(rng):
+    filters = {}
+    if rng.random() < 0.5:
+        filters["model"] = [rng.choice(MODELS)]
+    if rng.random() < 0.3:
+        filters["size"] = [rng.choice(SIZES)]
+    if rng.random() < 0.3:
+        filters["min_quantity"] = rng.randint(0, 20)
+    return filters
+
+def bench_single_thread(pool, ops, rng, locations=1):
+    with pool.connection() as conn:
+        max_id = conn.execute("SELECT MAX(id) FROM uniforms").fetchone()[0] or 1
+    ids = [rng.randint(1, max_id) for _ in range(ops)]
+    results = {}
+
+    results["insert"] = timed(
+        lambda row: database.insert_uniform(*row, actor="bench", pool=pool),
+        [(random_uniform(rng),) for _ in range(ops)],
+    )
+    results["list_page"] = timed(
+        lambda f, sort: database.list_uniforms(f, sort, False, None, 50, pool=pool),
+        [(random_filters(rng), rng.choice(database.SORT_COLUMNS)) for _ in range(ops)],
+    )
+    names = synthetic_locations(locations)
+    results["list_page_location"] = timed(
+        lambda f, sort, location: database.list_uniforms(f, sort, False, None, 50, location, pool=pool),
+        [(random_filters(rng), rng.choice(database.SORT_COLUMNS), rng.choice(names)) for _ in range(ops)],
+    )
+    results["count"] = timed(
+        lambda f: database.count_uniforms(f, pool=pool), [(random_filters(rng),) for _ in range(ops)]
+    )
+    results["lookup_by_id"] = timed(
+        lambda i: database.select_uniform_by_id(i, pool=pool), [(i,) for i in ids]
+    )
+    with pool.connection() as conn:
+        skus = [row[0] for row in conn.execute(
+            "SELECT sku FROM uniforms WHERE sku IS NOT NULL ORDER BY random() LIMIT ?", (ops,)
+        )]
+    results["lookup_by_sku"] = timed(
+        lambda sku: database.select_uniform_by_sku(sku, pool=pool), [(sku,) for sku in skus]
+    )
+    # Edição de nome e descrição: os atributos ficam, pois cada combinação já é de um item.
+    current = {i: database.select_uniform_by_id(i, pool=pool) for i in set(ids)}
+    results["update"] = timed(
+        lambda i, u, row: database.update_uniform(i, row[0], u.type, u.size, u.model, u.color, row[6], pool=pool),
+        [(i, current[i], random_uniform(rng)) for i in ids if current[i] is not None],
+    )
+    results["movement"] = timed(
+        lambda i, kind, qty: database.move_stock(i, kind, qty, actor="bench", pool=pool),
+        [(i, rng.choice([database.MOVEMENT_IN, database.MOVEMENT_OUT]), rng.randint(1, 5)) for i in ids],
+        expected_errors=(database.StockError,),
+    )
+    if locations > 1:
+        results["transfer"] = timed(
+            lambda i, source, target: database.transfer_stock(i, 1, source, target, actor="bench", pool=pool),
+            [(i, *rng.sample(names, 2)) for i in ids],
+            expected_errors=(database.StockError,),
+        )
+    results["delete"] = timed(
+        lambda i: database.delete_uniform(i, actor="bench", pool=pool),
+        [(i,) for i in rng.sample(range(1, max_id + 1), min(ops, max_id))],
+    )
+    return results
+
+def bench_concurrent_writers(pool, writers, ops_per_writer, seed):
+    """N threads fazendo movimentações ao mesmo tempo, cada uma com sua própria sequência."""
+    with pool.connection() as conn:
+        max_id = conn.execute("SELECT MAX(id) FROM uniforms").fetchone()[0] or 1
+    latencies = []
+    counters = {"stock_errors": 0, "lock_errors": 0}
+    lock = threading.Lock()
+
+    def writer(index):
+        rng = random.Random(seed + index)
+        local = []
+        stock_errors = lock_errors = 0
+        for _ in range(ops_per_writer):
+            uniform_id = rng.randint(1, max_id)
+            kind = rng.choice([database.MOVEMENT_IN, database.MOVEMENT_OUT])
+            t0 = time.perf_counter()
+            try:
+                database.move_stock(uniform_id, kind, rng.randint(1, 5), actor=f"bench-{index}", pool=pool)
+            except database.StockError:
+                stock_errors += 1
+            except sqlite3.OperationalError:
+                lock_errors += 1
+            local.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(local)
+            counters["stock_errors"] += stock_errors
+            counters["lock_errors"] += lock_errors
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    result = summarize(latencies, time.perf_counter() - started, counters["lock_errors"])
+    result.update(writers=writers, stock_errors=counters["stock_errors"])
+    return result
+
+def copy_peer(pool, path):
+    """Cópia do banco como outro site (mesma base, identificação nova). Retorna (pool, último seq copiado)."""
+    with pool.connection() as conn, sqlite3.connect(path) as target:
+        conn.backup(target)
+        since = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+    target.close()
+    peer = database.get_pool(path)
+    database.reset_site_id(pool=peer)
+    return peer, since
+
+def bench_sync(pool, peer, since, path):
+    """Gera o pacote com as alterações feitas desde a cópia e o aplica nela."""
+    results = {}
+    t0 = time.perf_counter()
+    header = sync.export_bundle(path, since=since, pool=pool)
+    results["sync_export"] = summarize([time.perf_counter() - t0], time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    report = sync.import_bundle(path, pool=peer)
+    results["sync_import"] = summarize([time.perf_counter() - t0], time.perf_counter() - t0)
+    for result in results.values():
+        result["changes"] = header["changes"]
+        result["changes_per_sec"] = round(header["changes"] / result["seconds"], 1) if result["seconds"] else 0.0
+    results["sync_export"]["bundle_bytes"] = os.path.getsize(path)
+    results["sync_import"]["conflicts"] = len(report["conflicts"])
+    return results
+
+# --- Comparação ---
+
+def compare(current, baseline):
+    """Imprime a variação de vazão e de p99 em relação a um resultado anterior."""
+    print(f"{'operação':<28}{'ops/s':>12}{'Δ':>9}{'p99 ms':>12}{'Δ':>9}")
+    for name, result in current["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if not old:
+            continue
+        d_ops = (result["ops_per_sec"] / old["ops_per_sec"] - 1) * 100 if old["ops_per_sec"] else 0
+        d_p99 = (result["p99_ms"] / old["p99_ms"] - 1) * 100 if old["p99_ms"] else 0
+        print(f"{name:<28}{result['ops_per_sec']:>12.1f}{d_ops:>+8.1f}%{result['p99_ms']:>12.3f}{d_p99:>+8.1f}%")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da camada de dados do controle de estoque.")
+    parser.add_argument("--rows", type=int, default=10000, help="Tamanho do catálogo sintético (1k a 1M)")
+    parser.add_argument("--ops", type=int, default=2000, help="Operações por cenário")
+    parser.add_argument("--locations", type=int, default=1, help="Locais de estoque do catálogo sintético")
+    parser.add_argument("--writers", type=int, nargs="*", default=[1, 4, 8], help="Escritores concorrentes")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", help="Banco a usar (padrão: arquivo temporário novo)")
+    parser.add_argument("--with-cache", action="store_true", help="Mantém o cache de leituras ligado")
+    parser.add_argument("--out", help="Grava o resultado em JSON neste arquivo")
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args(argv)
+
+    workdir = None
+    db_path = args.db
+    if db_path is None:
+        workdir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(workdir.name, "bench.db")
+
+    pool = database.get_pool(db_path)
+    if not args.with_cache:
+        pool.cache.max_entries = 0
+
+    t0 = time.perf_counter()
+    build_catalog(pool, args.rows, args.seed, locations=args.locations)
+    results = {"build_catalog": summarize([time.perf_counter() - t0], time.perf_counter() - t0)}
+    results["build_catalog"]["rows_per_sec"] = round(args.rows / (time.perf_counter() - t0), 1)
+
+    peer_path = os.path.join(os.path.dirname(os.path.abspath(db_path)), "bench_peer.db")
+    peer, since = copy_peer(pool, peer_path)
+
+    results.update(bench_single_thread(pool, args.ops, random.Random(args.seed), args.locations))
+    for writers in args.writers:
+        results[f"concurrent_movement_{writers}w"] = bench_concurrent_writers(
+            pool, writers, max(1, args.ops // writers), args.seed
+        )
+    results.update(bench_sync(pool, peer, since, peer_path + ".jsonl.gz"))
+
+    with pool.connection() as conn:
+        schema_version = schema.get_schema_version(conn)
+    report = {
+        "meta": {
+            "rows": args.rows,
+            "ops": args.ops,
+            "locations": args.locations,
+            "cache": args.with_cache,
+            "schema_version": schema_version,
+            "sqlite_version": sqlite3.sqlite_version,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": int(time.time()),
+        },
+        "results": results,
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+    pool.close_all()
+    peer.close_all()
+    for path in (peer_path, peer_path + ".jsonl.gz", peer_path + "-wal", peer_path + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    if workdir is not None:
+        workdir.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Teste de carga da API HTTP (api.py).
+
+Dispara requisições concorrentes com uma mistura de leituras (item por ID,
+listagem, busca, saldos) e movimentações, e mede vazão e latência por tipo de
+requisição. Sem --url, sobe a API no próprio processo sobre um catálogo
+sintético novo (cliente e servidor dividem então o mesmo processo; para números
+de produção, rode `python api.py` à parte e use --url):
+
+    python benchmarks/load_test_api.py --rows 50000 --concurrency 64 --requests 20000
+    python benchmarks/load_test_api.py --url http://servidor:8600 --max-id 5000 --out api.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError  # noqa: E402
+
+import api  # noqa: E402
+import database  # noqa: E402
+from bench_data_layer import summarize  # noqa: E402
+from config import MODELS, SIZES  # noqa: E402
+from synthetic import build_catalog  # noqa: E402
+
+# --- Requisições ---
+
+def random_request(rng, max_id, write_ratio):
+    """Sorteia (nome, método, caminho, corpo) segundo a mistura de leituras e escritas."""
+    if rng.random() < write_ratio:
+        if rng.random() < 0.1:
+            lines = [{"item_id": rng.randint(1, max_id), "type": database.MOVEMENT_IN, "quantity": rng.randint(1, 5)}
+                     for _ in range(rng.randint(2, 10))]
+            return "movement_batch", "POST", "/api/movements/batch", {"lines": lines, "actor": "carga"}
+        movement = {"item_id": rng.randint(1, max_id), "quantity": rng.randint(1, 5), "actor": "carga",
+                    "type": rng.choice([database.MOVEMENT_IN, database.MOVEMENT_OUT])}
+        return "movement", "POST", "/api/movements", movement
+    roll = rng.random()
+    if roll < 0.5:
+        return "item", "GET", f"/api/items/{rng.randint(1, max_id)}", None
+    if roll < 0.7:
+        ids = ",".join(str(rng.randint(1, max_id)) for _ in range(rng.randint(1, 20)))
+        return "balances", "GET", f"/api/balances?ids={ids}", None
+    if roll < 0.9:
+        query = urlencode({"model": rng.choice(MODELS), "size": rng.choice(SIZES), "limit": 50})
+        return "list", "GET", f"/api/items?{query}", None
+    query = urlencode({"q": rng.choice(MODELS)[:3], "limit": 20})
+    return "search", "GET", f"/api/items/search?{query}", None
+
+async def run_load(base_url, total, concurrency, write_ratio, max_id, seed, api_key=None):
+    AsyncHTTPClient.configure(None, max_clients=concurrency)
+    client = AsyncHTTPClient()
+    headers = {"Content-Type": "application/json"}
+    if api_key:
+        headers["X-API-Key"] = api_key
+    latencies = {}
+    errors = {}
+    statuses = {}
+    remaining = iter(range(total))
+
+    async def worker(index):
+        rng = random.Random(seed + index)
+        for _ in remaining:
+            name, method, path, body = random_request(rng, max_id, write_ratio)
+            t0 = time.perf_counter()
+            try:
+                response = await client.fetch(base_url + path, method=method, headers=headers,
+                                              body=json.dumps(body) if body is not None else None)
+                status = response.code
+            except HTTPClientError as e:
+                status = e.code
+            latencies.setdefault(name, []).append(time.perf_counter() - t0)
+            statuses[status] = statuses.get(status, 0) + 1
+            # 404/409 são respostas esperadas (ID apagado, estoque insuficiente); o resto é falha.
+            if status >= 500 or status in (400, 401):
+                errors[name] = errors.get(name, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    client.close()
+
+    results = {name: summarize(values, elapsed, errors.get(name, 0)) for name, values in latencies.items()}
+    results["all"] = summarize([v for values in latencies.values() for v in values], elapsed, sum(errors.values()))
+    results["all"]["status_codes"] = {str(code): count for code, count in sorted(statuses.items())}
+    return results
+
+# --- Servidor local ---
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga da API HTTP do controle de estoque.")
+    parser.add_argument("--url", help="API já em execução (padrão: sobe uma local sobre catálogo sintético)")
+    parser.add_argument("--api-key", help="Valor do cabeçalho X-API-Key")
+    parser.add_argument("--rows", type=int, default=10000, help="Tamanho do catálogo sintético")
+    parser.add_argument("--max-id", type=int, help="Maior ID sorteado (padrão: --rows)")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="Fração de movimentações (0 a 1)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="Grava o resultado em JSON neste arquivo")
+    args = parser.parse_args(argv)
+
+    async def load():
+        if args.url:
+            base_url, server = args.url.rstrip("/"), None
+        else:
+            port = free_port()
+            server = api.make_app(pool).listen(port, address="127.0.0.1")
+            base_url = f"http://127.0.0.1:{port}"
+        try:
+            return await run_load(base_url, args.requests, args.concurrency, args.write_ratio,
+                                  args.max_id or args.rows, args.seed, args.api_key)
+        finally:
+            if server is not None:
+                server.stop()
+
+    workdir = pool = None
+    if args.url is None:
+        workdir = tempfile.TemporaryDirectory()
+        pool = database.get_pool(os.path.join(workdir.name, "carga.db"))
+        pool.cache.max_entries = 0  # mede o SQLite, não o cache
+        build_catalog(pool, args.rows, args.seed)
+
+    results = asyncio.run(load())
+    report = {
+        "meta": {"url": args.url or "local", "rows": args.rows, "requests": args.requests,
+                 "concurrency": args.concurrency, "write_ratio": args.write_ratio,
+                 "timestamp": int(time.time())},
+        "results": results,
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if pool is not None:
+        pool.close_all()
+    if workdir is not None:
+        workdir.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Mede a inicialização do aplicativo: tempo até a primeira resposta HTTP, até a
+primeira pintura da página inicial e o custo de importação por módulo.
+
+Sobe `run_app.py --headless` em um processo novo (com -X importtime), espera o
+/_stcore/health responder e então abre uma sessão pelo WebSocket do Streamlit,
+como faz o navegador: a "primeira pintura" é o primeiro elemento enviado pelo
+app.py e o "script concluído" é o fim da primeira execução da página inicial.
+
+    python benchmarks/startup.py --runs 5 --out startup.json
+    python benchmarks/startup.py --command "dist\\NSLOG_App\\NSLOG_App.exe --headless --port {port}"
+
+Por padrão o aplicativo roda sobre uma cópia da pasta (código, .streamlit e
+uniforms.db) em um diretório temporário, para não tocar o banco do projeto.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shlex
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from tornado.websocket import websocket_connect
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_FILES = (".py", ".db", ".png")
+
+# --- Medição ---
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_for_http(port, started, process, timeout):
+    """Espera o servidor responder; retorna os segundos desde o lançamento do processo."""
+    url = f"http://127.0.0.1:{port}/_stcore/health"
+    while time.perf_counter() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"O aplicativo terminou durante a inicialização (código {process.returncode}).")
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.perf_counter() - started
+        except OSError:
+            time.sleep(0.02)
+    raise TimeoutError(f"O servidor não respondeu em {timeout} s.")
+
+async def first_paint(port, started, timeout):
+    """Abre uma sessão como o navegador e retorna (primeira pintura, script concluído) em segundos."""
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+    ws = await websocket_connect(f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"])
+    message = BackMsg()
+    message.rerun_script.query_string = ""
+    message.rerun_script.page_script_hash = ""
+    await ws.write_message(message.SerializeToString(), binary=True)
+    painted = None
+    try:
+        while True:
+            raw = await asyncio.wait_for(ws.read_message(), timeout)
+            if raw is None:
+                raise RuntimeError("O servidor fechou o WebSocket antes de terminar a página.")
+            forward = ForwardMsg()
+            forward.ParseFromString(raw)
+            kind = forward.WhichOneof("type")
+            if kind == "delta" and painted is None:
+                painted = time.perf_counter() - started
+            elif kind == "script_finished":
+                return painted, time.perf_counter() - started
+    finally:
+        ws.close()
+
+def parse_importtime(stderr):
+    """Converte a saída de -X importtime em {módulo: (próprio µs, acumulado µs)}."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+def import_breakdown(modules, top):
+    """Tempo próprio somado por pacote de topo (sem contagem dupla) e os módulos mais caros."""
+    packages = {}
+    for name, (self_us, _) in modules.items():
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us
+    by_package = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    by_module = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)[:top]
+    return {
+        "total_ms": round(sum(self_us for self_us, _ in modules.values()) / 1000, 1),
+        "modules": len(modules),
+        "by_package_ms": {name: round(us / 1000, 1) for name, us in by_package},
+        "by_module_cumulative_ms": {name: round(cumulative / 1000, 1) for name, (_, cumulative) in by_module},
+    }
+
+def measure_once(command, cwd, port, timeout, top):
+    env = dict(os.environ, PYTHONPROFILEIMPORTTIME="1", PYTHONUNBUFFERED="1")
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=cwd, env=env, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.PIPE, text=True)
+    try:
+        http_s = wait_for_http(port, started, process, timeout)
+        paint_s, finished_s = asyncio.run(first_paint(port, started, timeout))
+    finally:
+        process.terminate()
+        try:
+            _, stderr = process.communicate(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            _, stderr = process.communicate()
+    return {
+        "time_to_http_ms": round(http_s * 1000, 1),
+        "first_paint_ms": round(paint_s * 1000, 1) if paint_s is not None else None,
+        "script_finished_ms": round(finished_s * 1000, 1),
+        "imports": import_breakdown(parse_importtime(stderr), top),
+    }
+
+def copy_app(source, destination):
+    """Copia o necessário para rodar o app (código, banco, logo e .streamlit)."""
+    for name in os.listdir(source):
+        path = os.path.join(source, name)
+        if os.path.isfile(path) and name.endswith(APP_FILES):
+            shutil.copy2(path, destination)
+    if os.path.isdir(os.path.join(source, ".streamlit")):
+        shutil.copytree(os.path.join(source, ".streamlit"), os.path.join(destination, ".streamlit"))
+
+def median(values):
+    values = [v for v in values if v is not None]
+    return round(statistics.median(values), 1) if values else None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede a inicialização do controle de estoque.")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--command", help="Comando a medir; {port} é substituído pela porta livre "
+                                          "(padrão: python run_app.py --headless --port {port})")
+    parser.add_argument("--in-place", action="store_true", help="Roda na pasta do projeto, sem cópia")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--top", type=int, default=15, help="Quantos pacotes/módulos listar")
+    parser.add_argument("--out", help="Grava o resultado em JSON neste arquivo")
+    args = parser.parse_args(argv)
+
+    workdir = None
+    cwd = ROOT
+    if not args.in_place and not args.command:
+        workdir = tempfile.TemporaryDirectory()
+        cwd = workdir.name
+        copy_app(ROOT, cwd)
+
+    runs = []
+    for _ in range(args.runs):
+        port = free_port()
+        if args.command:
+            command = shlex.split(args.command.format(port=port), posix=os.name != "nt")
+        else:
+            command = [sys.executable, "run_app.py", "--headless", "--port", str(port)]
+        runs.append(measure_once(command, cwd, port, args.timeout, args.top))
+
+    report = {
+        "meta": {"command": args.command or "run_app.py", "runs": args.runs, "python": sys.version.split()[0],
+                 "timestamp": int(time.time())},
+        "median": {key: median([run[key] for run in runs])
+                   for key in ("time_to_http_ms", "first_paint_ms", "script_finished_ms")},
+        "runs": runs,
+    }
+    report["median"]["imports_total_ms"] = median([run["imports"]["total_ms"] for run in runs])
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if workdir is not None:
+        workdir.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Gerador de catálogos sintéticos de itens usando os domínios reais de config.py.
+
+Cada combinação de tipo, tamanho, modelo e cor é um item só (chave única), então
+catálogos maiores que o produto dos domínios ganham modelos sintéticos extras
+("Modelo 0001", ...) no catálogo de modelos do banco. Com --locations N, o
+estoque dos itens é distribuído entre N locais ("Local 02", ...).
+
+Uso:
+    python benchmarks/synthetic.py --rows 100000 --locations 10 --db /tmp/estoque_sintetico.db
+"""
+import argparse
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+from config import COLORS, LOCATIONS, MODELS, SIZES, UNIFORM_TYPES  # noqa: E402
+
+DESCRIPTION_WORDS = [
+    "algodão", "poliéster", "manga curta", "manga longa", "bordado", "logo", "reforçado",
+    "antiderrapante", "couro", "lote", "fornecedor", "reposição", "uniforme", "operacional",
+]
+
+def synthetic_models(rows):
+    """Modelos necessários para `rows` combinações distintas: os de config.py e, se faltar, sintéticos."""
+    needed = math.ceil(rows / (len(UNIFORM_TYPES) * len(SIZES) * len(COLORS)))
+    return MODELS + [f"Modelo {i:04d}" for i in range(1, needed - len(MODELS) + 1)]
+
+def synthetic_locations(count):
+    """Nomes de `count` locais: o local padrão de config.py e "Local 02", "Local 03"..."""
+    return LOCATIONS[:1] + [f"Local {i:02d}" for i in range(2, count + 1)]
+
+def generate_uniforms(rows, seed=42):
+    """
+    Gera `rows` tuplas (name, type, size, model, color, quantity, description, sku)
+    reprodutíveis, cada uma com uma combinação de atributos diferente.
+    """
+    rng = random.Random(seed)
+    models = synthetic_models(rows)
+    combinations = len(UNIFORM_TYPES) * len(SIZES) * len(models) * len(COLORS)
+    for i, combination in enumerate(rng.sample(range(combinations), rows)):
+        combination, uniform_type = divmod(combination, len(UNIFORM_TYPES))
+        combination, size = divmod(combination, len(SIZES))
+        color, model = divmod(combination, len(models))
+        uniform_type, size, model, color = UNIFORM_TYPES[uniform_type], SIZES[size], models[model], COLORS[color]
+        # Maioria com saldo moderado, alguns zerados e alguns com muito estoque.
+        quantity = 0 if rng.random() < 0.05 else int(rng.expovariate(1 / 40))
+        description = " ".join(rng.sample(DESCRIPTION_WORDS, rng.randint(0, 4)))
+        yield (f"{model} {color} {uniform_type[:3].upper()} {size} #{i}", uniform_type, size, model,
+               color, quantity, description, f"789{i:010d}")
+
+def build_catalog(pool, rows, seed=42, chunk_size=20000, locations=1):
+    """
+    Preenche o banco do `pool` com `rows` itens sintéticos, em transações de
+    `chunk_size`; o item i recebe o estoque no local i % `locations`.
+    """
+    names = database.get_catalog(pool, refresh=True).names
+    with pool.transaction():
+        for model in synthetic_models(rows):
+            if model not in names["model"]:
+                database.add_catalog_value("model", model, pool=pool)
+        for location in synthetic_locations(locations):
+            if location not in names[database.LOCATION]:
+                database.add_catalog_value(database.LOCATION, location, pool=pool)
+    location_names = synthetic_locations(locations)
+
+    def flush(chunk):
+        for index, location in enumerate(location_names):
+            if chunk[index::len(location_names)]:
+                database.bulk_insert_uniforms(chunk[index::len(location_names)], actor="synthetic",
+                                              location=location, pool=pool)
+
+    chunk = []
+    for row in generate_uniforms(rows, seed):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera um catálogo sintético de itens.")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--locations", type=int, default=1, help="Locais de estoque entre os quais distribuir")
+    parser.add_argument("--db", required=True, help="Arquivo do banco SQLite a preencher")
+    args = parser.parse_args(argv)
+    build_catalog(database.get_pool(args.db), args.rows, args.seed, locations=args.locations)
+    print(f"{args.rows} itens gerados em {args.db} ({args.locations} local(is))")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# --- Configurações e Constantes ---
+DB_NAME = 'uniforms.db'
+
+# Valores iniciais dos catálogos. A migração 6 (schema.py) os grava no banco; a
+# partir daí os catálogos são editados na página "Catálogos", sem mexer aqui.
+UNIFORM_TYPES = ["Masculino", "Feminino"]
+SIZES = ["PP", "P", "M", "G", "GG", "XG", "XXG", "37","38","39","40","41","42","43","44","45"]
+MODELS = ["Polo", "Camiseta básica", "Calçado", "Luva Vaqueta", "Luva"]
+COLORS = ["Branca", "Preta", "Azul", "Vermelha", "Amarela", "Cinza", "Verde", "Roxa", "Laranja"]
+
+# Locais de estoque (depósitos) criados pela migração 9. O primeiro recebe o
+# saldo que já existia e é o local padrão quando nenhum é informado; os demais
+# são cadastrados na página "Catálogos".
+LOCATIONS = ["Depósito Principal"]
+
+# Pragmas aplicados a cada conexão aberta pelo pool (ver database.py).
+# journal_mode precisa vir primeiro: os demais valem para a conexão já em WAL.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",      # leitores não bloqueiam o escritor (e vice-versa)
+    "synchronous": "NORMAL",    # seguro em WAL e bem mais rápido que FULL
+    "cache_size": -20000,       # ~20 MB de cache de páginas por conexão
+    "mmap_size": 268435456,     # 256 MB de leitura via memória mapeada
+    "busy_timeout": 5000,       # ms esperando o lock antes de "database is locked"
+    # Temporários em arquivo (no cache do SO): em memória, o subjournal de SAVEPOINTs
+    # aninhados (fila de escrita + transação da função) fica quadrático em lotes grandes.
+    "temp_store": "DEFAULT",
+    "foreign_keys": "ON",       # itens só apontam para valores existentes nos catálogos
+}
+
+# Quantidade máxima de conexões ociosas mantidas pelo pool.
+DB_POOL_SIZE = 8
+
+# Cache de leituras (ver query_cache.py): número máximo de consultas guardadas e
+# validade de cada uma em segundos. Qualquer escrita no banco invalida o cache.
+QUERY_CACHE_SIZE = 256
+QUERY_CACHE_TTL = 30.0
+
+# Itens com saldo entre 1 e este valor contam como "estoque baixo" no painel.
+LOW_STOCK_THRESHOLD = 5
+
+# Reposição (página "Reposição"): janela de saídas recentes usada para estimar
+# o consumo e quantos dias de consumo a compra sugerida deve cobrir. Só entram
+# na lista os itens com um ponto de reposição definido na edição do item.
+REORDER_LOOKBACK_DAYS = 30
+REORDER_COVER_DAYS = 30
+
+# Operações de banco mais lentas que isto (ms) entram no registro de consultas
+# lentas da página de diagnóstico, com o EXPLAIN QUERY PLAN. 0 desliga.
+SLOW_QUERY_MS = 200
+
+# Fila única de escrita (ver writer.py): todas as gravações passam por uma thread
+# que agrupa os pedidos em um só COMMIT. WRITE_QUEUE_SIZE limita os pedidos
+# pendentes; quem esperar mais de WRITE_QUEUE_TIMEOUT segundos para entrar na
+# fila recebe um erro em vez de travar a tela.
+WRITE_QUEUE_ENABLED = True
+WRITE_QUEUE_SIZE = 1000
+WRITE_BATCH_SIZE = 64
+WRITE_QUEUE_TIMEOUT = 10.0
+
+# Manutenção agendada (maintenance.py run-due; com AUTO_MAINTENANCE o app roda
+# as tarefas sem VACUUM ao abrir, uma vez por processo): intervalo de cada
+# tarefa em horas. Os backups vão para BACKUP_DIR,
+# ao lado do banco, ficando os BACKUP_KEEP mais recentes; a cópia é feita
+# BACKUP_STEP_PAGES páginas por vez, com uma pausa de BACKUP_STEP_SLEEP segundos
+# entre os passos para não segurar o banco. Os instantâneos dos saldos ficam
+# SNAPSHOT_KEEP_DAYS dias; depois disso, só o primeiro de cada mês.
+AUTO_MAINTENANCE = True
+MAINTENANCE_INTERVALS = {"backup": 24, "snapshot": 24, "analyze": 24 * 7, "vacuum": 24 * 30}
+BACKUP_DIR = "backups"
+BACKUP_KEEP = 7
+BACKUP_STEP_PAGES = 256
+BACKUP_STEP_SLEEP = 0.005
+SNAPSHOT_KEEP_DAYS = 90
+
+# API HTTP (api.py) para leitores de código de barras e integrações.
+# Se API_TOKEN estiver definido, toda requisição precisa do cabeçalho X-API-Key.
+# Sem ele a API só aceita ouvir na própria máquina (127.0.0.1).
+API_PORT = 8600
+API_TOKEN = None
+API_WORKERS = 8
@@ -0,0 +1,1720 @@
+import functools
+import json
+import math
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+import metrics
+import schema
+from config import (DB_NAME, DB_POOL_SIZE, QUERY_CACHE_SIZE, QUERY_CACHE_TTL, REORDER_COVER_DAYS,
+                    REORDER_LOOKBACK_DAYS, SNAPSHOT_KEEP_DAYS, SQLITE_PRAGMAS, WRITE_QUEUE_ENABLED)
+from query_cache import QueryCache
+from writer import WriteQueue
+
+# --- Pool de Conexões ---
+
+class ConnectionPool:
+    """
+    Pool de conexões SQLite compartilhado pelo processo.
+
+    Cada thread reutiliza a mesma conexão enquanto estiver dentro de um
+    `connection()`/`transaction()` (chamadas aninhadas não abrem outra), e ao
+    final a conexão volta para a fila de ociosas em vez de ser fechada.
+    """
+
+    def __init__(self, db_path=DB_NAME, pragmas=None, max_idle=DB_POOL_SIZE):
+        self.db_path = db_path
+        self.pragmas = dict(SQLITE_PRAGMAS if pragmas is None else pragmas)
+        self._idle = queue.LifoQueue(maxsize=max_idle)
+        self._local = threading.local()
+        self.cache = QueryCache(db_path, QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+        self.writer = WriteQueue(self) if WRITE_QUEUE_ENABLED else None
+        self.catalog = None  # ver get_catalog()
+        self.catalog_version = 0  # muda a cada alteração confirmada dos catálogos
+        self._catalog_lock = threading.Lock()
+
+    def _connect(self):
+        """Abre uma nova conexão já configurada com os pragmas do pool."""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.pragmas.get("busy_timeout", 5000) / 1000,
+            isolation_level=None,  # transações controladas explicitamente
+            check_same_thread=False,  # a conexão pode mudar de thread entre usos
+        )
+        conn.row_factory = sqlite3.Row # Para acessar colunas por nome
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        if metrics.REGISTRY.slow_ms:
+            conn.set_trace_callback(metrics.REGISTRY.trace)  # SQL das operações lentas
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def _release(self, conn):
+        if conn.in_transaction:  # nunca devolve uma conexão "suja"
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        """Empresta uma conexão para a thread atual (reaproveitada se já houver uma)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+        conn = self._acquire()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._release(conn)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Executa o bloco em uma transação de escrita (BEGIN IMMEDIATE).
+        Se já houver uma transação aberta nesta thread, usa um SAVEPOINT.
+        """
+        with self.connection() as conn:
+            if conn.in_transaction:
+                depth = getattr(self._local, "depth", 0) + 1
+                self._local.depth = depth
+                savepoint = f"sp_{depth}"
+                conn.execute(f"SAVEPOINT {savepoint}")
+                try:
+                    yield conn
+                except BaseException:
+                    conn.execute(f"ROLLBACK TO {savepoint}")
+                    conn.execute(f"RELEASE {savepoint}")
+                    raise
+                else:
+                    conn.execute(f"RELEASE {savepoint}")
+                finally:
+                    self._local.depth = depth - 1
+            else:
+                started = time.perf_counter()
+                conn.execute("BEGIN IMMEDIATE")
+                metrics.REGISTRY.add_lock_wait(time.perf_counter() - started)
+                self._local.catalog_changed = False
+                try:
+                    yield conn
+                except BaseException:
+                    conn.rollback()
+                    raise
+                else:
+                    conn.commit()
+                    self.cache.bump()
+                    if self._local.catalog_changed:
+                        self._drop_catalog()
+                finally:
+                    self._local.catalog_changed = False
+
+    def invalidate_catalog(self):
+        """
+        Descarta os catálogos em memória. Dentro de uma transação, só depois do
+        COMMIT: antes dele outra sessão relê (e guarda) os valores antigos, e se a
+        transação for desfeita não há o que descartar.
+        """
+        if self.in_transaction():
+            self._local.catalog_changed = True
+        else:
+            self._drop_catalog()
+
+    def _drop_catalog(self):
+        with self._catalog_lock:
+            self.catalog_version += 1
+            self.catalog = None
+
+    def store_catalog(self, catalog, version):
+        """Guarda os catálogos lidos se nenhuma alteração foi confirmada durante a leitura."""
+        with self._catalog_lock:
+            if version == self.catalog_version:
+                self.catalog = catalog
+
+    def in_transaction(self):
+        """Indica se a thread atual está dentro de uma transação deste pool."""
+        conn = getattr(self._local, "conn", None)
+        return conn is not None and conn.in_transaction
+
+    def close_all(self):
+        """Fecha todas as conexões ociosas (usado no encerramento do processo)."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        self.cache.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(db_path=DB_NAME):
+    """
+    Retorna o pool do processo para o arquivo de banco informado.
+    Na primeira chamada por arquivo, cria o pool e aplica as migrações pendentes.
+    """
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(db_path)
+            schema.ensure_schema(pool)
+            _pools[key] = pool
+        return pool
+
+def _pool(pool):
+    return pool if pool is not None else get_pool()
+
+def _cached_read(pool, key, loader):
+    """Executa `loader(conn)` através do cache de leituras do pool."""
+    if pool.in_transaction():  # dentro de uma escrita: não cachear dados ainda não confirmados
+        with pool.connection() as conn:
+            return loader(conn)
+    def load():
+        with pool.connection() as conn:
+            return loader(conn)
+    return pool.cache.get_or_load(key, load)
+
+def explain_query_plan(sql, pool=None):
+    """Retorna as linhas do EXPLAIN QUERY PLAN de uma consulta já com os parâmetros embutidos."""
+    with _pool(pool).connection() as conn:
+        return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+
+def instrumented(func):
+    """Mede a função de banco (ver metrics.py); se ficar lenta, guarda o plano das consultas."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        explain = functools.partial(explain_query_plan, pool=kwargs.get("pool"))
+        with metrics.REGISTRY.measure("db", func.__name__, explain) as result:
+            value = func(*args, **kwargs)
+            result["rows"] = metrics.count_rows(value)
+            return value
+    return wrapper
+
+def serialized_write(func):
+    """
+    Encaminha a função de escrita para a fila única do pool (ver writer.py) e espera
+    o resultado. Roda direto quando já está na thread escritora ou dentro de uma
+    transação desta thread (a chamada faz parte de uma escrita maior).
+    Vai por fora de @instrumented: a escrita é medida uma vez, na thread que a
+    executa, com o SQL e o tempo na fila (contado como espera pelo lock).
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        pool = _pool(kwargs.get("pool"))
+        if pool.writer is None or pool.writer.on_writer_thread() or pool.in_transaction():
+            return func(*args, **kwargs)
+        return pool.writer.run(func, *args, **kwargs)
+    return wrapper
+
+def exclusive_write(func):
+    """
+    Como serialized_write, para operações que não podem rodar dentro de uma
+    transação (VACUUM): a thread escritora as roda sozinhas, entre dois grupos
+    de gravações, em vez de disputar o lock com ela.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        pool = _pool(kwargs.get("pool"))
+        if pool.in_transaction():
+            raise sqlite3.OperationalError(f"{func.__name__} não pode rodar dentro de uma transação.")
+        if pool.writer is None or pool.writer.on_writer_thread():
+            return func(*args, **kwargs)
+        return pool.writer.run_exclusive(func, *args, **kwargs)
+    return wrapper
+
+def cache_stats(pool=None):
+    """Estatísticas de acerto/erro do cache de leituras."""
+    return _pool(pool).cache.stats()
+
+# --- Erros de Estoque ---
+
+class StockError(Exception):
+    """Erro de regra de negócio ao movimentar o estoque."""
+
+class UniformNotFoundError(StockError, LookupError):
+    def __init__(self, uniform_id):
+        super().__init__(f"Item {uniform_id} não encontrado.")
+        self.uniform_id = uniform_id
+
+class InsufficientStockError(StockError):
+    def __init__(self, uniform_id, available, requested):
+        super().__init__(
+            f"Estoque insuficiente para o item {uniform_id}: "
+            f"disponível {available}, solicitado {requested}."
+        )
+        self.uniform_id = uniform_id
+        self.available = available
+        self.requested = requested
+
+class BatchValidationError(StockError):
+    """Lote de movimentações rejeitado; nenhuma linha foi aplicada."""
+    def __init__(self, problems):
+        super().__init__(f"{len(problems)} linha(s) do lote não podem ser aplicadas.")
+        self.problems = problems  # lista de (índice da linha, uniform_id, mensagem)
+
+class CatalogValueError(ValueError):
+    """Valor que não existe no catálogo (tipo, tamanho, modelo ou cor), ou que não pode ser alterado."""
+
+class SyncError(Exception):
+    """Pacote de sincronização que não pode ser aplicado neste banco (ver sync.py)."""
+
+class DuplicateUniformError(ValueError):
+    """Já existe outro item com a mesma combinação de atributos ou com o mesmo SKU."""
+    def __init__(self, message, uniform_id=None):
+        super().__init__(message)
+        self.uniform_id = uniform_id  # item que já ocupa a chave, quando conhecido
+
+# --- Funções de Banco de Dados (SQLite) ---
+
+MOVEMENT_IN = "Entrada"
+MOVEMENT_OUT = "Saída"
+MOVEMENT_INITIAL = "Inicial"
+MOVEMENT_ADJUST = "Ajuste"
+MOVEMENT_DELETE = "Exclusão"
+MOVEMENT_MERGE = "Fusão"  # itens duplicados fundidos pela migração 7
+MOVEMENT_TRANSFER = "Transferência"  # par saída/entrada entre dois locais
+
+UNIFORM_COLUMNS = "id, name, type, size, model, color, quantity, description, sku, min_quantity, reorder_level"
+
+# Linha de item como devolvida pelas leituras: tupla compacta com acesso por nome
+# (uniform.quantity em vez de uniform[6]).
+Uniform = namedtuple("Uniform", UNIFORM_COLUMNS)
+
+# --- Catálogos ---
+
+CATALOG_DIMENSIONS = tuple(schema.CATALOG_TABLES)  # ("type", "size", "model", "color")
+
+# Os locais de estoque não são atributo do item, mas têm o mesmo formato (ID, nome,
+# posição) e são administrados e carregados em memória junto com os catálogos.
+LOCATION = "location"
+_VALUE_TABLES = {**schema.CATALOG_TABLES, LOCATION: schema.LOCATION_TABLE}
+
+class Catalog:
+    """Valores dos catálogos e dos locais carregados em memória: nome ↔ ID, na ordem de exibição."""
+
+    __slots__ = ("names", "ids", "by_id", "positions", "loaded_at")
+
+    def __init__(self, rows):
+        """`rows`: tuplas (dimensão, id, nome) já ordenadas pela posição."""
+        self.names = {d: [] for d in _VALUE_TABLES}
+        self.ids = {d: {} for d in _VALUE_TABLES}
+        self.by_id = {d: {} for d in _VALUE_TABLES}
+        for dimension, value_id, name in rows:
+            self.names[dimension].append(name)
+            self.ids[dimension][name] = value_id
+            self.by_id[dimension][value_id] = name
+        self.positions = {d: {name: i for i, name in enumerate(names)} for d, names in self.names.items()}
+        self.loaded_at = time.monotonic()
+
+    @classmethod
+    def load(cls, conn):
+        sql = " UNION ALL ".join(
+            f"SELECT '{dimension}', id, name, position FROM {table}"
+            for dimension, table in _VALUE_TABLES.items()
+        )
+        return cls(row[:3] for row in conn.execute(f"{sql} ORDER BY 1, 4, 2"))
+
+def get_catalog(pool=None, refresh=False):
+    """
+    Catálogos do pool, relidos do banco quando alterados por este processo ou após
+    QUERY_CACHE_TTL segundos (alterações feitas por outro processo).
+    """
+    pool = _pool(pool)
+    catalog = pool.catalog
+    if refresh or catalog is None or time.monotonic() - catalog.loaded_at > QUERY_CACHE_TTL:
+        version = pool.catalog_version
+        with pool.connection() as conn:
+            catalog = Catalog.load(conn)
+        pool.store_catalog(catalog, version)
+    return catalog
+
+def _catalog_ids(pool, **values):
+    """Converte {dimensão: nome} em {dimensão: id}; relê o catálogo uma vez se algum nome for novo."""
+    catalog = get_catalog(pool)
+    if any(name not in catalog.ids[d] for d, name in values.items()):
+        catalog = get_catalog(pool, refresh=True)
+    ids = {}
+    for dimension, name in values.items():
+        if name not in catalog.ids[dimension]:
+            raise CatalogValueError(f"Valor inválido para {dimension}: '{name}'")
+        ids[dimension] = catalog.ids[dimension][name]
+    return ids
+
+def _location_id(pool, location=None):
+    """ID do local de estoque pelo nome; None é o local padrão (o primeiro da lista)."""
+    if location is None:
+        names = get_catalog(pool).names[LOCATION]
+        if not names:
+            raise CatalogValueError("Nenhum local de estoque cadastrado.")
+        return get_catalog(pool).ids[LOCATION][names[0]]
+    return _catalog_ids(pool, location=location)[LOCATION]
+
+def _record_movement(conn, uniform_id, location, delta, movement_type, actor=None):
+    """Acrescenta uma linha ao livro-razão (deve rodar dentro da transação da alteração)."""
+    conn.execute("""
+        INSERT INTO stock_movements (uniform_id, delta, movement_type, created_at, actor, location_id)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (uniform_id, delta, movement_type, int(time.time()), actor, location))
+
+# Entrada no saldo do local: cria a linha na primeira vez que o item entra nele.
+_ADD_BALANCE_SQL = """
+    INSERT INTO stock_balances (location_id, uniform_id, quantity) VALUES (?, ?, ?)
+    ON CONFLICT (location_id, uniform_id) DO UPDATE SET quantity = quantity + excluded.quantity
+"""
+
+def _apply_movement(conn, uniform_id, location, delta, movement_type, actor=None):
+    """
+    Aplica `delta` ao saldo do item no local `location` (ID) com um único comando
+    (a saída é um UPDATE condicional, que só acontece se houver saldo) e registra
+    a movimentação. O total do item é ajustado pelos triggers. Retorna o novo
+    saldo no local.
+    """
+    if delta >= 0:
+        try:
+            row = conn.execute(_ADD_BALANCE_SQL + " RETURNING quantity", (location, uniform_id, delta)).fetchone()
+        except sqlite3.IntegrityError:  # chave estrangeira: item (ou local) inexistente
+            if conn.execute("SELECT 1 FROM uniforms WHERE id = ?", (uniform_id,)).fetchone() is None:
+                raise UniformNotFoundError(uniform_id) from None
+            raise
+    else:
+        row = conn.execute("""
+            UPDATE stock_balances SET quantity = quantity + ?
+            WHERE location_id = ? AND uniform_id = ? AND quantity + ? >= 0
+            RETURNING quantity
+        """, (delta, location, uniform_id, delta)).fetchone()
+        if row is None:
+            if conn.execute("SELECT 1 FROM uniforms WHERE id = ?", (uniform_id,)).fetchone() is None:
+                raise UniformNotFoundError(uniform_id)
+            current = conn.execute(
+                "SELECT quantity FROM stock_balances WHERE location_id = ? AND uniform_id = ?",
+                (location, uniform_id),
+            ).fetchone()
+            raise InsufficientStockError(uniform_id, current[0] if current else 0, -delta)
+    _record_movement(conn, uniform_id, location, delta, movement_type, actor)
+    return row[0]
+
+
+def _normalize_sku(sku):
+    """SKU sem espaços nas pontas; vazio vira None (item sem código)."""
+    sku = str(sku).strip() if sku is not None else ""
+    return sku or None
+
+def _duplicate_error(conn, error, sku=None, keys=None):
+    """Converte a violação de uma chave única de `uniforms` em DuplicateUniformError."""
+    message = str(error)
+    if "uniforms.sku" in message:
+        if sku is None:  # cadastro em lote: não se sabe qual linha
+            return DuplicateUniformError("Um dos SKUs informados já pertence a outro item.")
+        row = conn.execute("SELECT id FROM uniforms WHERE sku = ?", (sku,)).fetchone()
+        return DuplicateUniformError(f"O SKU '{sku}' já pertence ao item {row[0] if row else '?'}.",
+                                     row[0] if row else None)
+    if "uniforms.model_id" in message and keys:
+        row = conn.execute(
+            "SELECT id FROM uniforms WHERE model_id = ? AND type_id = ? AND size_id = ? AND color_id = ?",
+            (keys["model"], keys["type"], keys["size"], keys["color"]),
+        ).fetchone()
+        return DuplicateUniformError(
+            f"Já existe o item {row[0] if row else '?'} com este tipo, tamanho, modelo e cor.",
+            row[0] if row else None,
+        )
+    return None
+
+# Cadastro por upsert na chave única (modelo, tipo, tamanho, cor): a mesma
+# combinação devolve o item existente. O SKU só é gravado se o item ainda não
+# tiver um. A quantidade entra depois, no saldo do local (stock_balances).
+_UPSERT_SQL = """
+    INSERT INTO uniforms (name, type_id, size_id, model_id, color_id, quantity, description, sku)
+    VALUES (?, ?, ?, ?, ?, 0, ?, ?)
+    ON CONFLICT (model_id, type_id, size_id, color_id) DO UPDATE SET
+        sku = COALESCE(sku, excluded.sku)
+    RETURNING id
+"""
+
+@serialized_write
+@instrumented
+def upsert_uniform(name, uniform_type, size, model, color, quantity, description, sku=None, actor=None,
+                   location=None, pool=None):
+    """
+    Cadastra um item ou, se a combinação de tipo, tamanho, modelo e cor já
+    existir, soma `quantity` ao item existente (registrado como entrada), no
+    local `location` (None = local padrão). Retorna (ID do item, True se foi
+    criado agora).
+    """
+    pool = _pool(pool)
+    ids = _catalog_ids(pool, type=uniform_type, size=size, model=model, color=color)
+    location = _location_id(pool, location)
+    sku = _normalize_sku(sku)
+    with pool.transaction() as conn:
+        # Com o lock de escrita em mãos, um ID novo é necessariamente maior que este.
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM uniforms").fetchone()[0]
+        try:
+            uniform_id = conn.execute(_UPSERT_SQL, (
+                name, ids["type"], ids["size"], ids["model"], ids["color"], description, sku,
+            )).fetchone()[0]
+        except sqlite3.IntegrityError as e:
+            raise _duplicate_error(conn, e, sku) or e from None
+        created = uniform_id > last_id
+        if quantity or created:  # item novo aparece no local mesmo sem saldo
+            conn.execute(_ADD_BALANCE_SQL, (location, uniform_id, quantity))
+        if quantity:
+            _record_movement(conn, uniform_id, location, quantity, MOVEMENT_INITIAL if created else MOVEMENT_IN,
+                             actor)
+        return uniform_id, created
+
+def insert_uniform(name, uniform_type, size, model, color, quantity, description, sku=None, actor=None,
+                   location=None, pool=None):
+    """Cadastra um item (ou soma ao existente, ver upsert_uniform) e retorna o ID."""
+    return upsert_uniform(name, uniform_type, size, model, color, quantity, description, sku, actor, location,
+                          pool=pool)[0]
+
+@serialized_write
+@instrumented
+def bulk_insert_uniforms(rows, actor=None, location=None, pool=None):
+    """
+    Cadastra muitos itens em uma única transação, com o mesmo upsert do cadastro
+    individual, e soma as quantidades ao local `location` (None = local padrão).
+    `rows` são tuplas (name, type, size, model, color, quantity,
+    description[, sku]), com os nomes dos valores de catálogo; um nome
+    desconhecido ou um SKU de outro item cancela o bloco inteiro. Linhas com a
+    mesma combinação de atributos viram um único item. Retorna quantas linhas
+    foram aplicadas.
+    """
+    pool = _pool(pool)
+    ids = get_catalog(pool, refresh=True).ids
+    location = _location_id(pool, location)
+
+    def encoded():
+        for name, uniform_type, size, model, color, quantity, description, *sku in rows:
+            try:
+                keys = (ids["type"][uniform_type], ids["size"][size], ids["model"][model], ids["color"][color])
+            except KeyError as e:
+                raise CatalogValueError(f"Valor inválido: '{e.args[0]}'") from None
+            yield (name, *keys, quantity, description, _normalize_sku(sku[0] if sku else None))
+
+    with pool.transaction() as conn:
+        # As linhas passam por uma tabela temporária para o bloco ser aplicado com
+        # poucos comandos: upsert dos itens agrupado por chave (na ordem do
+        # arquivo), depois saldo no local e livro-razão a partir da soma por item.
+        conn.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS uniform_import (
+                name, type_id, size_id, model_id, color_id, quantity, description, sku
+            )
+        """)
+        conn.execute("DELETE FROM temp.uniform_import")
+        applied = conn.executemany(
+            "INSERT INTO temp.uniform_import VALUES (?, ?, ?, ?, ?, ?, ?, ?)", encoded()
+        ).rowcount
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM uniforms").fetchone()[0]
+        try:
+            conn.execute("""
+                INSERT INTO uniforms (name, type_id, size_id, model_id, color_id, quantity, description, sku)
+                SELECT name, type_id, size_id, model_id, color_id, 0, description, sku
+                FROM (
+                    SELECT name, type_id, size_id, model_id, color_id, description, sku, MIN(rowid) AS first_row
+                    FROM temp.uniform_import
+                    GROUP BY model_id, type_id, size_id, color_id
+                ) WHERE true
+                ORDER BY first_row
+                ON CONFLICT (model_id, type_id, size_id, color_id) DO UPDATE SET
+                    sku = COALESCE(sku, excluded.sku)
+            """)
+        except sqlite3.IntegrityError as e:
+            raise _duplicate_error(conn, e) or e from None
+        # CROSS JOIN fixa a ordem: percorre o bloco e acha cada item pela chave única.
+        conn.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS uniform_import_totals (uniform_id INTEGER PRIMARY KEY, quantity)
+        """)
+        conn.execute("""
+            INSERT INTO temp.uniform_import_totals
+            SELECT u.id, SUM(r.quantity)
+            FROM temp.uniform_import AS r CROSS JOIN uniforms AS u
+            ON u.model_id = r.model_id AND u.type_id = r.type_id AND u.size_id = r.size_id
+               AND u.color_id = r.color_id
+            GROUP BY u.id
+        """)
+        conn.execute("""
+            INSERT INTO stock_balances (location_id, uniform_id, quantity)
+            SELECT ?, uniform_id, quantity FROM temp.uniform_import_totals
+            WHERE quantity <> 0 OR uniform_id > ?
+            ON CONFLICT (location_id, uniform_id) DO UPDATE SET quantity = quantity + excluded.quantity
+        """, (location, last_id))
+        conn.execute("""
+            INSERT INTO stock_movements (uniform_id, delta, movement_type, created_at, actor, location_id)
+            SELECT uniform_id, quantity, CASE WHEN uniform_id > ? THEN ? ELSE ? END, ?, ?, ?
+            FROM temp.uniform_import_totals WHERE quantity <> 0
+        """, (last_id, MOVEMENT_INITIAL, MOVEMENT_IN, int(time.time()), actor, location))
+        conn.execute("DELETE FROM temp.uniform_import")
+        conn.execute("DELETE FROM temp.uniform_import_totals")
+        return applied
+
+@instrumented
+def select_all_uniforms(pool=None):
+    """Retorna todos os itens cadastrados."""
+    rows = _cached_read(_pool(pool), ("select_all_uniforms",), lambda conn: tuple(
+        Uniform._make(row) for row in conn.execute(f"SELECT {UNIFORM_COLUMNS} FROM uniform_records")
+    ))
+    return list(rows)
+
+# --- Listagem Paginada ---
+
+# Colunas aceitas na ordenação (todas NOT NULL, o que a paginação por chave exige).
+# Tipo, tamanho, modelo e cor ordenam pela chave do catálogo, que tem índice: a
+# ordem em que os valores foram cadastrados, não a posição nas listas de seleção
+# (reordenar um catálogo não muda a ordenação da listagem).
+SORT_COLUMNS = ("id", "type", "size", "model", "color", "quantity")
+_SORT_KEYS = {"id": "id", "type": "type_id", "size": "size_id", "model": "model_id",
+              "color": "color_id", "quantity": "quantity"}
+
+def build_filter_clause(filters, pool=None):
+    """
+    Converte o dicionário de filtros da listagem em (cláusula WHERE, parâmetros),
+    válida tanto em `uniforms` quanto em `uniform_records`. Chaves aceitas: type,
+    size, model, color (nome ou lista de nomes, comparados pela chave do
+    catálogo), min_quantity e max_quantity.
+    """
+    clauses, params = [], []
+    for column in CATALOG_DIMENSIONS:
+        value = (filters or {}).get(column)
+        if not value:
+            continue
+        names = [value] if isinstance(value, str) else list(value)
+        ids = get_catalog(pool).ids[column]
+        if any(name not in ids for name in names):
+            ids = get_catalog(pool, refresh=True).ids[column]
+        keys = [ids[name] for name in names if name in ids]
+        if not keys:
+            clauses.append("0")  # nenhum dos valores existe: nenhum item atende
+            continue
+        clauses.append(f"{column}_id IN ({', '.join('?' * len(keys))})")
+        params.extend(keys)
+    if (filters or {}).get("min_quantity") is not None:
+        clauses.append("quantity >= ?")
+        params.append(filters["min_quantity"])
+    if (filters or {}).get("max_quantity") is not None:
+        clauses.append("quantity <= ?")
+        params.append(filters["max_quantity"])
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+    return where, params
+
+def list_source(filters, location=None, pool=None):
+    """
+    (tabela ou view, cláusula WHERE, parâmetros) da listagem: todos os itens com o
+    saldo total, ou só os itens do local `location`, com o saldo no local (a view
+    location_records, com uma linha por item e a coluna location_id).
+    """
+    where, params = build_filter_clause(filters, pool)
+    if location is None:
+        return "uniform_records", where, params
+    where = " WHERE location_id = ?" + (" AND " + where[len(" WHERE "):] if where else "")
+    return "location_records", where, [_location_id(_pool(pool), location), *params]
+
+@instrumented
+def list_uniforms(filters=None, sort="id", descending=False, after=None, limit=50, location=None, pool=None):
+    """
+    Retorna uma página de itens e o cursor da próxima página (ou None se for a última).
+    Com `location`, lista só os itens que têm saldo no local, e `quantity` (inclusive
+    nos filtros e na ordenação) é o saldo no local.
+
+    A paginação é por chave (keyset): `after` é o par (valor da chave de ordenação,
+    id) da última linha da página anterior, então cada página custa o mesmo,
+    independentemente de quantas linhas vieram antes dela.
+    """
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"Coluna de ordenação inválida: {sort}")
+    key = _SORT_KEYS[sort]
+    source, where, params = list_source(filters, location, pool)
+    direction, op = ("DESC", "<") if descending else ("ASC", ">")
+    if after is not None:
+        keyset = f"({key}, id) {op} (?, ?)" if sort != "id" else f"id {op} ?"
+        where += (" AND " if where else " WHERE ") + keyset
+        params += list(after) if sort != "id" else [after[-1]]
+    order = f"{key} {direction}, id {direction}" if sort != "id" else f"id {direction}"
+    sql = f"SELECT {UNIFORM_COLUMNS}, {key} FROM {source}{where} ORDER BY {order} LIMIT ?"
+    params.append(limit + 1)
+    rows = list(_cached_read(_pool(pool), (sql, tuple(params)), lambda conn: tuple(
+        (Uniform._make(row[:-1]), row[-1]) for row in conn.execute(sql, params)
+    )))
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        uniform, sort_value = rows[-1]
+        next_cursor = (sort_value, uniform.id)
+    return [uniform for uniform, _ in rows], next_cursor
+
+@instrumented
+def count_uniforms(filters=None, location=None, pool=None):
+    """Retorna quantos itens atendem aos filtros da listagem (no local `location`, se informado)."""
+    source, where, params = list_source(filters, location, pool)
+    if source == "uniform_records":
+        source = "uniforms"  # sem os JOINs dos nomes
+    sql = f"SELECT COUNT(*) FROM {source}{where}"
+    return _cached_read(_pool(pool), (sql, tuple(params)), lambda conn: conn.execute(sql, params).fetchone()[0])
+
+# --- Busca de Itens ---
+
+def _fts_query(text):
+    """Monta a expressão MATCH: todos os termos, cada um como prefixo."""
+    terms = [term.replace('"', '""') for term in text.split()]
+    return " ".join(f'"{term}"*' for term in terms)
+
+@instrumented
+def search_uniforms(text, limit=20, pool=None):
+    """
+    Busca incremental por nome, descrição ou atributos, com correspondência por
+    prefixo e ordenação por relevância. Um SKU lido pelo leitor de código de
+    barras ou um número de ID digitado encontram o item exato, que aparece em
+    primeiro lugar.
+    """
+    text = (text or "").strip()
+    if not text:
+        return []
+    def load(conn):
+        results = []
+        if " " not in text:
+            row = conn.execute(f"SELECT {UNIFORM_COLUMNS} FROM uniform_records WHERE sku = ?", (text,)).fetchone()
+            if row:
+                results.append(Uniform._make(row))
+        if text.isdigit():
+            row = conn.execute(
+                f"SELECT {UNIFORM_COLUMNS} FROM uniform_records WHERE id = ?", (int(text),)
+            ).fetchone()
+            if row and not any(r.id == row[0] for r in results):
+                results.append(Uniform._make(row))
+        rows = conn.execute(f"""
+            SELECT {", ".join("u." + c for c in Uniform._fields)}
+            FROM uniforms_fts JOIN uniform_records AS u ON u.id = uniforms_fts.rowid
+            WHERE uniforms_fts MATCH ?
+            ORDER BY rank LIMIT ?
+        """, (_fts_query(text), limit)).fetchall()
+        seen = {row[0] for row in results}
+        results.extend(Uniform._make(row) for row in rows if row[0] not in seen)
+        return tuple(results[:limit])
+    return list(_cached_read(_pool(pool), ("search_uniforms", text, limit), load))
+
+@instrumented
+def select_uniform_by_sku(sku, pool=None):
+    """Retorna o item com este SKU (código de barras), ou None; busca pelo índice único."""
+    sku = _normalize_sku(sku)
+    if sku is None:
+        return None
+    def load(conn):
+        row = conn.execute(f"SELECT {UNIFORM_COLUMNS} FROM uniform_records WHERE sku = ?", (sku,)).fetchone()
+        return Uniform._make(row) if row else None
+    return _cached_read(_pool(pool), ("select_uniform_by_sku", sku), load)
+
+@instrumented
+def select_sku_keys(skus, pool=None):
+    """
+    Retorna {sku: (tipo, tamanho, modelo, cor)} dos itens já cadastrados com os
+    SKUs informados, em uma única consulta pelo índice único de sku.
+    """
+    skus = sorted({sku for sku in map(_normalize_sku, skus) if sku is not None})
+    if not skus:
+        return {}
+    with _pool(pool).connection() as conn:
+        # A lista vai como um array JSON: um parâmetro só, qualquer que seja o tamanho do bloco.
+        return {sku: tuple(key) for sku, *key in conn.execute("""
+            SELECT sku, type, size, model, color FROM uniform_records
+            WHERE sku IN (SELECT value FROM json_each(?))
+        """, (json.dumps(skus),))}
+
+@instrumented
+def select_uniform_by_id(uniform_id, pool=None):
+    """Retorna um itens pelo seu ID."""
+    def load(conn):
+        row = conn.execute(
+            f"SELECT {UNIFORM_COLUMNS} FROM uniform_records WHERE id = ?", (uniform_id,)
+        ).fetchone()
+        return Uniform._make(row) if row else None
+    return _cached_read(_pool(pool), ("select_uniform_by_id", uniform_id), load)
+
+@serialized_write
+@instrumented
+def update_uniform(uniform_id, name, uniform_type, size, model, color, description, sku=None, levels=None,
+                   pool=None):
+    """
+    Atualiza os atributos de um itens (exceto a quantidade). `sku=None` mantém o
+    SKU atual e `sku=""` o remove. Levar o item para a combinação de atributos
+    (ou o SKU) de outro item gera DuplicateUniformError. `levels`, se informado,
+    é o par (estoque mínimo, ponto de reposição), gravado na mesma transação;
+    ponto de reposição None ou 0 tira o item da lista de reposição.
+    """
+    pool = _pool(pool)
+    ids = _catalog_ids(pool, type=uniform_type, size=size, model=model, color=color)
+    new_sku = _normalize_sku(sku)
+    if levels is not None:
+        levels = _check_reorder_levels(*levels)
+    with pool.transaction() as conn:
+        try:
+            cursor = conn.execute("""
+                UPDATE uniforms
+                SET name = ?, type_id = ?, size_id = ?, model_id = ?, color_id = ?, description = ?,
+                    sku = CASE WHEN ? THEN ? ELSE sku END
+                WHERE id = ?
+            """, (name, ids["type"], ids["size"], ids["model"], ids["color"], description,
+                  sku is not None, new_sku, uniform_id))
+        except sqlite3.IntegrityError as e:
+            raise _duplicate_error(conn, e, new_sku, ids) or e from None
+        if levels is not None:
+            conn.execute("UPDATE uniforms SET min_quantity = ?, reorder_level = ? WHERE id = ?", (*levels, uniform_id))
+        return cursor.rowcount > 0
+
+@serialized_write
+@instrumented
+def update_uniform_quantity(uniform_id, new_quantity, actor=None, location=None, pool=None):
+    """
+    Define a quantidade em estoque de um itens no local `location` (None = local
+    padrão), registrando a diferença como ajuste.
+    """
+    pool = _pool(pool)
+    location = _location_id(pool, location)
+    with pool.transaction() as conn:
+        row = conn.execute("""
+            SELECT COALESCE(b.quantity, 0) FROM uniforms AS u
+            LEFT JOIN stock_balances AS b ON b.location_id = ? AND b.uniform_id = u.id
+            WHERE u.id = ?
+        """, (location, uniform_id)).fetchone()
+        if row is None:
+            return False
+        if new_quantity != row[0]:
+            _apply_movement(conn, uniform_id, location, new_quantity - row[0], MOVEMENT_ADJUST, actor)
+        return True
+
+@serialized_write
+@instrumented
+def apply_movement(uniform_id, delta, movement_type, actor=None, location=None, pool=None):
+    """
+    Soma `delta` (positivo na entrada, negativo na saída) ao saldo do item no local
+    `location` (None = local padrão) de forma atômica e grava a movimentação na
+    mesma transação. Retorna o novo saldo no local.
+    Levanta InsufficientStockError se a saída deixaria o saldo do local negativo.
+    """
+    pool = _pool(pool)
+    location = _location_id(pool, location)
+    with pool.transaction() as conn:
+        return _apply_movement(conn, uniform_id, location, delta, movement_type, actor)
+
+def move_stock(uniform_id, movement_type, quantity, actor=None, location=None, pool=None):
+    """Entrada ou Saída de `quantity` unidades no local. Retorna o novo saldo no local."""
+    if quantity <= 0:
+        raise ValueError("A quantidade movimentada deve ser positiva.")
+    delta = quantity if movement_type == MOVEMENT_IN else -quantity
+    return apply_movement(uniform_id, delta, movement_type, actor, location, pool=pool)
+
+@serialized_write
+@instrumented
+def transfer_stock(uniform_id, quantity, from_location, to_location, actor=None, pool=None):
+    """
+    Transfere `quantity` unidades do item entre dois locais em uma única transação:
+    saída na origem e entrada no destino, ambas como "Transferência" no
+    livro-razão. O total do item não muda. Retorna (saldo na origem, saldo no destino).
+    """
+    if quantity <= 0:
+        raise ValueError("A quantidade transferida deve ser positiva.")
+    pool = _pool(pool)
+    source, target = _location_id(pool, from_location), _location_id(pool, to_location)
+    if source == target:
+        raise ValueError("A origem e o destino da transferência devem ser locais diferentes.")
+    with pool.transaction() as conn:
+        return (_apply_movement(conn, uniform_id, source, -quantity, MOVEMENT_TRANSFER, actor),
+                _apply_movement(conn, uniform_id, target, quantity, MOVEMENT_TRANSFER, actor))
+
+# --- Movimentação em Lote ---
+
+SQLITE_MAX_PARAMS = 500  # tamanho dos blocos de IN (...) para não estourar o limite de parâmetros
+
+def _fetch_balances(conn, uniform_ids, location=None):
+    """
+    Retorna {id: quantidade} para os itens informados que existem: o total do item
+    ou, com `location` (ID), o saldo no local (0 se o item nunca esteve nele).
+    """
+    uniform_ids = list(uniform_ids)
+    balances = {}
+    for start in range(0, len(uniform_ids), SQLITE_MAX_PARAMS):
+        chunk = uniform_ids[start:start + SQLITE_MAX_PARAMS]
+        marks = ", ".join("?" * len(chunk))
+        if location is None:
+            rows = conn.execute(f"SELECT id, quantity FROM uniforms WHERE id IN ({marks})", chunk)
+        else:
+            rows = conn.execute(f"""
+                SELECT u.id, COALESCE(b.quantity, 0) FROM uniforms AS u
+                LEFT JOIN stock_balances AS b ON b.location_id = ? AND b.uniform_id = u.id
+                WHERE u.id IN ({marks})
+            """, (location, *chunk))
+        balances.update((row[0], row[1]) for row in rows)
+    return balances
+
+def _check_batch(conn, lines, location):
+    """
+    Simula o lote na ordem das linhas. Retorna (deltas por linha, saldo final por
+    item, problemas); cada problema é (índice da linha, uniform_id, mensagem).
+    """
+    problems = []
+    deltas = []
+    for index, (uniform_id, movement_type, quantity) in enumerate(lines):
+        if movement_type not in (MOVEMENT_IN, MOVEMENT_OUT):
+            problems.append((index, uniform_id, f"Tipo de movimentação inválido: {movement_type}"))
+        elif quantity <= 0:
+            problems.append((index, uniform_id, "A quantidade movimentada deve ser positiva."))
+        deltas.append(quantity if movement_type == MOVEMENT_IN else -quantity)
+
+    balances = _fetch_balances(conn, {line[0] for line in lines}, location)
+    for index, ((uniform_id, _, _), delta) in enumerate(zip(lines, deltas)):
+        if uniform_id not in balances:
+            problems.append((index, uniform_id, f"Item {uniform_id} não encontrado."))
+            continue
+        if balances[uniform_id] + delta < 0:
+            problems.append((index, uniform_id,
+                             f"Estoque insuficiente: disponível {balances[uniform_id]}, solicitado {-delta}."))
+            continue
+        balances[uniform_id] += delta
+    problems.sort()
+    return deltas, balances, problems
+
+@instrumented
+def select_balances(uniform_ids, location=None, pool=None):
+    """
+    Retorna {id: quantidade} dos itens informados (IDs inexistentes ficam de fora):
+    o total de cada item ou, com `location`, o saldo no local.
+    """
+    pool = _pool(pool)
+    location = _location_id(pool, location) if location is not None else None
+    with pool.connection() as conn:
+        return _fetch_balances(conn, set(uniform_ids), location)
+
+@instrumented
+def select_item_balances(uniform_id, pool=None):
+    """Saldos do item por local, como [(nome do local, quantidade)] na ordem dos locais."""
+    pool = _pool(pool)
+    sql = "SELECT location_id, quantity FROM stock_balances WHERE uniform_id = ?"
+    rows = _cached_read(pool, (sql, uniform_id), lambda conn: tuple(
+        tuple(row) for row in conn.execute(sql, (uniform_id,))
+    ))
+    catalog = get_catalog(pool)
+    if any(location not in catalog.by_id[LOCATION] for location, _ in rows):
+        catalog = get_catalog(pool, refresh=True)
+    names = catalog.by_id[LOCATION]
+    positions = catalog.positions[LOCATION]
+    named = [(names.get(location, str(location)), quantity) for location, quantity in rows]
+    return sorted(named, key=lambda row: positions.get(row[0], len(positions)))
+
+@instrumented
+def validate_stock_batch(lines, location=None, pool=None):
+    """
+    Confere um lote de (uniform_id, "Entrada"/"Saída", quantidade) no local
+    `location` (None = local padrão) sem gravar nada.
+    Retorna (saldos previstos por item no local, problemas).
+    """
+    lines = list(lines)
+    pool = _pool(pool)
+    location = _location_id(pool, location)
+    with pool.connection() as conn:
+        _, balances, problems = _check_batch(conn, lines, location)
+    return balances, problems
+
+@serialized_write
+@instrumented
+def move_stock_batch(lines, actor=None, location=None, pool=None):
+    """
+    Aplica um lote de (uniform_id, "Entrada"/"Saída", quantidade) no local
+    `location` (None = local padrão) em uma única transação, tudo ou nada: se
+    qualquer linha for inválida ou deixar um saldo negativo, levanta
+    BatchValidationError e nada é gravado.
+    Retorna {uniform_id: novo saldo no local}.
+    """
+    lines = list(lines)
+    pool = _pool(pool)
+    location = _location_id(pool, location)
+    with pool.transaction() as conn:
+        # Com o lock de escrita em mãos os saldos lidos aqui não mudam até o COMMIT.
+        deltas, balances, problems = _check_batch(conn, lines, location)
+        if problems:
+            raise BatchValidationError(problems)
+        net = {}
+        for (uniform_id, _, _), delta in zip(lines, deltas):
+            net[uniform_id] = net.get(uniform_id, 0) + delta
+        # O saldo final já foi validado: uma saída líquida sempre encontra a linha do local.
+        conn.executemany(_ADD_BALANCE_SQL, [(location, uniform_id, delta) for uniform_id, delta in net.items()
+                                            if delta])
+        now = int(time.time())
+        conn.executemany("""
+            INSERT INTO stock_movements (uniform_id, delta, movement_type, created_at, actor, location_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [(uniform_id, delta, movement_type, now, actor, location)
+              for (uniform_id, movement_type, _), delta in zip(lines, deltas)])
+        return {uniform_id: balances[uniform_id] for uniform_id in net}
+
+# --- Resumo do Estoque ---
+
+@instrumented
+def stock_summary(dimension=None, pool=None):
+    """
+    Lê o resumo mantido por triggers: tuplas (dimension, value, items, quantity,
+    zero_items, low_items), com `value` já convertido no nome do catálogo e na
+    ordem de exibição. Sem `dimension`, retorna todas as dimensões.
+    """
+    pool = _pool(pool)
+    sql = "SELECT dimension, value, items, quantity, zero_items, low_items FROM stock_summary WHERE items > 0"
+    params = ()
+    if dimension:
+        sql += " AND dimension = ?"
+        params = (dimension,)
+    rows = _cached_read(pool, (sql, params), lambda conn: tuple(
+        tuple(row) for row in conn.execute(sql, params)
+    ))
+    catalog = get_catalog(pool)
+    if any(d in catalog.by_id and value not in catalog.by_id[d] for d, value, *_ in rows):
+        catalog = get_catalog(pool, refresh=True)
+    named = []
+    for d, value, *totals in rows:
+        name = catalog.by_id[d].get(value, str(value)) if d in catalog.by_id else ""
+        named.append((d, name, *totals))
+    named.sort(key=lambda row: (row[0], catalog.positions.get(row[0], {}).get(row[1], 0)))
+    return named
+
+@instrumented
+def check_stock_summary(pool=None):
+    """
+    Compara stock_summary com o resumo recalculado a partir de `uniforms` e de
+    stock_balances, e o total de cada item com a soma dos seus saldos por local.
+    Retorna a lista de divergências (dimension, value, mantido, recalculado), com
+    dimension "item" para os totais; vazia se estiver tudo certo.
+    """
+    with _pool(pool).connection() as conn:
+        stored = {
+            (row[0], row[1]): tuple(row[2:])
+            for row in conn.execute("SELECT * FROM stock_summary WHERE items <> 0 OR quantity <> 0")
+        }
+        expected = {
+            (row[0], row[1]): tuple(row[2:])
+            for sql in (schema.summary_source_sql(), schema.location_summary_source_sql())
+            for row in conn.execute(sql)
+        }
+        items = [("item", row[0], (row[1],), (row[2],)) for row in conn.execute("""
+            SELECT u.id, u.quantity, COALESCE(b.quantity, 0) FROM uniforms AS u
+            LEFT JOIN (SELECT uniform_id, SUM(quantity) AS quantity FROM stock_balances GROUP BY uniform_id) AS b
+            ON b.uniform_id = u.id
+            WHERE u.quantity <> COALESCE(b.quantity, 0)
+        """)]
+    return [
+        (key[0], key[1], stored.get(key), expected.get(key))
+        for key in sorted(stored.keys() | expected.keys())
+        if stored.get(key) != expected.get(key)
+    ] + items
+
+@serialized_write
+@instrumented
+def rebuild_stock_summary(pool=None):
+    """
+    Recria os triggers (com o limite de estoque baixo atual), corrige o total dos
+    itens pela soma dos saldos por local e recalcula o resumo inteiro.
+    """
+    with _pool(pool).transaction() as conn:
+        schema.create_summary_triggers(conn)
+        schema.create_balance_triggers(conn)
+        conn.execute("""
+            UPDATE uniforms SET quantity = b.quantity
+            FROM (SELECT u.id, COALESCE(SUM(s.quantity), 0) AS quantity FROM uniforms AS u
+                  LEFT JOIN stock_balances AS s ON s.uniform_id = u.id GROUP BY u.id) AS b
+            WHERE uniforms.id = b.id AND uniforms.quantity <> b.quantity
+        """)
+        conn.execute("DELETE FROM stock_summary")
+        conn.execute(f"INSERT INTO stock_summary {schema.summary_source_sql()}")
+        conn.execute(f"INSERT INTO stock_summary {schema.location_summary_source_sql()}")
+
+# --- Reposição ---
+
+# Item a repor: o registro do item, as saídas na janela de consumo e a compra sugerida.
+ReorderAlert = namedtuple("ReorderAlert", "uniform outflow suggested critical")
+
+def suggest_reorder_quantity(quantity, min_quantity, reorder_level, outflow,
+                             lookback_days=REORDER_LOOKBACK_DAYS, cover_days=REORDER_COVER_DAYS):
+    """
+    Quanto comprar: o consumo previsto para `cover_days` dias (pela média de
+    saídas dos últimos `lookback_days`) mais o estoque mínimo, descontado o
+    saldo. Sem consumo recente, o suficiente para sair do ponto de reposição.
+    """
+    expected = math.ceil(outflow * cover_days / lookback_days) + min_quantity
+    target = max(expected, (reorder_level or 0) + 1)
+    return max(0, target - quantity)
+
+@instrumented
+def reorder_alerts(after=None, limit=100, lookback_days=REORDER_LOOKBACK_DAYS, pool=None):
+    """
+    Retorna uma página de itens no ponto de reposição ou abaixo dele (do menor
+    saldo para o maior) e o cursor da próxima página. A lista vem do índice
+    parcial idx_uniforms_reorder; as saídas só são somadas para os itens da página.
+    `after` é o par (quantidade, id) da última linha da página anterior.
+    """
+    pool = _pool(pool)
+    where, params = f"WHERE {schema.REORDER_CONDITION}", []
+    if after is not None:
+        where += " AND (quantity, id) > (?, ?)"
+        params += list(after)
+    sql = f"SELECT {UNIFORM_COLUMNS} FROM uniform_records {where} ORDER BY quantity, id LIMIT ?"
+    params.append(limit + 1)
+    # Janela arredondada ao minuto, para a página poder vir do cache.
+    since = (int(time.time()) // 60 * 60) - lookback_days * 86400
+
+    def load(conn):
+        rows = [Uniform._make(row) for row in conn.execute(sql, params)]
+        ids = [u.id for u in rows[:limit]]
+        outflow = {}
+        if ids:
+            outflow = dict(conn.execute(f"""
+                SELECT uniform_id, -SUM(delta) FROM stock_movements
+                WHERE uniform_id IN ({", ".join("?" * len(ids))}) AND {schema.MOVEMENT_TIME} >= ?
+                  AND movement_type = ? AND delta < 0
+                GROUP BY uniform_id
+            """, (*ids, since, MOVEMENT_OUT)).fetchall())
+        return tuple(rows), outflow
+
+    rows, outflow = _cached_read(pool, (sql, tuple(params), since), load)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = (rows[-1].quantity, rows[-1].id)
+    alerts = []
+    for u in rows:
+        out = outflow.get(u.id, 0)
+        suggested = suggest_reorder_quantity(u.quantity, u.min_quantity, u.reorder_level, out, lookback_days)
+        alerts.append(ReorderAlert(u, out, suggested, u.quantity <= u.min_quantity))
+    return alerts, next_cursor
+
+@instrumented
+def count_reorder_alerts(pool=None):
+    """Quantos itens estão no ponto de reposição ou abaixo (contagem sobre o índice parcial)."""
+    sql = f"SELECT COUNT(*) FROM uniforms WHERE {schema.REORDER_CONDITION}"
+    return _cached_read(_pool(pool), (sql,), lambda conn: conn.execute(sql).fetchone()[0])
+
+def _check_reorder_levels(min_quantity, reorder_level):
+    """Valida o par (estoque mínimo, ponto de reposição) e o devolve com 0 gravado como None (não monitorar)."""
+    reorder_level = reorder_level or None
+    if min_quantity < 0 or (reorder_level is not None and reorder_level < min_quantity):
+        raise ValueError("O ponto de reposição deve ser maior ou igual ao estoque mínimo, e ambos não negativos.")
+    return min_quantity, reorder_level
+
+@instrumented
+def select_movements(uniform_id, limit=20, pool=None):
+    """
+    Retorna as movimentações mais recentes de um item, como tuplas (id, uniform_id,
+    delta, movement_type, created_at, actor, local).
+    """
+    pool = _pool(pool)
+    sql = """
+        SELECT id, uniform_id, delta, movement_type, created_at, actor, location_id
+        FROM stock_movements WHERE uniform_id = ?
+        ORDER BY id DESC LIMIT ?
+    """
+    rows = _cached_read(pool, (sql, uniform_id, limit), lambda conn: tuple(
+        tuple(row) for row in conn.execute(sql, (uniform_id, limit))
+    ))
+    names = get_catalog(pool).by_id[LOCATION]
+    return [(*row[:-1], names.get(row[-1], str(row[-1]))) for row in rows]
+
+def _delete_uniform(conn, uniform_id, actor=None):
+    # As saídas entram no livro-razão antes de o item sumir: o registro de
+    # alterações ainda precisa achar o uid do item para cada uma.
+    balances = conn.execute(
+        "DELETE FROM stock_balances WHERE uniform_id = ? RETURNING location_id, quantity", (uniform_id,)
+    ).fetchall()
+    for location, quantity in balances:
+        if quantity:
+            _record_movement(conn, uniform_id, location, -quantity, MOVEMENT_DELETE, actor)
+    return conn.execute("DELETE FROM uniforms WHERE id = ?", (uniform_id,)).rowcount > 0
+
+@serialized_write
+@instrumented
+def delete_uniform(uniform_id, actor=None, pool=None):
+    """Exclui um itens do banco de dados, zerando seu saldo em cada local no livro-razão."""
+    with _pool(pool).transaction() as conn:
+        return _delete_uniform(conn, uniform_id, actor)
+
+# --- Administração dos Catálogos ---
+
+def _catalog_table(dimension):
+    if dimension not in _VALUE_TABLES:
+        raise CatalogValueError(f"Catálogo inválido: {dimension}")
+    return _VALUE_TABLES[dimension]
+
+@instrumented
+def catalog_usage(dimension, pool=None):
+    """
+    Retorna tuplas (id, nome, posição, itens que usam o valor) do catálogo, na ordem
+    de exibição. Para os locais, conta os itens com saldo no local.
+    """
+    items = "s.items - s.zero_items" if dimension == LOCATION else "s.items"
+    sql = f"""
+        SELECT c.id, c.name, c.position, COALESCE({items}, 0)
+        FROM {_catalog_table(dimension)} AS c
+        LEFT JOIN stock_summary AS s ON s.dimension = ? AND s.value = c.id
+        ORDER BY c.position, c.id
+    """
+    return list(_cached_read(_pool(pool), (sql, dimension), lambda conn: tuple(
+        tuple(row) for row in conn.execute(sql, (dimension,))
+    )))
+
+@serialized_write
+@instrumented
+def add_catalog_value(dimension, name, pool=None):
+    """Acrescenta um valor ao fim do catálogo e retorna seu ID."""
+    table = _catalog_table(dimension)
+    name = (name or "").strip()
+    if not name:
+        raise CatalogValueError("Informe o nome do valor.")
+    pool = _pool(pool)
+    with pool.transaction() as conn:
+        try:
+            cursor = conn.execute(f"""
+                INSERT INTO {table} (name, position) SELECT ?, COALESCE(MAX(position), -1) + 1 FROM {table}
+            """, (name,))
+        except sqlite3.IntegrityError:
+            raise CatalogValueError(f"'{name}' já existe no catálogo.") from None
+        pool.invalidate_catalog()
+    return cursor.lastrowid
+
+def _rename_catalog_value(conn, dimension, value_id, name):
+    table = _catalog_table(dimension)
+    fts_columns = "name, description, type, size, model, color"
+    # O índice de texto completo guarda o nome antigo nos itens com este valor
+    # (os locais não fazem parte da busca).
+    searchable = dimension in schema.CATALOG_TABLES
+    if searchable:
+        conn.execute(f"""
+            INSERT INTO uniforms_fts (uniforms_fts, rowid, {fts_columns})
+            SELECT 'delete', id, {fts_columns} FROM uniform_records WHERE {dimension}_id = ?
+        """, (value_id,))
+    try:
+        conn.execute(f"UPDATE {table} SET name = ? WHERE id = ?", (name, value_id))
+    except sqlite3.IntegrityError:
+        raise CatalogValueError(f"'{name}' já existe no catálogo.") from None
+    if searchable:
+        conn.execute(f"""
+            INSERT INTO uniforms_fts (rowid, {fts_columns})
+            SELECT id, {fts_columns} FROM uniform_records WHERE {dimension}_id = ?
+        """, (value_id,))
+
+@serialized_write
+@instrumented
+def update_catalog_value(dimension, value_id, name, position=None, pool=None):
+    """
+    Renomeia um valor do catálogo e, se `position` for informado, move-o para essa
+    posição (a partir de 0). Os itens continuam apontando para o mesmo ID.
+    """
+    table = _catalog_table(dimension)
+    name = (name or "").strip()
+    if not name:
+        raise CatalogValueError("Informe o nome do valor.")
+    pool = _pool(pool)
+    with pool.transaction() as conn:
+        row = conn.execute(f"SELECT name FROM {table} WHERE id = ?", (value_id,)).fetchone()
+        if row is None:
+            raise CatalogValueError(f"Valor {value_id} não encontrado no catálogo.")
+        if name != row[0]:
+            _rename_catalog_value(conn, dimension, value_id, name)
+        if position is not None:
+            order = [r[0] for r in conn.execute(
+                f"SELECT id FROM {table} WHERE id <> ? ORDER BY position, id", (value_id,)
+            )]
+            order.insert(max(0, min(int(position), len(order))), value_id)
+            conn.executemany(f"UPDATE {table} SET position = ? WHERE id = ?", list(enumerate(order)))
+        pool.invalidate_catalog()
+    return True
+
+@serialized_write
+@instrumented
+def delete_catalog_value(dimension, value_id, pool=None):
+    """
+    Remove um valor do catálogo; recusa (CatalogValueError) se algum item ainda o
+    usa. Um local só pode ser removido sem saldo e se não for o último.
+    """
+    pool = _pool(pool)
+    with pool.transaction() as conn:
+        deleted = _delete_catalog_value(conn, dimension, value_id)
+        pool.invalidate_catalog()
+    return deleted
+
+def _delete_catalog_value(conn, dimension, value_id):
+    table = _catalog_table(dimension)
+    row = conn.execute(
+        "SELECT items - zero_items, items FROM stock_summary WHERE dimension = ? AND value = ?",
+        (dimension, value_id)
+    ).fetchone()
+    in_use = row[0] if row and dimension == LOCATION else row[1] if row else 0
+    if in_use:
+        raise CatalogValueError(f"O valor está em uso por {in_use} item(ns).")
+    if dimension == LOCATION:
+        if conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] <= 1:
+            raise CatalogValueError("É preciso manter pelo menos um local de estoque.")
+        # Saldos zerados não prendem o local.
+        conn.execute("DELETE FROM stock_balances WHERE location_id = ?", (value_id,))
+    deleted = conn.execute(f"DELETE FROM {table} WHERE id = ? RETURNING position", (value_id,)).fetchone()
+    if deleted is not None:
+        # Mantém as posições contíguas (0..n-1) para o formulário de ordenação.
+        conn.execute(f"UPDATE {table} SET position = position - 1 WHERE position > ?", deleted)
+    conn.execute("DELETE FROM stock_summary WHERE dimension = ? AND value = ?", (dimension, value_id))
+    return deleted is not None
+
+# --- Sincronização entre Instalações ---
+# O registro de alterações e as regras de conflito estão descritos em schema.py
+# (migração 10); o formato dos pacotes e a linha de comando, em sync.py.
+
+@instrumented
+def site_id(pool=None):
+    """Identificação deste banco (site) na sincronização."""
+    with _pool(pool).connection() as conn:
+        return conn.execute("SELECT site_id FROM sync_state").fetchone()[0]
+
+@instrumented
+def site_copy(pool=None):
+    """
+    (site original, último seq copiado) se este banco foi criado como cópia de outro
+    site (reset_site_id); senão (None, 0).
+    """
+    with _pool(pool).connection() as conn:
+        return tuple(conn.execute("SELECT copied_from, copied_seq FROM sync_state").fetchone())
+
+@instrumented
+def sync_peers(pool=None):
+    """
+    Pares já sincronizados, como tuplas (site, último seq enviado, último seq do par
+    recebido, data da última troca, alterações locais ainda não enviadas).
+    """
+    with _pool(pool).connection() as conn:
+        return [tuple(row) for row in conn.execute("""
+            SELECT p.site_id, p.sent_seq, p.received_seq, p.synced_at,
+                   (SELECT COUNT(*) FROM change_log AS c
+                    WHERE c.seq > p.sent_seq AND (c.origin IS NULL OR c.origin <> p.site_id))
+            FROM sync_peers AS p ORDER BY p.synced_at DESC
+        """)]
+
+@serialized_write
+@instrumented
+def record_peer_sync(peer, sent_seq=None, received_seq=None, pool=None):
+    """Avança as marcas d'água do par: até onde enviamos a ele e até onde (no seq dele) recebemos dele."""
+    with _pool(pool).transaction() as conn:
+        conn.execute("""
+            INSERT INTO sync_peers (site_id, sent_seq, received_seq, synced_at)
+            VALUES (?, COALESCE(?, 0), COALESCE(?, 0), ?)
+            ON CONFLICT (site_id) DO UPDATE SET
+                sent_seq = MAX(sent_seq, excluded.sent_seq),
+                received_seq = MAX(received_seq, excluded.received_seq),
+                synced_at = excluded.synced_at
+        """, (peer, sent_seq, received_seq, int(time.time())))
+
+@serialized_write
+@instrumented
+def reset_site_id(pool=None):
+    """
+    Dá uma nova identificação a um banco copiado de outro site, para instalar um site
+    novo a partir dele. O que já estava no registro passa a constar como recebido
+    do site original (que já o tem), e só o que for feito depois sai como deste site;
+    o ponto da cópia vai nos pacotes, para o original não acusar falta do que já tem.
+    Retorna a nova identificação.
+    """
+    with _pool(pool).transaction() as conn:
+        old_site = conn.execute("SELECT site_id FROM sync_state").fetchone()[0]
+        last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+        conn.execute("UPDATE change_log SET origin = ?, origin_seq = seq WHERE origin IS NULL", (old_site,))
+        conn.execute("UPDATE sync_item_versions SET origin = ? WHERE origin IS NULL", (old_site,))
+        conn.execute("""
+            INSERT INTO sync_peers (site_id, sent_seq, received_seq, synced_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT (site_id) DO UPDATE SET sent_seq = excluded.sent_seq, received_seq = excluded.received_seq
+        """, (old_site, last_seq, last_seq, int(time.time())))
+        return conn.execute("""
+            UPDATE sync_state SET site_id = lower(hex(randomblob(8))), copied_from = ?, copied_seq = ?
+            RETURNING site_id
+        """, (old_site, last_seq)).fetchone()[0]
+
+@instrumented
+def select_negative_balances(pool=None):
+    """
+    Saldos negativos, como tuplas (uniform_id, local, quantidade): saídas do mesmo
+    saldo feitas em dois sites antes de sincronizarem. Só a sincronização os cria.
+    """
+    pool = _pool(pool)
+    with pool.connection() as conn:
+        rows = conn.execute(
+            "SELECT uniform_id, location_id, quantity FROM stock_balances WHERE quantity < 0 ORDER BY uniform_id"
+        ).fetchall()
+    names = get_catalog(pool).by_id[LOCATION]
+    return [(uniform_id, names.get(location, str(location)), quantity) for uniform_id, location, quantity in rows]
+
+def _sync_value_id(conn, dimension, name):
+    """ID do valor no catálogo (ou do local), incluído no fim da lista se ainda não existir."""
+    table = _catalog_table(dimension)
+    row = conn.execute(f"SELECT id FROM {table} WHERE name = ?", (name,)).fetchone()
+    if row is not None:
+        return row[0]
+    return conn.execute(f"""
+        INSERT INTO {table} (name, position) SELECT ?, COALESCE(MAX(position), -1) + 1 FROM {table} RETURNING id
+    """, (name,)).fetchone()[0]
+
+def _sync_stamp(conn, uniform_id, site):
+    """(changed_at, site) da última alteração dos atributos do item aplicada aqui."""
+    row = conn.execute(
+        "SELECT changed_at, COALESCE(origin, ?) FROM sync_item_versions WHERE uniform_id = ?", (site, uniform_id)
+    ).fetchone()
+    return tuple(row) if row else (0, "")
+
+def _merge_uniform(conn, duplicate_id, keep_id):
+    """Funde o item `duplicate_id` em `keep_id`: saldos (com o par "Fusão" no livro-razão) e uids."""
+    balances = conn.execute(
+        "DELETE FROM stock_balances WHERE uniform_id = ? RETURNING location_id, quantity", (duplicate_id,)
+    ).fetchall()
+    for location, quantity in balances:
+        conn.execute(_ADD_BALANCE_SQL, (location, keep_id, quantity))
+        if quantity:
+            _record_movement(conn, duplicate_id, location, -quantity, MOVEMENT_MERGE)
+            _record_movement(conn, keep_id, location, quantity, MOVEMENT_MERGE)
+    conn.execute("UPDATE sync_items SET uniform_id = ? WHERE uniform_id = ?", (keep_id, duplicate_id))
+    conn.execute("DELETE FROM uniforms WHERE id = ?", (duplicate_id,))
+
+def _apply_item_change(conn, data, stamp, site):
+    row = conn.execute("SELECT uniform_id FROM sync_items WHERE uid = ?", (data["item"],)).fetchone()
+    if row is not None and row[0] is None:
+        return None  # excluído aqui: a exclusão é definitiva
+    keys = {d: _sync_value_id(conn, d, data[d]) for d in CATALOG_DIMENSIONS}
+    if row is None:
+        # uid novo: o mesmo item pode ter sido cadastrado aqui também (chave única);
+        # senão o item é criado. Em ambos os casos o uid passa a apontar para ele.
+        found = conn.execute(
+            "SELECT id FROM uniforms WHERE model_id = ? AND type_id = ? AND size_id = ? AND color_id = ?",
+            (keys["model"], keys["type"], keys["size"], keys["color"]),
+        ).fetchone()
+        uniform_id = found[0] if found else conn.execute("""
+            INSERT INTO uniforms (name, type_id, size_id, model_id, color_id, quantity, description)
+            VALUES (?, ?, ?, ?, ?, 0, ?) RETURNING id
+        """, (data["name"], keys["type"], keys["size"], keys["model"], keys["color"],
+              data["description"])).fetchone()[0]
+        conn.execute("INSERT INTO sync_items (uid, uniform_id) VALUES (?, ?)", (data["item"], uniform_id))
+    else:
+        uniform_id = row[0]
+    if _sync_stamp(conn, uniform_id, site) >= stamp:
+        return None  # já há uma alteração mais recente destes atributos
+
+    conflict = None
+    sku = _normalize_sku(data["sku"])
+    holder = sku and conn.execute("SELECT id FROM uniforms WHERE sku = ? AND id <> ?", (sku, uniform_id)).fetchone()
+    if holder:
+        # O SKU fica com a alteração mais recente; todos os sites decidem igual.
+        if _sync_stamp(conn, holder[0], site) < stamp:
+            conn.execute("UPDATE uniforms SET sku = NULL WHERE id = ?", (holder[0],))
+        else:
+            conflict = f"Item {uniform_id}: o SKU '{sku}' ficou com o item {holder[0]}, alterado mais recentemente."
+            sku = None
+    values = (data["name"], data["description"], sku, data["min_quantity"], data["reorder_level"])
+    try:
+        conn.execute("""
+            UPDATE uniforms SET name = ?, description = ?, sku = ?, min_quantity = ?, reorder_level = ?,
+                type_id = ?, size_id = ?, model_id = ?, color_id = ?
+            WHERE id = ?
+        """, (*values, keys["type"], keys["size"], keys["model"], keys["color"], uniform_id))
+    except sqlite3.IntegrityError:
+        # A combinação já é outro item aqui: o mesmo item, cadastrado também neste
+        # site (o outro site já os trata como um só, pelo uid). Funde os dois, com
+        # os atributos da alteração mais recente.
+        duplicate = conn.execute("""
+            SELECT id, name, description, sku, min_quantity, reorder_level FROM uniforms
+            WHERE model_id = ? AND type_id = ? AND size_id = ? AND color_id = ?
+        """, (keys["model"], keys["type"], keys["size"], keys["color"])).fetchone()
+        duplicate_stamp = _sync_stamp(conn, duplicate[0], site)
+        _merge_uniform(conn, duplicate[0], uniform_id)
+        if duplicate_stamp > stamp:
+            values, stamp = tuple(duplicate[1:]), duplicate_stamp
+        conn.execute("""
+            UPDATE uniforms SET name = ?, description = ?, sku = ?, min_quantity = ?, reorder_level = ?,
+                type_id = ?, size_id = ?, model_id = ?, color_id = ?
+            WHERE id = ?
+        """, (*values, keys["type"], keys["size"], keys["model"], keys["color"], uniform_id))
+        conflict = (f"Item {duplicate[0]} fundido no item {uniform_id}: ambos são "
+                    f"{data['type']} / {data['size']} / {data['model']} / {data['color']}.")
+    conn.execute("""
+        INSERT INTO sync_item_versions (uniform_id, changed_at, origin) VALUES (?, ?, ?)
+        ON CONFLICT (uniform_id) DO UPDATE SET changed_at = excluded.changed_at, origin = excluded.origin
+    """, (uniform_id, *stamp))
+    return conflict
+
+def _apply_delete_change(conn, data, stamp, site):
+    row = conn.execute("SELECT uniform_id FROM sync_items WHERE uid = ?", (data["item"],)).fetchone()
+    if row is None:
+        # Lápide: alterações atrasadas deste uid serão ignoradas.
+        conn.execute("INSERT INTO sync_items (uid, uniform_id) VALUES (?, NULL)", (data["item"],))
+    elif row[0] is not None:
+        _delete_uniform(conn, row[0], actor=stamp[1])
+    return None
+
+def _apply_movement_change(conn, data, stamp, site):
+    row = conn.execute("SELECT uniform_id FROM sync_items WHERE uid = ?", (data["item"],)).fetchone()
+    if row is None:
+        return f"Movimentação de um item desconhecido ({data['item']}) ignorada."
+    if row[0] is None:
+        return None  # item excluído aqui
+    location = _sync_value_id(conn, LOCATION, data["location"])
+    # Delta sem conferir o saldo: as movimentações precisam comutar entre os sites.
+    quantity = conn.execute(_ADD_BALANCE_SQL + " RETURNING quantity",
+                            (location, row[0], data["delta"])).fetchone()[0]
+    # created_at é a hora do recebimento (cresce com o ID); a do outro site vai em origin_at.
+    conn.execute("""
+        INSERT INTO stock_movements (uniform_id, delta, movement_type, created_at, origin_at, actor, location_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (row[0], data["delta"], data["type"], int(time.time()), data["at"], data["actor"], location))
+    if quantity < 0:
+        return f"Item {row[0]} ficou com saldo {quantity} em '{data['location']}' (saídas simultâneas)."
+    return None
+
+def _apply_catalog_change(conn, data, stamp, site):
+    dimension, op, name = data["dimension"], data["op"], data["name"]
+    table = _catalog_table(dimension)
+    if op == "add":
+        _sync_value_id(conn, dimension, name)
+        return None
+    if op == "rename":
+        row = conn.execute(f"SELECT id FROM {table} WHERE name = ?", (data["old"],)).fetchone()
+        if row is None:
+            _sync_value_id(conn, dimension, name)
+            return None
+        try:
+            _rename_catalog_value(conn, dimension, row[0], name)
+        except CatalogValueError:
+            return f"{dimension}: '{data['old']}' não foi renomeado, '{name}' já existe."
+        return None
+    row = conn.execute(f"SELECT id FROM {table} WHERE name = ?", (name,)).fetchone()
+    if row is None:
+        return None
+    if op == "move":
+        conn.execute(f"UPDATE {table} SET position = ? WHERE id = ?", (data["position"], row[0]))
+        return None
+    try:
+        _delete_catalog_value(conn, dimension, row[0])
+    except CatalogValueError as e:
+        return f"{dimension}: '{name}' não foi removido. {e}"
+    return None
+
+_SYNC_APPLY = {
+    schema.CHANGE_ITEM: _apply_item_change,
+    schema.CHANGE_DELETE: _apply_delete_change,
+    schema.CHANGE_MOVEMENT: _apply_movement_change,
+    schema.CHANGE_CATALOG: _apply_catalog_change,
+}
+
+@serialized_write
+@instrumented
+def apply_changes(changes, pool=None):
+    """
+    Aplica, em uma transação e na ordem dada, alterações recebidas de outro site
+    como tuplas (origin, origin_seq, changed_at, entity, payload). As já aplicadas
+    (e as feitas por este site) são ignoradas, então reaplicar um pacote não muda
+    nada. As aplicadas entram no registro com a origem, para seguir aos outros pares.
+    Retorna {"applied", "skipped", "conflicts"}, em que "conflicts" lista o que não
+    pôde ser aplicado como recebido.
+    """
+    pool = _pool(pool)
+    report = {"applied": 0, "skipped": 0, "conflicts": []}
+    with pool.transaction() as conn:
+        site = conn.execute("SELECT site_id FROM sync_state").fetchone()[0]
+        conn.execute("UPDATE sync_state SET applying = 1")
+        try:
+            for origin, origin_seq, changed_at, entity, payload in changes:
+                if origin == site or conn.execute(
+                    "SELECT 1 FROM change_log WHERE origin = ? AND origin_seq = ?", (origin, origin_seq)
+                ).fetchone():
+                    report["skipped"] += 1
+                    continue
+                if entity not in _SYNC_APPLY:
+                    raise SyncError(f"Tipo de alteração desconhecido: {entity}")
+                data = json.loads(payload) if isinstance(payload, str) else payload
+                conflict = _SYNC_APPLY[entity](conn, data, (changed_at, origin), site)
+                if conflict:
+                    report["conflicts"].append(conflict)
+                if not isinstance(payload, str):
+                    payload = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+                conn.execute("""
+                    INSERT INTO change_log (origin, origin_seq, changed_at, entity, payload) VALUES (?, ?, ?, ?, ?)
+                """, (origin, origin_seq, changed_at, entity, payload))
+                report["applied"] += 1
+        finally:
+            conn.execute("UPDATE sync_state SET applying = 0")
+        pool.invalidate_catalog()
+    return report
+
+# --- Instantâneos do Estoque ---
+
+@serialized_write
+@instrumented
+def take_stock_snapshot(pool=None):
+    """
+    Grava os saldos por local de agora (só os diferentes de zero): os atuais, menos
+    as movimentações datadas a partir de agora (de um site com o relógio adiantado).
+    Retorna (id do instantâneo, saldos gravados); se nada foi movimentado desde o
+    último instantâneo, (id dele, None).
+    """
+    with _pool(pool).transaction() as conn:
+        movement_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM stock_movements").fetchone()[0]
+        row = conn.execute("SELECT id FROM stock_snapshots WHERE movement_id = ?", (movement_id,)).fetchone()
+        if row is not None:
+            return row[0], None
+        taken_at = int(time.time())
+        snapshot_id = conn.execute(
+            "INSERT INTO stock_snapshots (taken_at, movement_id) VALUES (?, ?) RETURNING id",
+            (taken_at, movement_id),
+        ).fetchone()[0]
+        rows = conn.execute(f"""
+            INSERT INTO stock_snapshot_balances (snapshot_id, location_id, uniform_id, quantity)
+            SELECT ?, location_id, uniform_id, SUM(quantity) FROM (
+                SELECT location_id, uniform_id, quantity FROM stock_balances
+                UNION ALL
+                SELECT location_id, uniform_id, -delta FROM stock_movements WHERE {schema.MOVEMENT_TIME} >= ?
+            ) GROUP BY location_id, uniform_id HAVING SUM(quantity) <> 0
+        """, (snapshot_id, taken_at)).rowcount
+        return snapshot_id, rows
+
+@serialized_write
+@instrumented
+def prune_stock_snapshots(keep_days=SNAPSHOT_KEEP_DAYS, pool=None):
+    """
+    Remove os instantâneos com mais de `keep_days` dias, menos o primeiro de cada
+    mês, que continua servindo de ponto de partida para as datas antigas.
+    Retorna quantos foram removidos.
+    """
+    with _pool(pool).transaction() as conn:
+        return conn.execute("""
+            DELETE FROM stock_snapshots WHERE taken_at < ? AND id NOT IN (
+                SELECT MIN(id) FROM stock_snapshots
+                GROUP BY strftime('%Y-%m', taken_at, 'unixepoch', 'localtime')
+            )
+        """, (int(time.time()) - keep_days * 86400,)).rowcount
+
+@instrumented
+def select_stock_snapshots(pool=None):
+    """Instantâneos, do mais recente ao mais antigo, como tuplas (id, data, último ID do livro-razão, saldos)."""
+    with _pool(pool).connection() as conn:
+        return [tuple(row) for row in conn.execute("""
+            SELECT s.id, s.taken_at, s.movement_id,
+                   (SELECT COUNT(*) FROM stock_snapshot_balances WHERE snapshot_id = s.id)
+            FROM stock_snapshots AS s ORDER BY s.taken_at DESC, s.id DESC
+        """)]
+
+def _nearest_snapshot(conn, timestamp):
+    """
+    (id do instantâneo, data) mais próximo de `timestamp`. Os saldos atuais contam
+    como um instantâneo (id None) tirado agora.
+    """
+    candidates = [(None, int(time.time()))]
+    for sql in ("SELECT id, taken_at FROM stock_snapshots WHERE taken_at <= ? ORDER BY taken_at DESC",
+                "SELECT id, taken_at FROM stock_snapshots WHERE taken_at > ? ORDER BY taken_at"):
+        row = conn.execute(sql + " LIMIT 1", (timestamp,)).fetchone()
+        if row is not None:
+            candidates.append(tuple(row))
+    return min(candidates, key=lambda candidate: abs(candidate[1] - timestamp))
+
+@instrumented
+def stock_balances_at(timestamp, pool=None):
+    """
+    Saldos por local no instante `timestamp` (segundos), antes das movimentações
+    desse instante, só os diferentes de zero, como tuplas (uniform_id, sku, nome,
+    local, quantidade); sku e nome ficam None para itens já excluídos. Parte do
+    instantâneo mais próximo (ou dos saldos atuais) e soma ou desfaz só as
+    movimentações entre ele e a data, pela data em que aconteceram (ver
+    schema.MOVEMENT_TIME): as sincronizadas contam na data do outro site.
+    """
+    pool = _pool(pool)
+    moment = schema.MOVEMENT_TIME
+    with pool.connection() as conn:
+        own_snapshot = not conn.in_transaction
+        if own_snapshot:
+            conn.execute("BEGIN")  # saldos atuais e livro-razão lidos do mesmo instantâneo
+        try:
+            snapshot_id, taken_at = _nearest_snapshot(conn, timestamp)
+            if snapshot_id is None:
+                base, params = "SELECT location_id, uniform_id, quantity FROM stock_balances", []
+                movements = f"SELECT location_id, uniform_id, -delta FROM stock_movements WHERE {moment} >= ?"
+                params.append(timestamp)
+            else:
+                base = "SELECT location_id, uniform_id, quantity FROM stock_snapshot_balances WHERE snapshot_id = ?"
+                params = [snapshot_id]
+                sign = "" if taken_at <= timestamp else "-"
+                movements = (f"SELECT location_id, uniform_id, {sign}delta FROM stock_movements "
+                             f"WHERE {moment} >= ? AND {moment} < ?")
+                params += sorted((taken_at, timestamp))
+            rows = conn.execute(f"""
+                SELECT t.uniform_id, u.sku, u.name, t.location_id, SUM(t.quantity)
+                FROM ({base}
+                      UNION ALL
+                      {movements}) AS t
+                LEFT JOIN uniforms AS u ON u.id = t.uniform_id
+                GROUP BY t.uniform_id, t.location_id HAVING SUM(t.quantity) <> 0
+                ORDER BY t.uniform_id, t.location_id
+            """, params).fetchall()
+        finally:
+            if own_snapshot:
+                conn.rollback()
+    names = get_catalog(pool).by_id[LOCATION]
+    return [(uniform_id, sku, name, names.get(location, str(location)), quantity)
+            for uniform_id, sku, name, location, quantity in rows]
+
+# --- Manutenção do Banco ---
+
+@serialized_write
+@instrumented
+def record_maintenance_run(task, seconds, detail=None, pool=None):
+    """Registra que a tarefa de manutenção `task` acabou de rodar."""
+    with _pool(pool).transaction() as conn:
+        conn.execute("""
+            INSERT INTO maintenance_runs (task, last_run, seconds, detail) VALUES (?, ?, ?, ?)
+            ON CONFLICT (task) DO UPDATE SET last_run = excluded.last_run, seconds = excluded.seconds,
+                                             detail = excluded.detail
+        """, (task, int(time.time()), round(seconds, 3), detail))
+
+@instrumented
+def maintenance_runs(pool=None):
+    """Última execução de cada tarefa de manutenção: {tarefa: (data, segundos, detalhe)}."""
+    with _pool(pool).connection() as conn:
+        return {task: (last_run, seconds, detail) for task, last_run, seconds, detail in conn.execute(
+            "SELECT task, last_run, seconds, detail FROM maintenance_runs"
+        )}
+
+@serialized_write
+@instrumented
+def analyze_database(pool=None):
+    """
+    Atualiza as estatísticas do planejador (ANALYZE). Com analysis_limit cada
+    índice é amostrado, então o custo não cresce com o tamanho das tabelas.
+    """
+    with _pool(pool).transaction() as conn:
+        conn.execute("PRAGMA analysis_limit = 1000")
+        conn.execute("ANALYZE")
+
+@exclusive_write
+@instrumented
+def vacuum_database(pool=None):
+    """
+    Reescreve o arquivo do banco sem as páginas livres (VACUUM) e encolhe o WAL.
+    Roda na thread escritora, entre dois grupos: as gravações deste processo
+    esperam na fila até o fim, então rode fora do horário de uso. Retorna os
+    bytes (antes, depois).
+    """
+    pool = _pool(pool)
+    with pool.connection() as conn:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        before = conn.execute("PRAGMA page_count").fetchone()[0] * page_size
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        after = conn.execute("PRAGMA page_count").fetchone()[0] * page_size
+    pool.cache.bump()
+    return before, after
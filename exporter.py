@@ -0,0 +1,184 @@
+"""
+Exportação do estoque, dos saldos por local e das movimentações para CSV ou Parquet.
+
+As linhas saem do SQLite em lotes de tamanho fixo (cursor.fetchmany) e cada lote
+é gravado imediatamente no destino, então o uso de memória não depende do
+tamanho da tabela. Os filtros e o local são os mesmos da listagem
+(database.list_source): com um local, saem só os itens com saldo nele, o saldo
+e as movimentações desse local.
+
+Uso pela linha de comando:
+    python exporter.py inventory --format parquet --out estoque.parquet --model Polo --min-quantity 1
+    python exporter.py movements --format csv --out movimentacoes.csv
+    python exporter.py balances --format csv --out saldos_por_local.csv
+    python exporter.py inventory --format csv --out loja.csv --location "Loja Centro"
+"""
+import argparse
+import csv
+import io
+import sys
+
+import database
+from config import DB_NAME
+
+EXPORT_BATCH_SIZE = 5000
+
+EXPORT_FORMATS = ("csv", "parquet")
+
+# Para cada tipo de exportação: cabeçalho, tipos Arrow das colunas e a consulta.
+# A consulta recebe a origem dos itens da listagem ({source}, com a cláusula WHERE
+# dos filtros); as de saldos e movimentações, também a condição {items} que as
+# restringe a esses itens (e ao local, se houver um).
+EXPORTS = {
+    "inventory": {
+        "columns": ["id", "name", "type", "size", "model", "color", "quantity", "description", "sku",
+                    "min_quantity", "reorder_level"],
+        "types": ["int64", "string", "string", "string", "string", "string", "int64", "string", "string",
+                  "int64", "int64"],
+        "sql": f"SELECT {database.UNIFORM_COLUMNS} FROM {{source}} ORDER BY id",
+    },
+    "movements": {
+        "columns": ["id", "uniform_id", "delta", "movement_type", "created_at", "origin_at", "actor", "location"],
+        "types": ["int64", "int64", "int64", "string", "timestamp", "timestamp", "string", "string"],
+        "alias": "m",
+        "sql": """
+            SELECT m.id, m.uniform_id, m.delta, m.movement_type, m.created_at, m.origin_at, m.actor, l.name
+            FROM stock_movements AS m LEFT JOIN locations AS l ON l.id = m.location_id
+            WHERE {items}
+            ORDER BY m.id
+        """,
+    },
+    "balances": {
+        "columns": ["uniform_id", "sku", "location", "quantity"],
+        "types": ["int64", "string", "string", "int64"],
+        "alias": "b",
+        "sql": """
+            SELECT b.uniform_id, u.sku, l.name, b.quantity
+            FROM stock_balances AS b
+            JOIN uniforms AS u ON u.id = b.uniform_id
+            JOIN locations AS l ON l.id = b.location_id
+            WHERE {items}
+            ORDER BY b.uniform_id, l.position
+        """,
+    },
+}
+
+# --- Leitura em Lotes ---
+
+def build_query(kind, filters=None, location=None, pool=None):
+    """SQL e parâmetros da exportação `kind` para os filtros e o local da listagem."""
+    spec = EXPORTS[kind]
+    source, where, params = database.list_source(filters, location, pool)
+    if "alias" not in spec:
+        return spec["sql"].replace("{source}", source + where), params
+    if location is None:
+        # Todos os locais: basta o item atender aos filtros (sem os JOINs dos nomes).
+        items = f"{spec['alias']}.uniform_id IN (SELECT id FROM uniforms{where})"
+    else:
+        # location_records tem uma linha por item no local: o par (local, item) restringe os dois.
+        alias = spec["alias"]
+        items = f"({alias}.location_id, {alias}.uniform_id) IN (SELECT location_id, id FROM {source}{where})"
+    return spec["sql"].replace("{items}", items), params
+
+def iter_batches(kind, filters=None, batch_size=EXPORT_BATCH_SIZE, location=None, pool=None):
+    """
+    Gera listas de até `batch_size` tuplas. Todas as leituras usam o mesmo cursor
+    (e portanto o mesmo instantâneo do banco), mesmo que outras sessões gravem
+    durante a exportação.
+    """
+    pool = pool if pool is not None else database.get_pool()
+    sql, params = build_query(kind, filters, location, pool)
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        own_snapshot = not conn.in_transaction
+        if own_snapshot:
+            cursor.execute("BEGIN")  # fixa o instantâneo de leitura até o fim da exportação
+        try:
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [tuple(row) for row in rows]
+        finally:
+            if own_snapshot:
+                conn.rollback()
+
+# --- Gravação ---
+
+def _write_csv(batches, columns, destination):
+    # utf-8-sig para o Excel reconhecer a acentuação ao abrir o arquivo.
+    stream = io.TextIOWrapper(destination, encoding="utf-8-sig", newline="")
+    writer = csv.writer(stream)
+    writer.writerow(columns)
+    written = 0
+    for rows in batches:
+        writer.writerows(rows)
+        written += len(rows)
+    stream.flush()
+    stream.detach()  # o chamador continua dono do arquivo binário
+    return written
+
+def _write_parquet(batches, columns, types, destination):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    arrow_types = {
+        "int64": pa.int64(), "string": pa.string(), "timestamp": pa.timestamp("s"),
+    }
+    schema = pa.schema([(name, arrow_types[kind]) for name, kind in zip(columns, types)])
+    written = 0
+    with pq.ParquetWriter(destination, schema, compression="zstd") as writer:
+        for rows in batches:
+            # Um row group por lote: cada coluna é convertida direto para Arrow.
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            written += len(rows)
+    return written
+
+def export(kind, file_format, destination, filters=None, batch_size=EXPORT_BATCH_SIZE, location=None, pool=None):
+    """
+    Exporta `kind` ("inventory", "balances" ou "movements") em `file_format` ("csv" ou "parquet")
+    para `destination`: um caminho ou um arquivo binário aberto para escrita. `filters` e
+    `location` (nome do local; None = todos) são os da listagem.
+    Retorna o número de linhas exportadas.
+    """
+    if kind not in EXPORTS:
+        raise ValueError(f"Tipo de exportação inválido: {kind}")
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Formato de exportação inválido: {file_format}")
+    spec = EXPORTS[kind]
+    batches = iter_batches(kind, filters, batch_size, location, pool)
+
+    if file_format == "parquet":
+        return _write_parquet(batches, spec["columns"], spec["types"], destination)
+    if isinstance(destination, str):
+        with open(destination, "wb") as f:
+            return _write_csv(batches, spec["columns"], f)
+    return _write_csv(batches, spec["columns"], destination)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta o estoque, os saldos por local ou as movimentações.")
+    parser.add_argument("kind", choices=list(EXPORTS))
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--out", required=True, help="Arquivo de saída ('-' para a saída padrão, só CSV)")
+    parser.add_argument("--db", default=DB_NAME, help="Arquivo do banco SQLite")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    for column in ("type", "size", "model", "color"):
+        parser.add_argument(f"--{column}", action="append", help="Filtro (pode repetir)")
+    parser.add_argument("--min-quantity", type=int)
+    parser.add_argument("--max-quantity", type=int)
+    parser.add_argument("--location", help="Só os itens, saldos e movimentações deste local de estoque")
+    args = parser.parse_args(argv)
+
+    filters = {
+        "type": args.type, "size": args.size, "model": args.model, "color": args.color,
+        "min_quantity": args.min_quantity, "max_quantity": args.max_quantity,
+    }
+    destination = sys.stdout.buffer if args.out == "-" else args.out
+    rows = export(args.kind, args.format, destination, filters, args.batch_size, args.location,
+                  pool=database.get_pool(args.db))
+    print(f"{rows} linhas exportadas.", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
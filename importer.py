@@ -0,0 +1,217 @@
+"""
+Importação em lote de itens a partir de arquivos CSV, Excel (.xlsx) ou Parquet.
+
+O arquivo é lido em blocos (`chunk_size` linhas por vez), cada bloco é validado
+de forma vetorizada com pandas e as linhas válidas são gravadas com um único
+executemany por bloco, em uma transação por bloco. Linhas com o mesmo tipo,
+tamanho, modelo e cor de um item já cadastrado somam a quantidade a ele. As
+quantidades entram no saldo de um local de estoque (o local padrão se nenhum for
+informado).
+
+Uso pela linha de comando:
+    python importer.py catalogo.csv [--dry-run] [--location "Depósito Principal"] [--chunk-size 20000] [--db uniforms.db]
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+import database
+from config import DB_NAME
+
+IMPORT_COLUMNS = ["name", "type", "size", "model", "color", "quantity", "description", "sku"]
+REQUIRED_COLUMNS = ["type", "size", "model", "color", "quantity"]
+
+# Cabeçalhos aceitos além dos nomes internos (os rótulos usados nas telas).
+COLUMN_ALIASES = {
+    "nome": "name", "tipo": "type", "tamanho": "size", "modelo": "model",
+    "cor": "color", "quantidade": "quantity", "descrição": "description", "descricao": "description",
+    "código": "sku", "codigo": "sku", "código de barras": "sku", "codigo de barras": "sku", "ean": "sku",
+}
+
+DEFAULT_CHUNK_SIZE = 20000
+
+SUPPORTED_FORMATS = ("csv", "xlsx", "parquet")
+
+# --- Leitura em Blocos ---
+
+def detect_format(filename):
+    """Deduz o formato pela extensão do arquivo."""
+    extension = os.path.splitext(filename)[1].lower().lstrip(".")
+    if extension in ("xls", "xlsx"):
+        return "xlsx"
+    if extension in ("parquet", "pq"):
+        return "parquet"
+    if extension in ("csv", "txt"):
+        return "csv"
+    raise ValueError(f"Formato de arquivo não suportado: .{extension}")
+
+def _iter_csv(source, chunk_size):
+    yield from pd.read_csv(source, chunksize=chunk_size, dtype=str, keep_default_na=False)
+
+def _iter_parquet(source, chunk_size):
+    import pyarrow.parquet as pq
+
+    for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size):
+        yield batch.to_pandas().astype(str).replace({"None": "", "nan": ""})
+
+def _iter_xlsx(source, chunk_size):
+    try:
+        import openpyxl
+    except ImportError:
+        raise ImportError("Para importar planilhas Excel instale o pacote 'openpyxl'.") from None
+
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(value or "").strip() for value in next(rows, ())]
+        chunk = []
+        for row in rows:
+            chunk.append(["" if value is None else str(value) for value in row])
+            if len(chunk) >= chunk_size:
+                yield pd.DataFrame(chunk, columns=header)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header)
+    finally:
+        workbook.close()
+
+def iter_chunks(source, file_format, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Lê o arquivo em DataFrames de até `chunk_size` linhas, todas as colunas como texto."""
+    readers = {"csv": _iter_csv, "xlsx": _iter_xlsx, "parquet": _iter_parquet}
+    if file_format not in readers:
+        raise ValueError(f"Formato de arquivo não suportado: {file_format}")
+    return readers[file_format](source, chunk_size)
+
+# --- Validação ---
+
+def normalize_columns(df):
+    """Padroniza os cabeçalhos e garante que as colunas obrigatórias existam."""
+    df = df.rename(columns=lambda c: COLUMN_ALIASES.get(str(c).strip().lower(), str(c).strip().lower()))
+    missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"Colunas obrigatórias ausentes no arquivo: {', '.join(missing)}")
+    for column in ("name", "description", "sku"):
+        if column not in df.columns:
+            df[column] = ""
+    return df[IMPORT_COLUMNS]
+
+def validate_chunk(df, first_row, allowed, pool=None):
+    """
+    Valida um bloco inteiro de uma vez.
+    Retorna (DataFrame só com as linhas válidas, lista de erros (linha, coluna, mensagem)).
+    `first_row` é o número da primeira linha do bloco no arquivo, usado no relatório, e
+    `allowed` traz os valores aceitos em cada coluna de catálogo ({"type": [...], ...}).
+    Os SKUs também são conferidos com os dos itens já cadastrados no banco do `pool`.
+    """
+    df = normalize_columns(df)
+    df = df.apply(lambda column: column.str.strip())
+    df.index = pd.RangeIndex(first_row, first_row + len(df))
+
+    invalid = pd.Series(False, index=df.index)
+    errors = []
+    for column, values in allowed.items():
+        bad = ~df[column].isin(values)
+        for row in df.index[bad]:
+            errors.append((row, column, f"Valor inválido: '{df.at[row, column]}'"))
+        invalid |= bad
+
+    quantity = pd.to_numeric(df["quantity"], errors="coerce")
+    bad = quantity.isna() | (quantity < 0) | (quantity % 1 != 0)
+    for row in df.index[bad]:
+        errors.append((row, "quantity", f"Quantidade inválida: '{df.at[row, 'quantity']}'"))
+    invalid |= bad
+
+    # O mesmo SKU em duas combinações de atributos diferentes derrubaria o bloco inteiro na gravação.
+    key = df["type"] + "|" + df["size"] + "|" + df["model"] + "|" + df["color"]
+    with_sku = df["sku"].fillna("") != ""
+    first_key = key[with_sku].groupby(df["sku"][with_sku]).transform("first")
+    bad = pd.Series(False, index=df.index)
+    bad[first_key.index] = key[with_sku] != first_key
+    for row in df.index[bad]:
+        errors.append((row, "sku", f"SKU repetido em outro item do arquivo: '{df.at[row, 'sku']}'"))
+    invalid |= bad
+
+    # Nem em um item já cadastrado com outra combinação de atributos.
+    registered = database.select_sku_keys(df["sku"][with_sku & ~invalid], pool=pool)
+    if registered:
+        registered_key = df["sku"].map({sku: "|".join(key) for sku, key in registered.items()})
+        bad = registered_key.notna() & (registered_key != key) & ~invalid
+        for row in df.index[bad]:
+            sku = df.at[row, "sku"]
+            errors.append((row, "sku", f"SKU já cadastrado em outro item ({' / '.join(registered[sku])}): '{sku}'"))
+        invalid |= bad
+
+    valid = df[~invalid].copy()
+    valid["quantity"] = quantity[~invalid].astype("int64")
+    errors.sort()
+    return valid, errors
+
+# --- Importação ---
+
+def import_file(source, file_format, dry_run=False, chunk_size=DEFAULT_CHUNK_SIZE,
+                actor=None, location=None, pool=None, progress=None):
+    """
+    Importa o arquivo bloco a bloco para o local `location` (None = local padrão).
+    Em `dry_run` apenas valida, sem gravar nada.
+    `progress(linhas_lidas)` é chamado após cada bloco, se informado.
+
+    Retorna um relatório: {"rows", "imported", "errors", "seconds"}, em que
+    "errors" lista (linha, coluna, mensagem) de cada linha rejeitada. As linhas
+    são numeradas a partir de 2 (a linha 1 é o cabeçalho).
+    """
+    started = time.perf_counter()
+    rows_read = imported = 0
+    errors = []
+    names = database.get_catalog(pool, refresh=True).names
+    if location is not None and location not in names[database.LOCATION]:
+        raise ValueError(f"Local de estoque inválido: '{location}'")
+    allowed = {d: names[d] for d in database.CATALOG_DIMENSIONS}  # valores válidos de cada catálogo
+    for chunk in iter_chunks(source, file_format, chunk_size):
+        valid, chunk_errors = validate_chunk(chunk, first_row=rows_read + 2, allowed=allowed, pool=pool)
+        rows_read += len(chunk)
+        errors.extend(chunk_errors)
+        if not dry_run and len(valid):
+            valid = valid.astype(object).where(valid.notna(), None)
+            imported += database.bulk_insert_uniforms(
+                valid.itertuples(index=False, name=None), actor=actor, location=location, pool=pool
+            )
+        if progress:
+            progress(rows_read)
+    return {
+        "rows": rows_read,
+        "imported": imported,
+        "errors": errors,
+        "seconds": time.perf_counter() - started,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa itens em lote para o banco de estoque.")
+    parser.add_argument("file", help="Arquivo .csv, .xlsx ou .parquet")
+    parser.add_argument("--format", choices=SUPPORTED_FORMATS, help="Formato (padrão: pela extensão)")
+    parser.add_argument("--dry-run", action="store_true", help="Apenas valida, sem gravar")
+    parser.add_argument("--location", help="Local de estoque que recebe as quantidades (padrão: o primeiro)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--db", default=DB_NAME, help="Arquivo do banco SQLite")
+    parser.add_argument("--errors", help="Grava o relatório de erros neste CSV")
+    args = parser.parse_args(argv)
+
+    pool = database.get_pool(args.db)
+    report = import_file(
+        args.file, args.format or detect_format(args.file), dry_run=args.dry_run,
+        chunk_size=args.chunk_size, actor="importer", location=args.location, pool=pool,
+        progress=lambda n: print(f"{n} linhas lidas...", file=sys.stderr),
+    )
+    rate = report["rows"] / report["seconds"] * 60 if report["seconds"] else 0
+    print(f"Linhas lidas: {report['rows']} | importadas: {report['imported']} | "
+          f"com erro: {len({row for row, _, _ in report['errors']})} | "
+          f"{report['seconds']:.1f}s ({rate:,.0f} linhas/min)")
+    if args.errors and report["errors"]:
+        pd.DataFrame(report["errors"], columns=["linha", "coluna", "erro"]).to_csv(args.errors, index=False)
+        print(f"Relatório de erros gravado em {args.errors}")
+    return 1 if report["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+"""
+Comandos de manutenção do banco de estoque.
+
+As tarefas periódicas (backup, instantâneo dos saldos, ANALYZE e VACUUM) ficam
+registradas em maintenance_runs; `run-due` roda as vencidas segundo
+MAINTENANCE_INTERVALS e pode ser agendado no sistema (cron, Agendador de Tarefas).
+O app roda as vencidas, menos o VACUUM, ao abrir (ver start_background).
+
+Uso:
+    python maintenance.py check-summary [--db uniforms.db]
+    python maintenance.py rebuild-summary [--db uniforms.db]
+    python maintenance.py dedupe [--dry-run] [--db uniforms.db]
+    python maintenance.py backup [--out copia.db] [--db uniforms.db]
+    python maintenance.py snapshot|analyze|vacuum [--db uniforms.db]
+    python maintenance.py run-due [--task backup ...] [--db uniforms.db]
+    python maintenance.py balances-at 2026-10-01 [--out saldos.csv] [--db uniforms.db]
+"""
+import argparse
+import csv
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+
+import backup
+import database
+import schema
+from config import DB_NAME, MAINTENANCE_INTERVALS
+
+logger = logging.getLogger(__name__)
+
+# --- Tarefas Periódicas ---
+
+def _backup_task(pool):
+    report = backup.run_backup(pool=pool)
+    return f"{report['path']} ({report['bytes'] / 1e6:.1f} MB)"
+
+def _snapshot_task(pool):
+    snapshot_id, rows = database.take_stock_snapshot(pool=pool)
+    removed = database.prune_stock_snapshots(pool=pool)
+    if rows is None:
+        taken = f"sem movimentações desde o instantâneo {snapshot_id}"
+    else:
+        taken = f"instantâneo {snapshot_id} ({rows} saldos)"
+    return f"{taken}; {removed} antigo(s) removido(s)"
+
+def _analyze_task(pool):
+    database.analyze_database(pool=pool)
+    return None
+
+def _vacuum_task(pool):
+    before, after = database.vacuum_database(pool=pool)
+    return f"{before / 1e6:.1f} MB → {after / 1e6:.1f} MB"
+
+TASKS = {
+    "backup": _backup_task,
+    "snapshot": _snapshot_task,
+    "analyze": _analyze_task,
+    "vacuum": _vacuum_task,
+}
+
+# VACUUM segura as gravações enquanto roda: fica de fora da execução pelo app.
+AUTO_TASKS = ("backup", "snapshot", "analyze")
+
+def run_task(task, pool):
+    """Roda a tarefa e registra a execução. Retorna o detalhe da execução."""
+    started = time.perf_counter()
+    detail = TASKS[task](pool)
+    database.record_maintenance_run(task, time.perf_counter() - started, detail, pool=pool)
+    return detail
+
+def due_tasks(pool, tasks=None):
+    """Tarefas (entre `tasks`, padrão todas) cujo intervalo já passou desde a última execução."""
+    runs = database.maintenance_runs(pool=pool)
+    now = time.time()
+    return [task for task in (tasks or TASKS)
+            if task not in runs or now - runs[task][0] >= MAINTENANCE_INTERVALS[task] * 3600]
+
+def run_due(pool, tasks=None):
+    """
+    Roda as tarefas vencidas. Uma que falhe é registrada no log e não impede as
+    demais. Retorna [(tarefa, detalhe ou exceção)].
+    """
+    results = []
+    for task in due_tasks(pool, tasks):
+        try:
+            results.append((task, run_task(task, pool)))
+        except (OSError, sqlite3.Error) as e:
+            logger.exception("Falha na tarefa de manutenção %s", task)
+            results.append((task, e))
+    return results
+
+_background_lock = threading.Lock()
+_background_started = False
+
+def start_background(pool):
+    """
+    Roda as tarefas vencidas de AUTO_TASKS em uma thread de fundo. Só a primeira
+    chamada do processo inicia a thread; as seguintes não fazem nada. Retorna
+    True se a thread foi iniciada agora.
+    """
+    global _background_started
+    with _background_lock:
+        if _background_started:
+            return False
+        _background_started = True
+    threading.Thread(target=run_due, args=(pool, AUTO_TASKS), name="estoque-manutencao", daemon=True).start()
+    return True
+
+# --- Comandos ---
+
+def check_summary(args):
+    problems = database.check_stock_summary(pool=database.get_pool(args.db))
+    for dimension, value, stored, expected in problems:
+        print(f"{dimension}={value!r}: mantido {stored}, esperado {expected}")
+    print("Resumo consistente." if not problems else f"{len(problems)} divergência(s) encontradas.")
+    return 1 if problems else 0
+
+def rebuild_summary(args):
+    database.rebuild_stock_summary(pool=database.get_pool(args.db))
+    print("Resumo do estoque reconstruído.")
+    return 0
+
+def dedupe(args):
+    """
+    Funde os itens duplicados (mesmo tipo, tamanho, modelo e cor) somando as
+    quantidades. Só bancos anteriores à migração 7 podem ter duplicados (ela cria
+    a chave única). O comando lista os grupos lendo o banco sem alterá-lo e, sem
+    --dry-run, migra até os catálogos com chave inteira, faz a fusão e aplica as
+    demais migrações.
+    """
+    if not os.path.exists(args.db):
+        print(f"Banco não encontrado: {args.db}")
+        return 1
+    with closing(sqlite3.connect(f"{Path(args.db).resolve().as_uri()}?mode=ro", uri=True)) as conn:
+        groups = schema.duplicate_uniforms(conn)
+    if not groups:
+        print("Nenhum item duplicado.")
+        return 0
+    for uniform_type, size, model, color, ids, quantity in groups:
+        keep_id, *others = ids.split(",")
+        print(f"{uniform_type} / {size} / {model} / {color}: itens {', '.join(others)} → item {keep_id} "
+              f"(quantidade total {quantity})")
+    if args.dry_run:
+        print(f"{len(groups)} grupo(s) seriam fundidos.")
+        return 0
+    pool = database.ConnectionPool(args.db)  # sem migrar tudo: a fusão roda antes da chave única
+    try:
+        schema.migrate(pool, until=6)
+        with pool.transaction() as conn:
+            removed = schema.merge_duplicate_uniforms(conn)
+    finally:
+        pool.close_all()
+    database.get_pool(args.db)
+    print(f"{len(groups)} grupo(s) fundidos ({removed} item(ns) removidos); o livro-razão registra as "
+          f"movimentações '{database.MOVEMENT_MERGE}'.")
+    return 0
+
+def backup_command(args):
+    pool = database.get_pool(args.db)
+    if args.out:
+        report = backup.backup_database(args.out, pool=pool)
+        print(f"Backup gravado em {report['path']} ({report['bytes'] / 1e6:.1f} MB, {report['seconds']:.1f}s).")
+        return 0
+    print(run_task("backup", pool))
+    return 0
+
+def task_command(args):
+    detail = run_task(args.command, database.get_pool(args.db))
+    print(detail or f"{args.command} concluído.")
+    return 0
+
+def run_due_command(args):
+    results = run_due(database.get_pool(args.db), args.task)
+    for task, detail in results:
+        print(f"{task}: {detail or 'ok'}")
+    if not results:
+        print("Nenhuma tarefa vencida.")
+    return 1 if any(isinstance(detail, Exception) for _, detail in results) else 0
+
+def balances_at(args):
+    """Saldos por local no início do dia (ou na hora) informado, em CSV."""
+    if not args.when:
+        print("Informe a data: AAAA-MM-DD ou \"AAAA-MM-DD HH:MM\".")
+        return 1
+    try:
+        moment = datetime.fromisoformat(args.when)
+    except ValueError:
+        print(f"Data inválida: {args.when}")
+        return 1
+    rows = database.stock_balances_at(int(moment.timestamp()), pool=database.get_pool(args.db))
+    f = open(args.out, "w", encoding="utf-8-sig", newline="") if args.out else sys.stdout
+    try:
+        writer = csv.writer(f)
+        writer.writerow(["uniform_id", "sku", "name", "location", "quantity"])
+        writer.writerows(rows)
+    finally:
+        if args.out:
+            f.close()
+    print(f"{len(rows)} saldos em {moment:%d/%m/%Y %H:%M}.", file=sys.stderr)
+    return 0
+
+COMMANDS = {
+    "check-summary": check_summary,
+    "rebuild-summary": rebuild_summary,
+    "dedupe": dedupe,
+    "backup": backup_command,
+    "snapshot": task_command,
+    "analyze": task_command,
+    "vacuum": task_command,
+    "run-due": run_due_command,
+    "balances-at": balances_at,
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manutenção do banco de estoque.")
+    parser.add_argument("command", choices=list(COMMANDS))
+    parser.add_argument("--db", default=DB_NAME, help="Arquivo do banco SQLite")
+    parser.add_argument("when", nargs="?", help="balances-at: data (AAAA-MM-DD, 00:00 = saldo de abertura) ou data e hora")
+    parser.add_argument("--dry-run", action="store_true", help="dedupe: apenas lista, sem alterar o banco")
+    parser.add_argument("--out", help="backup: arquivo do backup avulso; balances-at: arquivo CSV")
+    parser.add_argument("--task", action="append", choices=list(TASKS), help="run-due: só estas tarefas (pode repetir)")
+    args = parser.parse_args(argv)
+    return COMMANDS[args.command](args)
+
+if __name__ == "__main__":
+    sys.exit(main())
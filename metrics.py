@@ -0,0 +1,195 @@
+import bisect
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from config import SLOW_QUERY_MS
+
+# --- Métricas de Desempenho ---
+# Histogramas em memória da duração de cada função de banco ("db"), de cada
+# página ("page") e de outras etapas medidas explicitamente (ex.: montagem de
+# DataFrames). Operações de banco acima de SLOW_QUERY_MS entram no registro de
+# lentas, com o plano (EXPLAIN QUERY PLAN) de cada SELECT que executaram.
+
+logger = logging.getLogger(__name__)
+
+# Operações em lote (importações, sincronização) executam milhares de comandos:
+# o registro de lentas guarda só os primeiros distintos, com seus planos.
+SLOW_LOG_STATEMENTS = 50
+
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+class Histogram:
+    """Histograma de latências com faixas fixas (em ms)."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.lock_wait_ms = 0.0
+
+    def observe(self, ms, rows=None, lock_wait_ms=0.0):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.rows += rows or 0
+        self.lock_wait_ms += lock_wait_ms
+
+    def percentile(self, fraction):
+        """Estimativa do percentil pelo limite superior da faixa onde ele cai."""
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS + (self.max_ms,), self.counts):
+            seen += count
+            if seen >= target and count:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+class MetricsRegistry:
+    def __init__(self, slow_ms=SLOW_QUERY_MS, slow_log_size=100):
+        self.slow_ms = slow_ms
+        self._histograms = {}
+        self._slow = deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.started_at = time.time()
+
+    # Estado por thread: tempo de espera por lock e SQL executado na operação corrente.
+
+    def add_lock_wait(self, seconds):
+        """Chamado pelo pool ao conseguir o lock de escrita (BEGIN IMMEDIATE)."""
+        self._local.lock_wait = getattr(self._local, "lock_wait", 0.0) + seconds
+        self.observe("sqlite", "lock_wait", seconds * 1000)
+
+    def add_queue_wait(self, seconds):
+        """
+        Chamado pela fila de escrita antes de cada pedido: o tempo que ele esperou
+        pela vez de gravar entra na próxima medição desta thread (duração e espera
+        pelo lock), já que o lock em si é pego uma vez para o grupo.
+        """
+        self._local.queue_wait = seconds
+
+    def trace(self, statement):
+        """Callback de trace das conexões: guarda o SQL da operação em andamento."""
+        statements = getattr(self._local, "statements", None)
+        if statements is not None and not statement.startswith("--"):
+            statements.append(statement)
+
+    def observe(self, kind, name, ms, rows=None, lock_wait_ms=0.0):
+        with self._lock:
+            histogram = self._histograms.get((kind, name))
+            if histogram is None:
+                histogram = self._histograms[(kind, name)] = Histogram()
+            histogram.observe(ms, rows, lock_wait_ms)
+
+    @contextmanager
+    def measure(self, kind, name, explain=None):
+        """
+        Mede o bloco. `explain(sql)` (opcional) é usado para obter o plano das
+        consultas quando a operação passar do limite de lentidão.
+        """
+        outer_statements = getattr(self._local, "statements", None)
+        outer_wait = getattr(self._local, "lock_wait", 0.0)
+        queue_wait = getattr(self._local, "queue_wait", 0.0)
+        self._local.queue_wait = 0.0
+        self._local.statements = [] if explain else outer_statements
+        self._local.lock_wait = queue_wait
+        result = {}
+        started = time.perf_counter() - queue_wait
+        try:
+            yield result
+        finally:
+            ms = (time.perf_counter() - started) * 1000
+            lock_wait = self._local.lock_wait
+            statements = self._local.statements
+            self._local.statements = outer_statements
+            self._local.lock_wait = outer_wait + lock_wait
+            self.observe(kind, name, ms, result.get("rows"), lock_wait * 1000)
+            if explain and self.slow_ms and ms >= self.slow_ms:
+                self._log_slow(kind, name, ms, statements or [], explain)
+
+    def _log_slow(self, kind, name, ms, statements, explain):
+        plans = []
+        for sql in dict.fromkeys(statements):
+            if len(plans) >= SLOW_LOG_STATEMENTS:
+                break
+            if sql.lstrip().upper().startswith(("SELECT", "WITH")):
+                try:
+                    plans.append((sql, explain(sql)))
+                except Exception as e:  # o plano é só diagnóstico; nunca derruba a operação
+                    plans.append((sql, [f"(sem plano: {e})"]))
+            else:
+                plans.append((sql, []))
+        logger.warning("Operação lenta: %s %s levou %.1f ms (%d comandos SQL)", kind, name, ms, len(statements))
+        with self._lock:
+            self._slow.append({"at": time.time(), "kind": kind, "name": name, "ms": round(ms, 2),
+                               "statements": plans})
+
+    # Consulta
+
+    def snapshot(self):
+        """Lista de estatísticas por (tipo, nome), ordenada pelo tempo total."""
+        with self._lock:
+            items = list(self._histograms.items())
+        stats = []
+        for (kind, name), h in items:
+            stats.append({
+                "kind": kind, "name": name, "count": h.count,
+                "total_ms": round(h.total_ms, 2),
+                "avg_ms": round(h.total_ms / h.count, 3) if h.count else 0.0,
+                "p50_ms": round(h.percentile(0.50), 3), "p90_ms": round(h.percentile(0.90), 3),
+                "p99_ms": round(h.percentile(0.99), 3),
+                "max_ms": round(h.max_ms, 3), "rows": h.rows, "lock_wait_ms": round(h.lock_wait_ms, 3),
+            })
+        return sorted(stats, key=lambda s: s["total_ms"], reverse=True)
+
+    def slow_log(self):
+        with self._lock:
+            return list(self._slow)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._slow.clear()
+            self.started_at = time.time()
+
+    def render_text(self):
+        """Métricas no formato texto do Prometheus, para coleta offline."""
+        with self._lock:
+            items = sorted(self._histograms.items())
+        lines = [
+            "# HELP estoque_duration_ms Duração das operações em milissegundos.",
+            "# TYPE estoque_duration_ms histogram",
+        ]
+        for (kind, name), h in items:
+            labels = f'kind="{kind}",name="{name}"'
+            cumulative = 0
+            for bound, count in zip(BUCKETS_MS, h.counts):
+                cumulative += count
+                lines.append(f'estoque_duration_ms_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'estoque_duration_ms_bucket{{{labels},le="+Inf"}} {h.count}')
+            lines.append(f"estoque_duration_ms_sum{{{labels}}} {h.total_ms:.3f}")
+            lines.append(f"estoque_duration_ms_count{{{labels}}} {h.count}")
+        lines.append("# TYPE estoque_rows_total counter")
+        lines.extend(f'estoque_rows_total{{kind="{k}",name="{n}"}} {h.rows}' for (k, n), h in items if h.rows)
+        lines.append("# TYPE estoque_lock_wait_ms_total counter")
+        lines.extend(f'estoque_lock_wait_ms_total{{kind="{k}",name="{n}"}} {h.lock_wait_ms:.3f}'
+                     for (k, n), h in items if h.lock_wait_ms)
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+def count_rows(result):
+    """Quantas linhas uma função de banco retornou (para as métricas)."""
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple) and result and isinstance(result[0], list):
+        return len(result[0])  # ex.: (linhas, cursor) da listagem paginada
+    if isinstance(result, dict):
+        return len(result)
+    return 1 if result is not None else 0
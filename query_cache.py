@@ -0,0 +1,88 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# --- Cache de Leituras ---
+
+class QueryCache:
+    """
+    Cache LRU (limitado por tamanho e TTL) para o resultado das consultas de leitura.
+
+    As entradas valem para uma "versão dos dados" formada por:
+      - um contador local, incrementado a cada escrita feita por este processo;
+      - o `PRAGMA data_version` de uma conexão exclusiva de observação, que muda
+        sempre que QUALQUER outra conexão (de qualquer sessão ou processo) grava
+        no mesmo arquivo.
+    Quando a versão muda, o cache inteiro é descartado antes da próxima leitura.
+    """
+
+    def __init__(self, db_path, max_entries=256, ttl=30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._watcher = sqlite3.connect(db_path, check_same_thread=False)
+        self._write_version = 0
+        self._version = None
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def bump(self):
+        """Registra uma escrita local (chamado após cada commit)."""
+        with self._lock:
+            self._write_version += 1
+
+    def _current_version(self):
+        with self._lock:
+            data_version = self._watcher.execute("PRAGMA data_version").fetchone()[0]
+            return (self._write_version, data_version)
+
+    def get_or_load(self, key, loader):
+        """Retorna o valor em cache para `key` ou executa `loader()` e guarda o resultado."""
+        version = self._current_version()
+        now = time.monotonic()
+        with self._lock:
+            if version != self._version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._version = version
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = loader()
+
+        with self._lock:
+            # Só guarda se ninguém gravou enquanto a consulta rodava.
+            if self._version == version:
+                self._entries[key] = (now + self.ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Estatísticas de acerto do cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "write_version": self._write_version,
+            }
+
+    def close(self):
+        self._watcher.close()
@@ -0,0 +1,945 @@
+import hashlib
+import os
+import threading
+
+from config import COLORS, LOCATIONS, LOW_STOCK_THRESHOLD, MODELS, SIZES, UNIFORM_TYPES
+
+# --- Migrações do Esquema ---
+# Cada migração roda uma única vez por arquivo de banco; a versão aplicada fica
+# gravada em `PRAGMA user_version`. Para alterar o esquema, acrescente uma nova
+# entrada ao FINAL da lista (nunca edite uma migração já publicada), pois os
+# bancos já distribuídos (inclusive o uniforms.db do pacote PyInstaller) só
+# executam as versões que ainda não têm.
+
+def _migration_1(conn):
+    """Tabela inicial de itens (já existe em bancos criados antes das migrações)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS uniforms (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            type TEXT NOT NULL,
+            size TEXT NOT NULL,
+            model TEXT NOT NULL,
+            color TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            description TEXT
+        )
+    """)
+
+def _migration_2(conn):
+    """
+    Livro-razão de movimentações (somente inserção). A chave é o rowid e há um
+    único índice secundário, para manter as inserções baratas mesmo com a
+    tabela crescendo bem mais rápido que `uniforms`. Os saldos já existentes
+    entram como movimentação "Inicial", de modo que a soma dos deltas de cada
+    item sempre bate com `uniforms.quantity`.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS stock_movements (
+            id INTEGER PRIMARY KEY,
+            uniform_id INTEGER NOT NULL,
+            delta INTEGER NOT NULL,
+            movement_type TEXT NOT NULL,
+            created_at INTEGER NOT NULL,
+            actor TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_stock_movements_uniform
+        ON stock_movements (uniform_id, id)
+    """)
+    conn.execute("""
+        INSERT INTO stock_movements (uniform_id, delta, movement_type, created_at)
+        SELECT id, quantity, 'Inicial', CAST(strftime('%s', 'now') AS INTEGER)
+        FROM uniforms WHERE quantity <> 0
+    """)
+
+def _migration_3(conn):
+    """Índices compostos usados pelos filtros e ordenações da listagem paginada."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_uniforms_model_type_size_color ON uniforms (model, type, size, color)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_uniforms_type_size ON uniforms (type, size)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_uniforms_color ON uniforms (color)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_uniforms_quantity ON uniforms (quantity)")
+
+def _migration_4(conn):
+    """
+    Índice de texto completo (FTS5) sobre nome, descrição e atributos, com
+    conteúdo externo na própria `uniforms` e mantido por triggers. Mudanças só
+    de quantidade não tocam o índice.
+    """
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS uniforms_fts USING fts5(
+            name, description, type, size, model, color,
+            content='uniforms', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+        )
+    """)
+    # Um execute por trigger: executescript() faria COMMIT no meio da migração.
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS uniforms_fts_ai AFTER INSERT ON uniforms BEGIN
+            INSERT INTO uniforms_fts (rowid, name, description, type, size, model, color)
+            VALUES (new.id, new.name, new.description, new.type, new.size, new.model, new.color);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS uniforms_fts_ad AFTER DELETE ON uniforms BEGIN
+            INSERT INTO uniforms_fts (uniforms_fts, rowid, name, description, type, size, model, color)
+            VALUES ('delete', old.id, old.name, old.description, old.type, old.size, old.model, old.color);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS uniforms_fts_au
+        AFTER UPDATE OF name, description, type, size, model, color ON uniforms BEGIN
+            INSERT INTO uniforms_fts (uniforms_fts, rowid, name, description, type, size, model, color)
+            VALUES ('delete', old.id, old.name, old.description, old.type, old.size, old.model, old.color);
+            INSERT INTO uniforms_fts (rowid, name, description, type, size, model, color)
+            VALUES (new.id, new.name, new.description, new.type, new.size, new.model, new.color);
+        END
+    """)
+    conn.execute("INSERT INTO uniforms_fts (uniforms_fts) VALUES ('rebuild')")
+
+# --- Resumo do Estoque ---
+# stock_summary guarda, por dimensão (modelo, tipo, tamanho, cor e o total geral),
+# a contagem de itens, a soma das quantidades e quantos itens estão zerados ou
+# com estoque baixo. Triggers aplicam só a diferença de cada alteração, então o
+# painel lê O(grupos) linhas em vez de agrupar a tabela inteira.
+
+SUMMARY_DIMENSIONS = ("model", "type", "size", "color")
+# Coluna de `uniforms` que identifica o valor de cada dimensão e o valor da linha
+# "total". Desde a migração 6 são as chaves dos catálogos; a migração 5 ainda
+# trabalhava sobre as colunas de texto.
+SUMMARY_KEYS = {d: f"{d}_id" for d in SUMMARY_DIMENSIONS}
+SUMMARY_TOTAL = 0
+_TEXT_SUMMARY_KEYS = {d: d for d in SUMMARY_DIMENSIONS}
+
+def _dimension_values(row, keys, total):
+    """Subconsulta com uma linha (dimension, value) por dimensão do item `row` (new/old)."""
+    selects = [f"SELECT 'total' AS dimension, {total!r} AS value"]
+    selects += [f"SELECT '{d}', {row}.{keys[d]}" for d in SUMMARY_DIMENSIONS]
+    return " UNION ALL ".join(selects)
+
+def _zero(q):
+    return f"({q} = 0)"
+
+def _low(q, threshold):
+    return f"({q} > 0 AND {q} <= {threshold})"
+
+def _summary_upsert(row, items, quantity, zero_items, low_items, keys, total):
+    """Soma os valores dados à linha de cada dimensão do item `row` (criando-a se preciso)."""
+    # O "WHERE true" evita a ambiguidade do parser entre ON CONFLICT e um JOIN ... ON.
+    return f"""
+        INSERT INTO stock_summary (dimension, value, items, quantity, zero_items, low_items)
+        SELECT dimension, value, {items}, {quantity}, {zero_items}, {low_items}
+        FROM ({_dimension_values(row, keys, total)}) WHERE true
+        ON CONFLICT (dimension, value) DO UPDATE SET
+            items = items + excluded.items,
+            quantity = quantity + excluded.quantity,
+            zero_items = zero_items + excluded.zero_items,
+            low_items = low_items + excluded.low_items;
+    """
+
+def create_summary_triggers(conn, threshold=LOW_STOCK_THRESHOLD, keys=SUMMARY_KEYS, total=SUMMARY_TOTAL):
+    """(Re)cria os triggers que mantêm stock_summary; o limite de estoque baixo fica embutido neles."""
+    threshold = int(threshold)
+    add_new = _summary_upsert("new", 1, "new.quantity", _zero("new.quantity"), _low("new.quantity", threshold),
+                              keys, total)
+    remove_old = _summary_upsert("old", -1, "-old.quantity", f"-{_zero('old.quantity')}",
+                                 f"-{_low('old.quantity', threshold)}", keys, total)
+    attrs_changed = " OR ".join(f"old.{keys[d]} IS NOT new.{keys[d]}" for d in SUMMARY_DIMENSIONS)
+
+    for name in ("ai", "ad", "au_attrs", "au_quantity"):
+        conn.execute(f"DROP TRIGGER IF EXISTS stock_summary_{name}")
+    conn.execute(f"CREATE TRIGGER stock_summary_ai AFTER INSERT ON uniforms BEGIN {add_new} END")
+    conn.execute(f"CREATE TRIGGER stock_summary_ad AFTER DELETE ON uniforms BEGIN {remove_old} END")
+    conn.execute(f"""
+        CREATE TRIGGER stock_summary_au_attrs
+        AFTER UPDATE OF quantity, {", ".join(keys[d] for d in SUMMARY_DIMENSIONS)} ON uniforms
+        WHEN {attrs_changed} BEGIN {remove_old} {add_new} END
+    """)
+    # Caminho quente (movimentações): só a quantidade mudou, então basta um upsert de diferenças.
+    quantity_delta = _summary_upsert(
+        "new", 0, "new.quantity - old.quantity",
+        f"{_zero('new.quantity')} - {_zero('old.quantity')}",
+        f"{_low('new.quantity', threshold)} - {_low('old.quantity', threshold)}",
+        keys, total,
+    )
+    conn.execute(f"""
+        CREATE TRIGGER stock_summary_au_quantity AFTER UPDATE OF quantity ON uniforms
+        WHEN old.quantity <> new.quantity AND NOT ({attrs_changed}) BEGIN {quantity_delta} END
+    """)
+
+def summary_source_sql(threshold=LOW_STOCK_THRESHOLD, keys=SUMMARY_KEYS, total=SUMMARY_TOTAL):
+    """Consulta que calcula o resumo do zero a partir de `uniforms` (conferência e reconstrução)."""
+    threshold = int(threshold)
+    aggregates = (f"COUNT(*), COALESCE(SUM(quantity), 0), COALESCE(SUM({_zero('quantity')}), 0), "
+                  f"COALESCE(SUM({_low('quantity', threshold)}), 0)")
+    parts = [f"SELECT 'total', {total!r}, {aggregates} FROM uniforms"]
+    parts += [f"SELECT '{d}', {keys[d]}, {aggregates} FROM uniforms GROUP BY {keys[d]}" for d in SUMMARY_DIMENSIONS]
+    return " UNION ALL ".join(parts)
+
+def _migration_5(conn):
+    """Tabela de resumo do estoque mantida por triggers (painel da página inicial)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS stock_summary (
+            dimension TEXT NOT NULL,
+            value TEXT NOT NULL,
+            items INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            zero_items INTEGER NOT NULL,
+            low_items INTEGER NOT NULL,
+            PRIMARY KEY (dimension, value)
+        ) WITHOUT ROWID
+    """)
+    create_summary_triggers(conn, keys=_TEXT_SUMMARY_KEYS, total="")
+    conn.execute("DELETE FROM stock_summary")
+    conn.execute(f"INSERT INTO stock_summary {summary_source_sql(keys=_TEXT_SUMMARY_KEYS, total='')}")
+
+# --- Catálogos ---
+# Tipo, tamanho, modelo e cor ficam em tabelas de valores com chave inteira, e
+# `uniforms` guarda só as chaves: linhas e índices menores, filtros e
+# agrupamentos comparando inteiros, e catálogos editáveis sem mexer no código.
+# A view uniform_records devolve os itens já com os nomes.
+
+CATALOG_TABLES = {"type": "uniform_types", "size": "sizes", "model": "models", "color": "colors"}
+_CATALOG_SEEDS = {"type": UNIFORM_TYPES, "size": SIZES, "model": MODELS, "color": COLORS}
+
+def catalog_name_sql(dimension, key):
+    """Subconsulta com o nome do valor `key` (ex.: old.size_id) no catálogo da dimensão."""
+    return f"(SELECT name FROM {CATALOG_TABLES[dimension]} WHERE id = {key})"
+
+def _fts_values(row):
+    names = ", ".join(catalog_name_sql(d, f"{row}.{d}_id") for d in ("type", "size", "model", "color"))
+    return f"{row}.id, {row}.name, {row}.description, {names}"
+
+def _migration_6(conn):
+    """
+    Catálogos com chave inteira. Cria as tabelas de valores (com os valores de
+    config.py e mais os que já estiverem em uso), reconstrói `uniforms` com as
+    chaves no lugar do texto e refaz sobre elas os índices, a busca de texto
+    completo e o resumo do estoque. Os IDs dos itens (e o próximo a ser gerado)
+    são preservados, pois o livro-razão os referencia.
+    """
+    for dimension, table in CATALOG_TABLES.items():
+        conn.execute(f"""
+            CREATE TABLE {table} (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE,
+                position INTEGER NOT NULL
+            )
+        """)
+        conn.executemany(f"INSERT INTO {table} (name, position) VALUES (?, ?)",
+                         [(name, position) for position, name in enumerate(_CATALOG_SEEDS[dimension])])
+        conn.execute(f"""
+            INSERT INTO {table} (name, position)
+            SELECT value, ? + ROW_NUMBER() OVER (ORDER BY value)
+            FROM (SELECT DISTINCT {dimension} AS value FROM uniforms)
+            WHERE value NOT IN (SELECT name FROM {table})
+        """, (len(_CATALOG_SEEDS[dimension]) - 1,))
+
+    for trigger in ("uniforms_fts_ai", "uniforms_fts_ad", "uniforms_fts_au", "stock_summary_ai",
+                    "stock_summary_ad", "stock_summary_au_attrs", "stock_summary_au_quantity"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute("DROP TABLE IF EXISTS uniforms_fts")
+    conn.execute("DROP TABLE IF EXISTS stock_summary")
+
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'uniforms'").fetchone()
+    next_id_floor = row[0] if row else 0
+    conn.execute("""
+        CREATE TABLE uniforms_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            type_id INTEGER NOT NULL REFERENCES uniform_types (id),
+            size_id INTEGER NOT NULL REFERENCES sizes (id),
+            model_id INTEGER NOT NULL REFERENCES models (id),
+            color_id INTEGER NOT NULL REFERENCES colors (id),
+            quantity INTEGER NOT NULL,
+            description TEXT
+        )
+    """)
+    conn.execute("""
+        INSERT INTO uniforms_new (id, name, type_id, size_id, model_id, color_id, quantity, description)
+        SELECT u.id, u.name, t.id, s.id, m.id, c.id, u.quantity, u.description
+        FROM uniforms AS u
+        JOIN uniform_types AS t ON t.name = u.type
+        JOIN sizes AS s ON s.name = u.size
+        JOIN models AS m ON m.name = u.model
+        JOIN colors AS c ON c.name = u.color
+    """)
+    conn.execute("DROP TABLE uniforms")
+    conn.execute("ALTER TABLE uniforms_new RENAME TO uniforms")
+    # Mantém o AUTOINCREMENT acima de IDs já excluídos (que continuam no livro-razão).
+    conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'uniforms'", (next_id_floor,))
+    if next_id_floor and conn.execute("SELECT changes()").fetchone()[0] == 0:
+        conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('uniforms', ?)", (next_id_floor,))
+
+    conn.execute("CREATE INDEX idx_uniforms_model_type_size_color ON uniforms (model_id, type_id, size_id, color_id)")
+    conn.execute("CREATE INDEX idx_uniforms_type_size ON uniforms (type_id, size_id)")
+    conn.execute("CREATE INDEX idx_uniforms_color ON uniforms (color_id)")
+    conn.execute("CREATE INDEX idx_uniforms_quantity ON uniforms (quantity)")
+
+    # LEFT JOIN fixa `uniforms` como tabela externa: os catálogos entram só por chave primária.
+    conn.execute("""
+        CREATE VIEW uniform_records AS
+        SELECT u.id, u.name, t.name AS type, s.name AS size, m.name AS model, c.name AS color,
+               u.quantity, u.description, u.type_id, u.size_id, u.model_id, u.color_id
+        FROM uniforms AS u
+        LEFT JOIN uniform_types AS t ON t.id = u.type_id
+        LEFT JOIN sizes AS s ON s.id = u.size_id
+        LEFT JOIN models AS m ON m.id = u.model_id
+        LEFT JOIN colors AS c ON c.id = u.color_id
+    """)
+
+    # Busca de texto completo: mesmo índice da migração 4, agora com conteúdo na view.
+    conn.execute("""
+        CREATE VIRTUAL TABLE uniforms_fts USING fts5(
+            name, description, type, size, model, color,
+            content='uniform_records', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+        )
+    """)
+    fts_columns = "rowid, name, description, type, size, model, color"
+    conn.execute(f"""
+        CREATE TRIGGER uniforms_fts_ai AFTER INSERT ON uniforms BEGIN
+            INSERT INTO uniforms_fts ({fts_columns}) VALUES ({_fts_values("new")});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER uniforms_fts_ad AFTER DELETE ON uniforms BEGIN
+            INSERT INTO uniforms_fts (uniforms_fts, {fts_columns}) VALUES ('delete', {_fts_values("old")});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER uniforms_fts_au
+        AFTER UPDATE OF name, description, type_id, size_id, model_id, color_id ON uniforms BEGIN
+            INSERT INTO uniforms_fts (uniforms_fts, {fts_columns}) VALUES ('delete', {_fts_values("old")});
+            INSERT INTO uniforms_fts ({fts_columns}) VALUES ({_fts_values("new")});
+        END
+    """)
+    conn.execute("INSERT INTO uniforms_fts (uniforms_fts) VALUES ('rebuild')")
+
+    conn.execute("""
+        CREATE TABLE stock_summary (
+            dimension TEXT NOT NULL,
+            value INTEGER NOT NULL,
+            items INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            zero_items INTEGER NOT NULL,
+            low_items INTEGER NOT NULL,
+            PRIMARY KEY (dimension, value)
+        ) WITHOUT ROWID
+    """)
+    create_summary_triggers(conn)
+    conn.execute(f"INSERT INTO stock_summary {summary_source_sql()}")
+
+# --- Chave Única dos Itens ---
+# Um item é identificado por (tipo, tamanho, modelo, cor): cadastrar de novo a
+# mesma combinação soma a quantidade ao item existente em vez de criar outro.
+# O SKU (código de barras) é opcional e também único.
+
+def duplicate_uniforms(conn):
+    """
+    Grupos de itens com o mesmo tipo, tamanho, modelo e cor, como tuplas
+    (tipo, tamanho, modelo, cor, IDs separados por vírgula, quantidade somada).
+    Funciona em qualquer versão do esquema (ver `maintenance.py dedupe`).
+    """
+    source = "uniform_records" if get_schema_version(conn) >= 6 else "uniforms"
+    return conn.execute(f"""
+        SELECT type, size, model, color, GROUP_CONCAT(id, ','), SUM(quantity)
+        FROM (SELECT * FROM {source} ORDER BY id)
+        GROUP BY type, size, model, color HAVING COUNT(*) > 1
+        ORDER BY MIN(id)
+    """).fetchall()
+
+def merge_duplicate_uniforms(conn):
+    """
+    Funde cada grupo de duplicados no item de menor ID: soma as quantidades,
+    aproveita nome e descrição dos outros se os do item mantido estiverem vazios
+    e remove os demais. O livro-razão recebe um par de movimentações "Fusão"
+    (saída na duplicata, entrada no item mantido), então a soma dos deltas de
+    cada item continua batendo com o saldo. Trabalha sobre o esquema da versão 6
+    (catálogos com chave inteira, ainda sem a chave única): roda na migração 7 e
+    em `maintenance.py dedupe`. Retorna quantos itens foram removidos.
+    """
+    conn.execute("""
+        CREATE TEMP TABLE uniform_merges AS
+        SELECT u.id AS duplicate_id, k.keep_id, u.quantity
+        FROM uniforms AS u
+        JOIN (SELECT type_id, size_id, model_id, color_id, MIN(id) AS keep_id FROM uniforms
+              GROUP BY type_id, size_id, model_id, color_id HAVING COUNT(*) > 1) AS k
+        USING (type_id, size_id, model_id, color_id)
+        WHERE u.id <> k.keep_id
+    """)
+    now = "CAST(strftime('%s', 'now') AS INTEGER)"
+    conn.execute(f"""
+        INSERT INTO stock_movements (uniform_id, delta, movement_type, created_at)
+        SELECT duplicate_id, -quantity, 'Fusão', {now} FROM temp.uniform_merges WHERE quantity <> 0
+    """)
+    conn.execute(f"""
+        INSERT INTO stock_movements (uniform_id, delta, movement_type, created_at)
+        SELECT keep_id, SUM(quantity), 'Fusão', {now} FROM temp.uniform_merges
+        GROUP BY keep_id HAVING SUM(quantity) <> 0
+    """)
+
+    def first_filled(column):
+        return f"""(SELECT d.{column} FROM temp.uniform_merges AS m JOIN uniforms AS d ON d.id = m.duplicate_id
+                    WHERE m.keep_id = uniforms.id AND COALESCE(d.{column}, '') <> '' ORDER BY d.id LIMIT 1)"""
+
+    conn.execute(f"""
+        UPDATE uniforms SET
+            quantity = uniforms.quantity + m.quantity,
+            name = COALESCE(NULLIF(uniforms.name, ''), {first_filled("name")}, uniforms.name),
+            description = COALESCE(NULLIF(uniforms.description, ''), {first_filled("description")},
+                                   uniforms.description)
+        FROM (SELECT keep_id, SUM(quantity) AS quantity FROM temp.uniform_merges GROUP BY keep_id) AS m
+        WHERE uniforms.id = m.keep_id
+    """)
+    removed = conn.execute("DELETE FROM uniforms WHERE id IN (SELECT duplicate_id FROM temp.uniform_merges)").rowcount
+    conn.execute("DROP TABLE temp.uniform_merges")
+    return removed
+
+def _migration_7(conn):
+    """
+    Coluna `sku` e chave única (tipo, tamanho, modelo, cor). Os duplicados já
+    existentes são fundidos antes, e a view uniform_records passa a trazer o SKU.
+    """
+    conn.execute("ALTER TABLE uniforms ADD COLUMN sku TEXT")
+    merge_duplicate_uniforms(conn)
+
+    # Mesmo índice da listagem, agora único: é também o alvo do ON CONFLICT do cadastro.
+    conn.execute("DROP INDEX idx_uniforms_model_type_size_color")
+    conn.execute("""
+        CREATE UNIQUE INDEX idx_uniforms_model_type_size_color
+        ON uniforms (model_id, type_id, size_id, color_id)
+    """)
+    # Parcial: itens sem código não ocupam o índice, e `sku = ?` ainda o usa.
+    conn.execute("CREATE UNIQUE INDEX idx_uniforms_sku ON uniforms (sku) WHERE sku IS NOT NULL")
+
+    conn.execute("DROP VIEW uniform_records")
+    conn.execute("""
+        CREATE VIEW uniform_records AS
+        SELECT u.id, u.name, t.name AS type, s.name AS size, m.name AS model, c.name AS color,
+               u.quantity, u.description, u.sku, u.type_id, u.size_id, u.model_id, u.color_id
+        FROM uniforms AS u
+        LEFT JOIN uniform_types AS t ON t.id = u.type_id
+        LEFT JOIN sizes AS s ON s.id = u.size_id
+        LEFT JOIN models AS m ON m.id = u.model_id
+        LEFT JOIN colors AS c ON c.id = u.color_id
+    """)
+
+# --- Reposição ---
+# Cada item tem um estoque mínimo e um ponto de reposição (NULL ou 0 = não monitorar).
+# O índice parcial contém só os itens com saldo no ponto de reposição ou abaixo
+# dele; o próprio SQLite o mantém a cada movimentação, então a lista "o que
+# repor" é uma leitura do índice, sem percorrer a tabela.
+
+REORDER_CONDITION = "reorder_level > 0 AND quantity <= reorder_level"  # deve ser repetida literalmente nas consultas
+
+def _migration_8(conn):
+    """Estoque mínimo e ponto de reposição por item, com o índice parcial dos itens a repor."""
+    conn.execute("ALTER TABLE uniforms ADD COLUMN min_quantity INTEGER NOT NULL DEFAULT 0")
+    conn.execute("ALTER TABLE uniforms ADD COLUMN reorder_level INTEGER")
+    conn.execute(f"CREATE INDEX idx_uniforms_reorder ON uniforms (quantity) WHERE {REORDER_CONDITION}")
+
+    conn.execute("DROP VIEW uniform_records")
+    conn.execute("""
+        CREATE VIEW uniform_records AS
+        SELECT u.id, u.name, t.name AS type, s.name AS size, m.name AS model, c.name AS color,
+               u.quantity, u.description, u.sku, u.min_quantity, u.reorder_level,
+               u.type_id, u.size_id, u.model_id, u.color_id
+        FROM uniforms AS u
+        LEFT JOIN uniform_types AS t ON t.id = u.type_id
+        LEFT JOIN sizes AS s ON s.id = u.size_id
+        LEFT JOIN models AS m ON m.id = u.model_id
+        LEFT JOIN colors AS c ON c.id = u.color_id
+    """)
+
+# --- Locais de Estoque ---
+# O saldo fica em stock_balances, uma linha por (local, item) que já teve estoque
+# no local. `uniforms.quantity` passa a ser o total consolidado do item, mantido
+# pelos triggers de stock_balances (nunca altere direto), e por isso o resumo,
+# o índice de reposição e a listagem geral continuam lendo uma coluna só. O
+# resumo ganha a dimensão "location", mantida pelos mesmos triggers.
+# O local e o item de uma linha de saldo nunca mudam.
+
+LOCATION_TABLE = "locations"
+
+def _location_summary_upsert(row, items, quantity, zero_items, low_items):
+    return f"""
+        INSERT INTO stock_summary (dimension, value, items, quantity, zero_items, low_items)
+        VALUES ('location', {row}.location_id, {items}, {quantity}, {zero_items}, {low_items})
+        ON CONFLICT (dimension, value) DO UPDATE SET
+            items = items + excluded.items,
+            quantity = quantity + excluded.quantity,
+            zero_items = zero_items + excluded.zero_items,
+            low_items = low_items + excluded.low_items;
+    """
+
+def create_balance_triggers(conn, threshold=LOW_STOCK_THRESHOLD):
+    """(Re)cria os triggers de stock_balances: total do item em `uniforms` e resumo por local."""
+    threshold = int(threshold)
+    for name in ("ai", "ad", "au"):
+        conn.execute(f"DROP TRIGGER IF EXISTS stock_balances_{name}")
+    conn.execute(f"""
+        CREATE TRIGGER stock_balances_ai AFTER INSERT ON stock_balances BEGIN
+            UPDATE uniforms SET quantity = quantity + new.quantity WHERE id = new.uniform_id AND new.quantity <> 0;
+            {_location_summary_upsert("new", 1, "new.quantity", _zero("new.quantity"),
+                                      _low("new.quantity", threshold))}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER stock_balances_ad AFTER DELETE ON stock_balances BEGIN
+            UPDATE uniforms SET quantity = quantity - old.quantity WHERE id = old.uniform_id AND old.quantity <> 0;
+            {_location_summary_upsert("old", -1, "-old.quantity", f"-{_zero('old.quantity')}",
+                                      f"-{_low('old.quantity', threshold)}")}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER stock_balances_au AFTER UPDATE OF quantity ON stock_balances
+        WHEN old.quantity <> new.quantity BEGIN
+            UPDATE uniforms SET quantity = quantity + new.quantity - old.quantity WHERE id = new.uniform_id;
+            {_location_summary_upsert("new", 0, "new.quantity - old.quantity",
+                                      f"{_zero('new.quantity')} - {_zero('old.quantity')}",
+                                      f"{_low('new.quantity', threshold)} - {_low('old.quantity', threshold)}")}
+        END
+    """)
+
+def location_summary_source_sql(threshold=LOW_STOCK_THRESHOLD):
+    """Consulta que calcula do zero as linhas "location" do resumo a partir de stock_balances."""
+    threshold = int(threshold)
+    return f"""
+        SELECT 'location', location_id, COUNT(*), SUM(quantity), SUM({_zero('quantity')}),
+               SUM({_low('quantity', threshold)})
+        FROM stock_balances GROUP BY location_id
+    """
+
+def _migration_9(conn):
+    """
+    Locais de estoque e saldo por (local, item). Todo o saldo existente vai para o
+    primeiro local, e as movimentações já gravadas ficam registradas nele.
+    """
+    conn.execute(f"""
+        CREATE TABLE {LOCATION_TABLE} (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            position INTEGER NOT NULL
+        )
+    """)
+    conn.executemany(f"INSERT INTO {LOCATION_TABLE} (name, position) VALUES (?, ?)",
+                     [(name, position) for position, name in enumerate(LOCATIONS)])
+    default_id = conn.execute(f"SELECT MIN(id) FROM {LOCATION_TABLE}").fetchone()[0]
+
+    # WITHOUT ROWID: a linha é a própria chave (local, item), sem um B-tree extra.
+    # A chave serve a listagem de um local em ordem de ID; os índices servem o
+    # saldo de um item em todos os locais e a ordenação por saldo dentro do local.
+    conn.execute(f"""
+        CREATE TABLE stock_balances (
+            location_id INTEGER NOT NULL REFERENCES {LOCATION_TABLE} (id),
+            uniform_id INTEGER NOT NULL REFERENCES uniforms (id) ON DELETE CASCADE,
+            quantity INTEGER NOT NULL CHECK (quantity >= 0),
+            PRIMARY KEY (location_id, uniform_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX idx_stock_balances_uniform ON stock_balances (uniform_id)")
+    conn.execute("CREATE INDEX idx_stock_balances_location_quantity ON stock_balances (location_id, quantity)")
+    # Antes dos triggers: o total em `uniforms` já está certo.
+    conn.execute("INSERT INTO stock_balances (location_id, uniform_id, quantity) SELECT ?, id, quantity FROM uniforms",
+                 (default_id,))
+    create_balance_triggers(conn)
+    conn.execute(f"INSERT INTO stock_summary {location_summary_source_sql()}")
+
+    # O padrão da coluna evita reescrever o livro-razão inteiro.
+    conn.execute(f"ALTER TABLE stock_movements ADD COLUMN location_id INTEGER NOT NULL DEFAULT {int(default_id)}")
+
+    # Mesmas colunas de uniform_records, com o saldo do local no lugar do total.
+    conn.execute(f"""
+        CREATE VIEW location_records AS
+        SELECT b.uniform_id AS id, u.name, t.name AS type, s.name AS size, m.name AS model, c.name AS color,
+               b.quantity, u.description, u.sku, u.min_quantity, u.reorder_level,
+               u.type_id, u.size_id, u.model_id, u.color_id, b.location_id, u.quantity AS total_quantity
+        FROM stock_balances AS b
+        JOIN uniforms AS u ON u.id = b.uniform_id
+        LEFT JOIN uniform_types AS t ON t.id = u.type_id
+        LEFT JOIN sizes AS s ON s.id = u.size_id
+        LEFT JOIN models AS m ON m.id = u.model_id
+        LEFT JOIN colors AS c ON c.id = u.color_id
+    """)
+
+# --- Registro de Alterações (Sincronização) ---
+# Cada instalação (site) grava em change_log, por triggers, toda alteração feita
+# nela: atributos e exclusão de itens, valores dos catálogos e dos locais, e as
+# movimentações do livro-razão. sync.py troca esse registro entre os sites em
+# pacotes incrementais (só as linhas acima da marca d'água do par), então o custo
+# depende do número de alterações e não do tamanho do banco. Linhas locais têm
+# origin/origin_seq NULL; as recebidas guardam a origem, que identifica a
+# alteração em todos os sites e impede que ela seja aplicada duas vezes.
+#
+# Entre sites o item é identificado pelo `uid` de sync_items, não pelo ID local.
+# O saldo é replicado como movimentações (deltas), que comutam: os sites chegam à
+# mesma soma em qualquer ordem. Os atributos do item seguem a gravação mais
+# recente por (changed_at, site), guardada em sync_item_versions.
+
+CHANGE_ITEM = "item"
+CHANGE_DELETE = "delete"
+CHANGE_MOVEMENT = "movement"
+CHANGE_CATALOG = "catalog"
+
+SYNC_ITEM_COLUMNS = ("name", "description", "sku", "type_id", "size_id", "model_id", "color_id",
+                     "min_quantity", "reorder_level")
+
+_NOW_MS = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+# O que a sincronização aplica já está no registro, com a origem: não é gravado de novo.
+_LOCAL_CHANGE = "NOT (SELECT applying FROM sync_state)"
+
+def _log_change(entity, payload):
+    return f"INSERT INTO change_log (changed_at, entity, payload) VALUES ({_NOW_MS}, '{entity}', {payload});"
+
+def _item_uid(uniform_id):
+    return f"(SELECT MIN(uid) FROM sync_items WHERE uniform_id = {uniform_id})"
+
+def _item_payload(row):
+    names = ", ".join(f"'{d}', {catalog_name_sql(d, f'{row}.{d}_id')}" for d in CATALOG_TABLES)
+    return f"""json_object('item', {_item_uid(f"{row}.id")}, 'name', {row}.name, {names},
+                           'description', {row}.description, 'sku', {row}.sku,
+                           'min_quantity', {row}.min_quantity, 'reorder_level', {row}.reorder_level)"""
+
+def create_change_triggers(conn):
+    """(Re)cria os triggers que gravam as alterações locais em change_log."""
+    value_tables = {**CATALOG_TABLES, "location": LOCATION_TABLE}
+    names = ["uniforms_ai", "uniforms_au", "uniforms_bd", "stock_movements_ai"]
+    names += [f"{table}_{event}" for table in value_tables.values() for event in ("ai", "au_name", "au_position", "ad")]
+    for name in names:
+        conn.execute(f"DROP TRIGGER IF EXISTS change_log_{name}")
+
+    stamp = f"""
+        INSERT INTO sync_item_versions (uniform_id, changed_at, origin) VALUES (new.id, {_NOW_MS}, NULL)
+        ON CONFLICT (uniform_id) DO UPDATE SET changed_at = excluded.changed_at, origin = NULL;
+    """
+    conn.execute(f"""
+        CREATE TRIGGER change_log_uniforms_ai AFTER INSERT ON uniforms WHEN {_LOCAL_CHANGE} BEGIN
+            INSERT INTO sync_items (uid, uniform_id) VALUES (lower(hex(randomblob(8))), new.id);
+            {stamp}
+            {_log_change(CHANGE_ITEM, _item_payload("new"))}
+        END
+    """)
+    # Só os atributos: a quantidade muda pelas movimentações, que têm registro próprio.
+    changed = " OR ".join(f"old.{column} IS NOT new.{column}" for column in SYNC_ITEM_COLUMNS)
+    conn.execute(f"""
+        CREATE TRIGGER change_log_uniforms_au AFTER UPDATE OF {", ".join(SYNC_ITEM_COLUMNS)} ON uniforms
+        WHEN ({changed}) AND {_LOCAL_CHANGE} BEGIN
+            {stamp}
+            {_log_change(CHANGE_ITEM, _item_payload("new"))}
+        END
+    """)
+    # BEFORE: depois da exclusão o uid já não aponta para o item (ON DELETE SET NULL).
+    conn.execute(f"""
+        CREATE TRIGGER change_log_uniforms_bd BEFORE DELETE ON uniforms WHEN {_LOCAL_CHANGE} BEGIN
+            {_log_change(CHANGE_DELETE, f"json_object('item', {_item_uid('old.id')})")}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER change_log_stock_movements_ai AFTER INSERT ON stock_movements WHEN {_LOCAL_CHANGE} BEGIN
+            {_log_change(CHANGE_MOVEMENT, f'''json_object(
+                'item', {_item_uid("new.uniform_id")},
+                'location', (SELECT name FROM {LOCATION_TABLE} WHERE id = new.location_id),
+                'delta', new.delta, 'type', new.movement_type, 'at', new.created_at, 'actor', new.actor)''')}
+        END
+    """)
+
+    for dimension, table in value_tables.items():
+        def payload(op, *fields):
+            return f"json_object('dimension', '{dimension}', 'op', '{op}', {', '.join(fields)})"
+        conn.execute(f"""
+            CREATE TRIGGER change_log_{table}_ai AFTER INSERT ON {table} WHEN {_LOCAL_CHANGE} BEGIN
+                {_log_change(CHANGE_CATALOG, payload("add", "'name', new.name"))}
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER change_log_{table}_au_name AFTER UPDATE OF name ON {table}
+            WHEN old.name <> new.name AND {_LOCAL_CHANGE} BEGIN
+                {_log_change(CHANGE_CATALOG, payload("rename", "'old', old.name", "'name', new.name"))}
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER change_log_{table}_au_position AFTER UPDATE OF position ON {table}
+            WHEN old.position <> new.position AND {_LOCAL_CHANGE} BEGIN
+                {_log_change(CHANGE_CATALOG, payload("move", "'name', new.name", "'position', new.position"))}
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER change_log_{table}_ad AFTER DELETE ON {table} WHEN {_LOCAL_CHANGE} BEGIN
+                {_log_change(CHANGE_CATALOG, payload("delete", "'name', old.name"))}
+            END
+        """)
+
+def _migration_10(conn):
+    """
+    Registro de alterações para sincronizar instalações: identificação do site,
+    uid dos itens, marcas d'água dos pares e os triggers do registro. O que já
+    existe no banco não entra no registro: os sites partem da mesma base (o
+    uniforms.db do pacote) e trocam só o que mudou depois dela.
+
+    stock_balances é refeita sem o CHECK de saldo não negativo: saídas simultâneas
+    do mesmo saldo em dois sites são aplicadas inteiras em ambos (as movimentações
+    precisam comutar), e o saldo negativo fica visível para correção. As gravações
+    locais continuam conferindo o saldo antes de uma saída.
+    """
+    conn.execute("""
+        CREATE TABLE sync_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            site_id TEXT NOT NULL,
+            applying INTEGER NOT NULL DEFAULT 0,
+            copied_from TEXT,
+            copied_seq INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("INSERT INTO sync_state (id, site_id) VALUES (1, lower(hex(randomblob(8))))")
+    # AUTOINCREMENT: um seq nunca é reutilizado, mesmo que o registro seja podado.
+    conn.execute("""
+        CREATE TABLE change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            origin TEXT,
+            origin_seq INTEGER,
+            changed_at INTEGER NOT NULL,
+            entity TEXT NOT NULL,
+            payload TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE UNIQUE INDEX idx_change_log_origin ON change_log (origin, origin_seq) WHERE origin IS NOT NULL
+    """)
+    # Um item pode ter mais de um uid: o mesmo item cadastrado em dois sites antes de
+    # sincronizarem. uniform_id NULL marca um item excluído (lápide).
+    conn.execute("""
+        CREATE TABLE sync_items (
+            uid TEXT PRIMARY KEY,
+            uniform_id INTEGER REFERENCES uniforms (id) ON DELETE SET NULL
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX idx_sync_items_uniform ON sync_items (uniform_id)")
+    # Os itens da base recebem um uid derivado da chave única, igual em todos os
+    # sites que partiram dela; os cadastrados depois, um uid aleatório.
+    conn.executemany("INSERT INTO sync_items (uid, uniform_id) VALUES (?, ?)", [
+        (hashlib.sha1("\x1f".join(key).encode()).hexdigest()[:16], uniform_id)
+        for uniform_id, *key in conn.execute("SELECT id, type, size, model, color FROM uniform_records")
+    ])
+    conn.execute("""
+        CREATE TABLE sync_item_versions (
+            uniform_id INTEGER PRIMARY KEY REFERENCES uniforms (id) ON DELETE CASCADE,
+            changed_at INTEGER NOT NULL,
+            origin TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE sync_peers (
+            site_id TEXT PRIMARY KEY,
+            sent_seq INTEGER NOT NULL DEFAULT 0,
+            received_seq INTEGER NOT NULL DEFAULT 0,
+            synced_at INTEGER
+        )
+    """)
+
+    # Mesma tabela da migração 9, sem o CHECK; a view é recriada sobre a nova tabela.
+    conn.execute("DROP VIEW location_records")
+    conn.execute(f"""
+        CREATE TABLE stock_balances_new (
+            location_id INTEGER NOT NULL REFERENCES {LOCATION_TABLE} (id),
+            uniform_id INTEGER NOT NULL REFERENCES uniforms (id) ON DELETE CASCADE,
+            quantity INTEGER NOT NULL,
+            PRIMARY KEY (location_id, uniform_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("INSERT INTO stock_balances_new SELECT location_id, uniform_id, quantity FROM stock_balances")
+    conn.execute("DROP TABLE stock_balances")
+    conn.execute("ALTER TABLE stock_balances_new RENAME TO stock_balances")
+    conn.execute("CREATE INDEX idx_stock_balances_uniform ON stock_balances (uniform_id)")
+    conn.execute("CREATE INDEX idx_stock_balances_location_quantity ON stock_balances (location_id, quantity)")
+    create_balance_triggers(conn)
+    conn.execute("""
+        CREATE VIEW location_records AS
+        SELECT b.uniform_id AS id, u.name, t.name AS type, s.name AS size, m.name AS model, c.name AS color,
+               b.quantity, u.description, u.sku, u.min_quantity, u.reorder_level,
+               u.type_id, u.size_id, u.model_id, u.color_id, b.location_id, u.quantity AS total_quantity
+        FROM stock_balances AS b
+        JOIN uniforms AS u ON u.id = b.uniform_id
+        LEFT JOIN uniform_types AS t ON t.id = u.type_id
+        LEFT JOIN sizes AS s ON s.id = u.size_id
+        LEFT JOIN models AS m ON m.id = u.model_id
+        LEFT JOIN colors AS c ON c.id = u.color_id
+    """)
+
+    create_change_triggers(conn)
+
+def _migration_11(conn):
+    """
+    Instantâneos periódicos dos saldos por local, para reconstruir o estoque de uma
+    data passada a partir do mais próximo deles e das movimentações entre os dois,
+    sem somar o livro-razão inteiro. Cada instantâneo guarda só os saldos diferentes
+    de zero e o último ID do livro-razão que eles já incluem. Não entram na
+    sincronização: cada site tira os seus.
+
+    maintenance_runs guarda quando cada tarefa de manutenção (backup, instantâneo,
+    ANALYZE, VACUUM) rodou pela última vez, para a execução agendada saber o que
+    está vencido.
+    """
+    conn.execute("""
+        CREATE TABLE stock_snapshots (
+            id INTEGER PRIMARY KEY,
+            taken_at INTEGER NOT NULL,
+            movement_id INTEGER NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX idx_stock_snapshots_movement ON stock_snapshots (movement_id)")
+    conn.execute("""
+        CREATE TABLE stock_snapshot_balances (
+            snapshot_id INTEGER NOT NULL REFERENCES stock_snapshots (id) ON DELETE CASCADE,
+            location_id INTEGER NOT NULL,
+            uniform_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            PRIMARY KEY (snapshot_id, location_id, uniform_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE maintenance_runs (
+            task TEXT PRIMARY KEY,
+            last_run INTEGER NOT NULL,
+            seconds REAL NOT NULL,
+            detail TEXT
+        )
+    """)
+
+def _migration_12(conn):
+    """
+    Hora de origem das movimentações recebidas de outro site. created_at passa a
+    ser a hora em que a movimentação entrou neste banco, para que ela cresça com o
+    ID do livro-razão como nas gravações locais (a busca por data de reorder_alerts
+    depende disso); a hora em que ela aconteceu no outro site fica em origin_at.
+    As recebidas antes desta migração ficam com origin_at nulo: não há como saber
+    quando elas chegaram.
+    """
+    conn.execute("ALTER TABLE stock_movements ADD COLUMN origin_at INTEGER")
+
+# --- Estoque em uma Data ---
+# Uma movimentação conta na data em que aconteceu: a do outro site para as
+# sincronizadas (origin_at), a da gravação para as locais. O livro-razão é
+# indexado por essa data, então o estoque de uma data soma só as movimentações
+# entre ela e o instantâneo mais próximo. Um instantâneo tirado em E guarda os
+# saldos das movimentações de antes de E; o trigger soma a ele as que chegarem
+# atrasadas pela sincronização.
+
+MOVEMENT_TIME = "COALESCE(origin_at, created_at)"  # deve ser repetida literalmente nas consultas
+
+def _migration_13(conn):
+    """
+    Índice do livro-razão pela data das movimentações e instantâneos como cortes
+    por data, em vez de por ID (o ID diz quando a movimentação chegou a este
+    banco, não quando aconteceu). Os instantâneos existentes são refeitos do mais
+    recente ao mais antigo, a partir dos saldos atuais.
+    """
+    conn.execute(f"CREATE INDEX idx_stock_movements_time ON stock_movements ({MOVEMENT_TIME})")
+    conn.execute("CREATE INDEX idx_stock_snapshots_taken ON stock_snapshots (taken_at)")
+
+    later = None  # (id, data) do instantâneo já refeito logo depois dele; None = saldos atuais
+    for snapshot_id, taken_at in conn.execute(
+        "SELECT id, taken_at FROM stock_snapshots ORDER BY taken_at DESC, id DESC"
+    ).fetchall():
+        conn.execute("DELETE FROM stock_snapshot_balances WHERE snapshot_id = ?", (snapshot_id,))
+        if later is None:
+            base, params = "SELECT location_id, uniform_id, quantity FROM stock_balances", [taken_at]
+            window = f"{MOVEMENT_TIME} >= ?"
+        else:
+            base = "SELECT location_id, uniform_id, quantity FROM stock_snapshot_balances WHERE snapshot_id = ?"
+            params = [later[0], taken_at, later[1]]
+            window = f"{MOVEMENT_TIME} >= ? AND {MOVEMENT_TIME} < ?"
+        conn.execute(f"""
+            INSERT INTO stock_snapshot_balances (snapshot_id, location_id, uniform_id, quantity)
+            SELECT ?, location_id, uniform_id, SUM(quantity) FROM (
+                {base}
+                UNION ALL
+                SELECT location_id, uniform_id, -delta FROM stock_movements WHERE {window}
+            ) GROUP BY location_id, uniform_id HAVING SUM(quantity) <> 0
+        """, [snapshot_id, *params])
+        later = (snapshot_id, taken_at)
+
+    conn.execute("""
+        CREATE TRIGGER stock_snapshots_late_movement AFTER INSERT ON stock_movements
+        WHEN COALESCE(new.origin_at, new.created_at) < (SELECT MAX(taken_at) FROM stock_snapshots)
+        BEGIN
+            INSERT INTO stock_snapshot_balances (snapshot_id, location_id, uniform_id, quantity)
+            SELECT id, new.location_id, new.uniform_id, new.delta FROM stock_snapshots
+            WHERE taken_at > COALESCE(new.origin_at, new.created_at)
+            ON CONFLICT (snapshot_id, location_id, uniform_id) DO UPDATE SET quantity = quantity + excluded.quantity;
+        END
+    """)
+
+def _migration_14(conn):
+    """
+    Índice parcial da reposição só com os itens monitorados (ponto de reposição
+    maior que zero), para os bancos em que a migração 8 ainda usava a condição antiga.
+    """
+    conn.execute("DROP INDEX IF EXISTS idx_uniforms_reorder")
+    conn.execute(f"CREATE INDEX idx_uniforms_reorder ON uniforms (quantity) WHERE {REORDER_CONDITION}")
+
+def _migration_15(conn):
+    """
+    Índice do livro-razão por item e data das movimentações: as saídas recentes
+    de cada item da página de reposição são lidas só na janela de consumo.
+    """
+    conn.execute(f"CREATE INDEX idx_stock_movements_uniform_time ON stock_movements (uniform_id, {MOVEMENT_TIME})")
+
+MIGRATIONS = [
+    (1, "tabela uniforms", _migration_1),
+    (2, "livro-razão stock_movements", _migration_2),
+    (3, "índices da listagem", _migration_3),
+    (4, "busca de texto completo uniforms_fts", _migration_4),
+    (5, "resumo do estoque stock_summary", _migration_5),
+    (6, "catálogos com chave inteira", _migration_6),
+    (7, "SKU e chave única dos itens", _migration_7),
+    (8, "níveis de reposição por item", _migration_8),
+    (9, "locais de estoque e saldos por local", _migration_9),
+    (10, "registro de alterações para sincronização", _migration_10),
+    (11, "instantâneos do estoque e registro de manutenção", _migration_11),
+    (12, "hora de origem das movimentações sincronizadas", _migration_12),
+    (13, "estoque em uma data pela data das movimentações", _migration_13),
+    (14, "reposição só dos itens monitorados", _migration_14),
+    (15, "livro-razão por item e data", _migration_15),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+_applied = set()  # arquivos de banco já verificados neste processo
+_applied_lock = threading.Lock()
+
+def get_schema_version(conn):
+    """Retorna a versão do esquema gravada no banco."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(pool, until=None):
+    """
+    Aplica, em ordem, as migrações pendentes (com `until`, só até essa versão).
+    Retorna a versão final do banco.
+    """
+    with pool.connection() as conn:
+        version = get_schema_version(conn)
+    for target, _description, apply in MIGRATIONS:
+        if target <= version:
+            continue
+        if until is not None and target > until:
+            break
+        with pool.transaction() as conn:
+            # Relê dentro da transação: outro processo pode ter migrado antes de nós.
+            if get_schema_version(conn) >= target:
+                continue
+            apply(conn)
+            conn.execute(f"PRAGMA user_version = {target}")
+        version = target
+    return version
+
+def ensure_schema(pool):
+    """Garante o esquema atualizado; após a primeira chamada por arquivo, não faz nada."""
+    key = os.path.abspath(pool.db_path)
+    if key in _applied:
+        return
+    with _applied_lock:
+        if key not in _applied:
+            migrate(pool)
+            _applied.add(key)
@@ -0,0 +1,246 @@
+"""
+Sincronização entre instalações (ex.: o aplicativo desktop de cada unidade) por
+pacotes de alterações, sem copiar o banco inteiro.
+
+Cada banco (site) registra suas alterações em change_log (ver schema.py). Um
+pacote para um par leva as alterações acima da marca d'água dele — inclusive as
+recebidas de terceiros, menos as que vieram do próprio par — e o par as aplica
+com database.apply_changes. Reimportar um pacote não muda nada, e tanto gerar
+quanto aplicar custam proporcionalmente ao número de alterações, não ao tamanho
+do banco. Um pacote que começa depois da última alteração recebida daquele site
+é recusado (faltaria um pacote no meio); gere outro com --since.
+
+Conflitos, resolvidos igualmente em todos os sites:
+- movimentações são deltas somados ao saldo do item no local, em qualquer ordem;
+  saídas simultâneas do mesmo saldo podem deixá-lo negativo (ver `status`);
+- atributos do item: vale a alteração mais recente por (horário, site);
+- a exclusão de um item é definitiva;
+- o mesmo item cadastrado em dois sites (mesma chave única) vira um item só;
+- valores de catálogo e locais são criados quando um item ou movimentação os usa.
+
+Um site novo pode partir de uma cópia do banco de outro: rode `new-site` na
+cópia antes de usá-la, para que ela tenha identificação própria.
+
+O pacote é JSON Lines compactado com gzip: uma linha de cabeçalho
+{"format", "site", "peer", "since", "until", "changes", "copied_from", "copied_seq"}
+e uma linha por alteração, [origem, seq na origem, horário em ms, tipo, dados].
+
+Uso pela linha de comando:
+    python sync.py status [--db uniforms.db]
+    python sync.py export --out para_loja2.jsonl.gz [--peer <site>] [--since 0] [--db uniforms.db]
+    python sync.py import de_loja2.jsonl.gz [--db uniforms.db]
+    python sync.py new-site [--db uniforms.db]
+"""
+import argparse
+import gzip
+import io
+import json
+import sys
+import time
+from datetime import datetime
+
+import database
+from config import DB_NAME
+
+BUNDLE_FORMAT = 1
+BUNDLE_BATCH_SIZE = 5000
+
+# --- Geração do Pacote ---
+
+def iter_changes(since=0, peer=None, batch_size=BUNDLE_BATCH_SIZE, pool=None):
+    """
+    Gera primeiro (último seq, quantidade de alterações) e depois listas de até
+    `batch_size` alterações com seq acima de `since`, exceto as que vieram de
+    `peer`, todas lidas do mesmo instantâneo do banco.
+    """
+    pool = pool if pool is not None else database.get_pool()
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        own_snapshot = not conn.in_transaction
+        if own_snapshot:
+            cursor.execute("BEGIN")
+        try:
+            site = conn.execute("SELECT site_id FROM sync_state").fetchone()[0]
+            until = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+            where = "seq > ? AND seq <= ? AND (origin IS NULL OR origin <> ?)"
+            params = (since, until, peer or "")
+            count = conn.execute(f"SELECT COUNT(*) FROM change_log WHERE {where}", params).fetchone()[0]
+            yield until, count
+            cursor.execute(f"""
+                SELECT COALESCE(origin, ?), COALESCE(origin_seq, seq), changed_at, entity, payload
+                FROM change_log WHERE {where} ORDER BY seq
+            """, (site, *params))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [tuple(row) for row in rows]
+        finally:
+            if own_snapshot:
+                conn.rollback()
+
+def export_bundle(destination, peer=None, since=None, batch_size=BUNDLE_BATCH_SIZE, pool=None):
+    """
+    Grava em `destination` (caminho ou arquivo binário aberto para escrita) o pacote
+    de alterações para o site `peer`, a partir da marca d'água dele ou de `since`.
+    Sem `peer`, exporta tudo desde `since` (0 = o registro inteiro) sem marcar nada
+    como enviado. Retorna o cabeçalho do pacote.
+    """
+    pool = pool if pool is not None else database.get_pool()
+    site = database.site_id(pool=pool)
+    if peer == site:
+        raise database.SyncError("O par informado é este mesmo banco.")
+    if since is None:
+        marks = {p[0]: p[1] for p in database.sync_peers(pool=pool)}
+        since = marks.get(peer, 0)
+    copied_from, copied_seq = database.site_copy(pool=pool)
+    batches = iter_changes(since, peer, batch_size, pool)
+    until, count = next(batches)
+    header = {"format": BUNDLE_FORMAT, "site": site, "peer": peer, "since": since, "until": until,
+              "changes": count, "copied_from": copied_from, "copied_seq": copied_seq}
+
+    def write(binary):
+        with gzip.GzipFile(fileobj=binary, mode="wb") as compressed:
+            stream = io.TextIOWrapper(compressed, encoding="utf-8", newline="\n")
+            stream.write(json.dumps(header) + "\n")
+            for rows in batches:
+                # Os dados já estão em JSON no banco: entram no pacote sem serem relidos.
+                stream.writelines(
+                    f"[{json.dumps(origin)},{origin_seq},{changed_at},{json.dumps(entity)},{payload}]\n"
+                    for origin, origin_seq, changed_at, entity, payload in rows
+                )
+            stream.flush()
+            stream.detach()  # o GzipFile (e o chamador) continuam donos dos arquivos
+
+    if isinstance(destination, str):
+        with open(destination, "wb") as f:
+            write(f)
+    else:
+        write(destination)
+    if peer:
+        database.record_peer_sync(peer, sent_seq=until, pool=pool)
+    return header
+
+# --- Aplicação do Pacote ---
+
+def _read_header(stream):
+    try:
+        header = json.loads(stream.readline() or "null")
+    except (OSError, ValueError):
+        raise database.SyncError("O arquivo não é um pacote de sincronização.") from None
+    if not isinstance(header, dict) or header.get("format") != BUNDLE_FORMAT:
+        raise database.SyncError("Formato de pacote de sincronização não suportado.")
+    return header
+
+def import_bundle(source, batch_size=BUNDLE_BATCH_SIZE, pool=None, progress=None):
+    """
+    Aplica o pacote `source` (caminho ou arquivo binário) em blocos de `batch_size`
+    alterações, cada um em sua transação; interrompido, pode ser reimportado.
+    `progress`, se informado, recebe o total de alterações lidas após cada bloco.
+    Retorna {"site", "changes", "applied", "skipped", "conflicts", "seconds"}.
+    """
+    started = time.perf_counter()
+    pool = pool if pool is not None else database.get_pool()
+    site = database.site_id(pool=pool)
+    with gzip.open(source, "rt", encoding="utf-8") as stream:
+        header = _read_header(stream)
+        sender = header["site"]
+        if sender == site:
+            raise database.SyncError(
+                "O pacote foi gerado por este mesmo banco (ou por uma cópia dele: use `sync.py new-site` na cópia)."
+            )
+        if header["peer"] not in (None, site):
+            raise database.SyncError(f"O pacote foi gerado para o site {header['peer']}, não para este ({site}).")
+        received = {p[0]: p[2] for p in database.sync_peers(pool=pool)}.get(sender, 0)
+        if header["copied_from"] == site:
+            received = max(received, header["copied_seq"])  # a cópia começou com o nosso registro
+        if header["since"] > received:
+            raise database.SyncError(
+                f"Faltam alterações do site {sender} entre {received} e {header['since']}: "
+                f"gere o pacote com --since {received}."
+            )
+
+        report = {"site": sender, "changes": 0, "applied": 0, "skipped": 0, "conflicts": []}
+        batch = []
+        for line in stream:
+            batch.append(json.loads(line))
+            if len(batch) >= batch_size:
+                _apply_batch(batch, report, pool, progress)
+                batch = []
+        if batch:
+            _apply_batch(batch, report, pool, progress)
+    database.record_peer_sync(sender, received_seq=header["until"], pool=pool)
+    report["seconds"] = time.perf_counter() - started
+    return report
+
+def _apply_batch(batch, report, pool, progress):
+    result = database.apply_changes(batch, pool=pool)
+    report["changes"] += len(batch)
+    report["applied"] += result["applied"]
+    report["skipped"] += result["skipped"]
+    report["conflicts"].extend(result["conflicts"])
+    if progress:
+        progress(report["changes"])
+
+# --- Linha de Comando ---
+
+def status(args, pool):
+    print(f"Este site: {database.site_id(pool=pool)}")
+    for peer, sent, received, synced_at, pending in database.sync_peers(pool=pool):
+        when = datetime.fromtimestamp(synced_at).strftime("%d/%m/%Y %H:%M") if synced_at else "-"
+        print(f"  par {peer}: enviado até {sent} ({pending} pendentes), recebido até {received}, em {when}")
+    negatives = database.select_negative_balances(pool=pool)
+    for uniform_id, location, quantity in negatives:
+        print(f"  saldo negativo: item {uniform_id} em '{location}': {quantity}")
+    return 1 if negatives else 0
+
+def export_command(args, pool):
+    destination = sys.stdout.buffer if args.out == "-" else args.out
+    header = export_bundle(destination, args.peer, args.since, pool=pool)
+    print(f"{header['changes']} alterações exportadas (seq {header['since']} a {header['until']}).",
+          file=sys.stderr)
+    return 0
+
+def import_command(args, pool):
+    report = import_bundle(args.file, pool=pool,
+                           progress=lambda n: print(f"{n} alterações lidas...", file=sys.stderr))
+    print(f"Site {report['site']}: {report['changes']} alterações | aplicadas: {report['applied']} | "
+          f"já existentes: {report['skipped']} | conflitos: {len(report['conflicts'])} | "
+          f"{report['seconds']:.1f}s")
+    for conflict in report["conflicts"]:
+        print(f"  {conflict}")
+    return 0
+
+def new_site(args, pool):
+    old_site = database.site_id(pool=pool)
+    print(f"Nova identificação do site: {database.reset_site_id(pool=pool)} (cópia de {old_site})")
+    return 0
+
+COMMANDS = {
+    "status": status,
+    "export": export_command,
+    "import": import_command,
+    "new-site": new_site,
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sincroniza bancos de estoque por pacotes de alterações.")
+    parser.add_argument("command", choices=list(COMMANDS))
+    parser.add_argument("file", nargs="?", help="import: pacote a aplicar")
+    parser.add_argument("--out", help="export: arquivo do pacote ('-' para a saída padrão)")
+    parser.add_argument("--peer", help="export: site de destino (usa e avança a marca d'água dele)")
+    parser.add_argument("--since", type=int, help="export: envia a partir deste seq em vez da marca d'água")
+    parser.add_argument("--db", default=DB_NAME, help="Arquivo do banco SQLite")
+    args = parser.parse_args(argv)
+    if args.command == "export" and not args.out:
+        parser.error("export exige --out")
+    if args.command == "import" and not args.file:
+        parser.error("import exige o arquivo do pacote")
+    try:
+        return COMMANDS[args.command](args, database.get_pool(args.db))
+    except database.SyncError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""
+Migrações (schema.py) sobre um banco no formato anterior a elas, como o
+uniforms.db distribuído: IDs, quantidades e o próximo ID são preservados e o
+banco termina na versão atual do esquema.
+"""
+import sqlite3
+
+import database
+import schema
+
+BASELINE_SCHEMA = """
+    CREATE TABLE uniforms (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,
+        type TEXT NOT NULL,
+        size TEXT NOT NULL,
+        model TEXT NOT NULL,
+        color TEXT NOT NULL,
+        quantity INTEGER NOT NULL,
+        description TEXT
+    )
+"""
+
+def _baseline(path):
+    conn = sqlite3.connect(path)
+    conn.execute(BASELINE_SCHEMA)
+    conn.executemany(
+        "INSERT INTO uniforms (id, name, type, size, model, color, quantity, description) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (1, "Polo azul", "Masculino", "M", "Polo", "Azul", 7, "manga curta"),
+            (2, "Camisa verde", "Feminino", "G", "Polo", "Verde", 4, ""),  # cor fora do catálogo inicial
+            (3, "Excluído", "Feminino", "P", "Polo", "Azul", 1, ""),
+            (4, "", "Masculino", "M", "Polo", "Azul", 3, "duplicado do 1"),
+        ],
+    )
+    conn.execute("DELETE FROM uniforms WHERE id = 3")
+    conn.commit()
+    conn.close()
+
+def test_baseline_database_is_migrated_in_place(tmp_path):
+    path = str(tmp_path / "uniforms.db")
+    _baseline(path)
+    pool = database.get_pool(path)
+
+    with pool.connection() as conn:
+        assert schema.get_schema_version(conn) == schema.SCHEMA_VERSION >= 13
+        assert conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'uniforms'").fetchone()[0] == 4
+        ledger = dict(conn.execute("SELECT uniform_id, SUM(delta) FROM stock_movements GROUP BY uniform_id"))
+
+    polo, camisa = database.select_uniform_by_id(1, pool=pool), database.select_uniform_by_id(2, pool=pool)
+    assert (polo.name, polo.quantity, polo.description) == ("Polo azul", 10, "manga curta")  # 4 fundido no 1
+    assert (camisa.type, camisa.size, camisa.color, camisa.quantity) == ("Feminino", "G", "Verde", 4)
+    assert database.select_uniform_by_id(4, pool=pool) is None
+    assert {uniform_id: quantity for uniform_id, quantity in ledger.items() if quantity} == {1: 10, 2: 4}
+    assert database.select_balances([1, 2], location=database.get_catalog(pool).names[database.LOCATION][0],
+                                    pool=pool) == {1: 10, 2: 4}
+    assert database.check_stock_summary(pool=pool) == []
+    assert (polo.reorder_level, database.count_reorder_alerts(pool=pool)) == (None, 0)  # ninguém monitorado ainda
+
+    # O próximo ID continua depois dos já excluídos, que seguem no livro-razão.
+    assert database.insert_uniform("Polo preta", "Masculino", "P", "Polo", "Preta", 1, "", pool=pool) == 5
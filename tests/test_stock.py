@@ -0,0 +1,73 @@
+"""
+Movimentações de estoque (apply_movement e move_stock_batch): uma saída maior que
+o saldo não grava nada, saídas simultâneas não deixam o saldo negativo e um lote
+com uma linha inválida é rejeitado inteiro.
+"""
+import threading
+
+import pytest
+
+import database
+
+def _ledger(pool, uniform_id):
+    with pool.connection() as conn:
+        return tuple(conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(delta), 0) FROM stock_movements WHERE uniform_id = ?", (uniform_id,)
+        ).fetchone())
+
+def test_withdrawal_above_stock_changes_nothing(tmp_path):
+    pool = database.get_pool(str(tmp_path / "estoque.db"))
+    polo = database.insert_uniform("Polo", "Masculino", "M", "Polo", "Azul", 5, "", pool=pool)
+    ledger = _ledger(pool, polo)
+
+    with pytest.raises(database.InsufficientStockError) as error:
+        database.move_stock(polo, database.MOVEMENT_OUT, 6, pool=pool)
+    assert (error.value.available, error.value.requested) == (5, 6)
+    assert database.select_uniform_by_id(polo, pool=pool).quantity == 5
+    assert _ledger(pool, polo) == ledger == (1, 5)
+
+def test_concurrent_withdrawals_never_go_below_zero(tmp_path):
+    pool = database.get_pool(str(tmp_path / "estoque.db"))
+    polo = database.insert_uniform("Polo", "Masculino", "M", "Polo", "Azul", 10, "", pool=pool)
+    start = threading.Barrier(8)
+    done, refused = [], []
+
+    def withdraw():
+        start.wait()
+        for _ in range(5):
+            try:
+                database.move_stock(polo, database.MOVEMENT_OUT, 1, pool=pool)
+                done.append(1)
+            except database.InsufficientStockError:
+                refused.append(1)
+
+    threads = [threading.Thread(target=withdraw) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert (len(done), len(refused)) == (10, 30)
+    assert database.select_uniform_by_id(polo, pool=pool).quantity == 0
+    assert _ledger(pool, polo) == (11, 0)
+    assert database.check_stock_summary(pool=pool) == []
+
+def test_batch_with_one_bad_line_writes_nothing(tmp_path):
+    pool = database.get_pool(str(tmp_path / "estoque.db"))
+    polo = database.insert_uniform("Polo", "Masculino", "M", "Polo", "Azul", 5, "", pool=pool)
+    camisa = database.insert_uniform("Camisa", "Feminino", "P", "Polo", "Preta", 2, "", pool=pool)
+    lines = [
+        (polo, database.MOVEMENT_OUT, 3),
+        (camisa, database.MOVEMENT_IN, 4),
+        (camisa, database.MOVEMENT_OUT, 7),  # só há 6 depois da entrada acima
+    ]
+    ledgers = [_ledger(pool, polo), _ledger(pool, camisa)]
+
+    with pytest.raises(database.BatchValidationError) as error:
+        database.move_stock_batch(lines, pool=pool)
+    assert [problem[:2] for problem in error.value.problems] == [(2, camisa)]
+    assert database.select_balances([polo, camisa], pool=pool) == {polo: 5, camisa: 2}
+    assert [_ledger(pool, polo), _ledger(pool, camisa)] == ledgers
+
+    assert database.move_stock_batch(lines[:2], pool=pool) == {polo: 2, camisa: 6}
+    assert _ledger(pool, camisa) == (2, 6)
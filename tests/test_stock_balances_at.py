@@ -0,0 +1,81 @@
+"""
+Estoque em uma data com movimentações locais e sincronizadas: as recebidas de
+outro site contam na data em que aconteceram lá, mesmo chegando depois das locais
+e depois de um instantâneo já tirado.
+"""
+import json
+import time
+
+import database
+import sync
+
+DAY = 86400
+
+def _changes(pool, dated):
+    """Alterações registradas em `pool`, com a data das movimentações trocada pela de `dated` (delta: data)."""
+    changes = []
+    for batch in list(sync.iter_changes(pool=pool))[1:]:
+        for origin, origin_seq, changed_at, entity, payload in batch:
+            data = json.loads(payload)
+            if entity == "movement":
+                data["at"] = dated[data["delta"]]
+            changes.append((origin, origin_seq, changed_at, entity, json.dumps(data)))
+    return changes
+
+def _expected(pool, uniform_id, timestamp):
+    with pool.connection() as conn:
+        return conn.execute(
+            "SELECT SUM(delta) FROM stock_movements WHERE uniform_id = ? AND COALESCE(origin_at, created_at) < ?",
+            (uniform_id, timestamp),
+        ).fetchone()[0] or 0
+
+def _balance_at(pool, uniform_id, timestamp):
+    return sum(row[4] for row in database.stock_balances_at(timestamp, pool=pool) if row[0] == uniform_id)
+
+def test_synced_movements_count_at_their_own_date(tmp_path):
+    now = int(time.time())
+    remote = database.get_pool(str(tmp_path / "remoto.db"))
+    local = database.get_pool(str(tmp_path / "local.db"))
+
+    # O item nasce no outro site e chega aqui pela sincronização.
+    database.insert_uniform("Polo teste", "Masculino", "M", "Polo", "Azul", 0, "", sku="POLO-T", pool=remote)
+    database.apply_changes(_changes(remote, {}), pool=local)
+    uniform_id = database.select_uniform_by_sku("POLO-T", pool=local).id
+
+    # Entrada local de 100 há 10 dias, seguida de um instantâneo de 5 dias atrás.
+    database.move_stock(uniform_id, database.MOVEMENT_IN, 100, pool=local)
+    with local.transaction() as conn:
+        conn.execute("UPDATE stock_movements SET created_at = ?", (now - 10 * DAY,))
+    database.take_stock_snapshot(pool=local)
+    with local.transaction() as conn:
+        conn.execute("UPDATE stock_snapshots SET taken_at = ?", (now - 5 * DAY,))
+
+    # Do outro site chegam agora uma entrada de 50 de 7 dias atrás e uma saída de 20 de 2 dias atrás.
+    remote_id = database.select_uniform_by_sku("POLO-T", pool=remote).id
+    database.move_stock(remote_id, database.MOVEMENT_IN, 50, pool=remote)
+    database.move_stock(remote_id, database.MOVEMENT_OUT, 20, pool=remote)
+    database.apply_changes(_changes(remote, {50: now - 7 * DAY, -20: now - 2 * DAY}), pool=local)
+    database.move_stock(uniform_id, database.MOVEMENT_OUT, 10, pool=local)
+
+    expected = {-8: 100, -6: 150, -4: 150, -1: 130, 1: 120}  # dias a partir de agora: saldo
+    for days, quantity in expected.items():
+        assert _expected(local, uniform_id, now + days * DAY) == quantity
+        assert _balance_at(local, uniform_id, now + days * DAY) == quantity, f"{days} dias"
+
+    # Um instantâneo novo parte dos saldos atuais e dá os mesmos resultados.
+    database.take_stock_snapshot(pool=local)
+    for days, quantity in expected.items():
+        assert _balance_at(local, uniform_id, now + days * DAY) == quantity
+
+def test_synced_movements_keep_ids_growing_with_created_at(tmp_path):
+    remote = database.get_pool(str(tmp_path / "remoto.db"))
+    local = database.get_pool(str(tmp_path / "local.db"))
+    database.insert_uniform("Polo teste", "Masculino", "M", "Polo", "Azul", 5, "", sku="POLO-T", pool=remote)
+    database.apply_changes(_changes(remote, {5: int(time.time()) - 30 * DAY}), pool=local)
+
+    with local.connection() as conn:
+        created_at, origin_at = conn.execute(
+            "SELECT created_at, origin_at FROM stock_movements ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+    assert origin_at < created_at - 29 * DAY
+    assert created_at >= int(time.time()) - 60
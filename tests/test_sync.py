@@ -0,0 +1,87 @@
+"""
+Sincronização entre dois bancos locais por pacotes (sync.py): os saldos convergem,
+reimportar um pacote não muda nada, um pacote fora de ordem é recusado e edições
+simultâneas do mesmo item terminam iguais nos dois sites.
+"""
+import time
+
+import pytest
+
+import database
+import sync
+
+def _sites(tmp_path):
+    return database.get_pool(str(tmp_path / "loja1.db")), database.get_pool(str(tmp_path / "loja2.db"))
+
+def _send(source, target, path):
+    """Gera o pacote de `source` para `target` e o aplica em `target`."""
+    sync.export_bundle(str(path), peer=database.site_id(pool=target), pool=source)
+    return sync.import_bundle(str(path), pool=target)
+
+def _state(pool):
+    with pool.connection() as conn:
+        return sorted(tuple(row) for row in conn.execute("""
+            SELECT u.sku, u.name, l.name, b.quantity FROM stock_balances AS b
+            JOIN uniforms AS u ON u.id = b.uniform_id
+            JOIN locations AS l ON l.id = b.location_id
+        """))
+
+def test_bundles_converge_and_reimport_changes_nothing(tmp_path):
+    first, second = _sites(tmp_path)
+    polo = database.insert_uniform("Polo", "Masculino", "M", "Polo", "Azul", 10, "", sku="P1", pool=first)
+    database.move_stock(polo, database.MOVEMENT_OUT, 3, pool=first)
+    database.insert_uniform("Luva", "Feminino", "P", "Luva", "Preta", 5, "", sku="L1", pool=second)
+
+    _send(first, second, tmp_path / "1para2.gz")
+    _send(second, first, tmp_path / "2para1.gz")
+    state = _state(first)
+    assert state == _state(second)
+    assert ("P1", "Polo", "Depósito Principal", 7) in state and ("L1", "Luva", "Depósito Principal", 5) in state
+
+    # Movimentações dos dois lados no mesmo item somam nos dois sites.
+    database.move_stock(database.select_uniform_by_sku("P1", pool=second).id, database.MOVEMENT_OUT, 2,
+                        pool=second)
+    database.move_stock(polo, database.MOVEMENT_IN, 4, pool=first)
+    _send(first, second, tmp_path / "1para2b.gz")
+    _send(second, first, tmp_path / "2para1b.gz")
+    assert _state(first) == _state(second)
+    assert database.select_uniform_by_sku("P1", pool=first).quantity == 9
+
+    report = sync.import_bundle(str(tmp_path / "1para2b.gz"), pool=second)
+    assert report["applied"] == 0 and report["skipped"] == report["changes"] > 0
+    assert _state(first) == _state(second)
+
+def test_bundle_after_a_missing_one_is_refused(tmp_path):
+    first, second = _sites(tmp_path)
+    peer = database.site_id(pool=second)
+    database.insert_uniform("Polo", "Masculino", "M", "Polo", "Azul", 10, "", sku="P1", pool=first)
+    missing = sync.export_bundle(str(tmp_path / "perdido.gz"), peer=peer, pool=first)
+    database.move_stock(database.select_uniform_by_sku("P1", pool=first).id, database.MOVEMENT_OUT, 4, pool=first)
+    later = sync.export_bundle(str(tmp_path / "seguinte.gz"), peer=peer, pool=first)
+    assert later["since"] == missing["until"]  # parte do que já foi enviado (sent_seq)
+
+    with pytest.raises(database.SyncError, match="Faltam alterações"):
+        sync.import_bundle(str(tmp_path / "seguinte.gz"), pool=second)
+    assert database.select_uniform_by_sku("P1", pool=second) is None
+
+    sync.import_bundle(str(tmp_path / "perdido.gz"), pool=second)
+    sync.import_bundle(str(tmp_path / "seguinte.gz"), pool=second)
+    assert database.select_uniform_by_sku("P1", pool=second).quantity == 6
+
+def test_concurrent_edits_end_the_same_on_both_sites(tmp_path):
+    first, second = _sites(tmp_path)
+    polo = database.insert_uniform("Polo", "Masculino", "M", "Polo", "Azul", 10, "", sku="P1", pool=first)
+    _send(first, second, tmp_path / "base.gz")
+    remote = database.select_uniform_by_sku("P1", pool=second).id
+
+    # Os dois sites editam o mesmo item antes de trocar pacotes; a edição mais recente vale.
+    database.update_uniform(polo, "Polo da loja 1", "Masculino", "M", "Polo", "Azul", "primeira", pool=first)
+    time.sleep(0.01)
+    database.update_uniform(remote, "Polo da loja 2", "Masculino", "M", "Polo", "Azul", "segunda", pool=second)
+    _send(first, second, tmp_path / "1para2.gz")
+    _send(second, first, tmp_path / "2para1.gz")
+
+    for pool in (first, second):
+        uniform = database.select_uniform_by_sku("P1", pool=pool)
+        assert (uniform.name, uniform.description) == ("Polo da loja 2", "segunda")
+    assert _state(first) == _state(second)
@@ -0,0 +1,92 @@
+"""
+Fila única de escrita (writer.py): um pedido que falha é desfeito sozinho dentro
+do grupo, os resultados só saem depois do COMMIT e a fila cheia recusa pedidos.
+"""
+import threading
+
+import pytest
+
+import database
+from writer import WriteQueue, WriteQueueFullError
+
+def _setup(tmp_path, **options):
+    pool = database.get_pool(str(tmp_path / "fila.db"))
+    with pool.transaction() as conn:
+        conn.execute("CREATE TABLE notes (value TEXT)")
+    return pool, WriteQueue(pool, **options)
+
+def _insert(pool, value):
+    with pool.transaction() as conn:
+        conn.execute("INSERT INTO notes (value) VALUES (?)", (value,))
+    return value
+
+def _insert_and_fail(pool, value):
+    _insert(pool, value)
+    raise database.StockError(f"{value} recusado")
+
+def _wait(started, release):
+    started.set()
+    assert release.wait(5)
+
+def _notes(pool):
+    with pool.connection() as conn:
+        return sorted(row[0] for row in conn.execute("SELECT value FROM notes"))
+
+def _hold(writer):
+    """Ocupa a thread escritora até o evento devolvido ser sinalizado; os próximos pedidos formam um grupo."""
+    started, release = threading.Event(), threading.Event()
+    future = writer.submit(_wait, started, release)
+    assert started.wait(5)
+    return release, future
+
+def test_failed_request_is_undone_alone_in_its_group(tmp_path):
+    pool, writer = _setup(tmp_path)
+    release, held = _hold(writer)
+    futures = [writer.submit(_insert, pool, "a"), writer.submit(_insert_and_fail, pool, "b"),
+               writer.submit(_insert, pool, "c")]
+    release.set()
+    held.result(5)
+
+    assert futures[0].result(5) == "a" and futures[2].result(5) == "c"
+    with pytest.raises(database.StockError, match="b recusado"):
+        futures[1].result(5)
+    assert _notes(pool) == ["a", "c"]
+
+def test_results_are_returned_only_after_commit(tmp_path):
+    pool, writer = _setup(tmp_path)
+    release, held = _hold(writer)
+    written = writer.submit(_insert, pool, "a")
+    started, finish = threading.Event(), threading.Event()
+    writer.submit(_wait, started, finish)  # mesmo grupo, depois do "a": segura o COMMIT
+    release.set()
+
+    assert started.wait(5)
+    assert not written.done()
+    assert _notes(pool) == []  # ainda não confirmado para as outras conexões
+    finish.set()
+    assert written.result(5) == "a"
+    assert _notes(pool) == ["a"]
+
+def test_full_queue_refuses_new_requests(tmp_path):
+    pool, writer = _setup(tmp_path, max_pending=1, timeout=0.05)
+    release, held = _hold(writer)
+    queued = writer.submit(_insert, pool, "a")
+
+    with pytest.raises(WriteQueueFullError):
+        writer.submit(_insert, pool, "b")
+    release.set()
+    assert queued.result(5) == "a"
+    assert _notes(pool) == ["a"]
+
+def test_exclusive_request_runs_alone_between_groups(tmp_path):
+    pool, writer = _setup(tmp_path)
+    release, held = _hold(writer)
+    writer.submit(_insert, pool, "a")
+    alone = writer.submit_exclusive(lambda: (pool.in_transaction(), _notes(pool)))
+    after = writer.submit(_insert, pool, "b")
+    release.set()
+
+    assert alone.result(5) == (False, ["a"])  # sem transação aberta, depois do pedido anterior
+    assert after.result(5) == "b"
+    assert _notes(pool) == ["a", "b"]
+    assert database.vacuum_database(pool=pool)[1] > 0
@@ -0,0 +1,137 @@
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+import metrics
+from config import WRITE_BATCH_SIZE, WRITE_QUEUE_SIZE, WRITE_QUEUE_TIMEOUT
+
+# --- Fila Única de Escrita ---
+
+class WriteQueueFullError(sqlite3.OperationalError):
+    """A fila de escrita ficou cheia por mais tempo que o permitido (sistema sobrecarregado)."""
+
+class WriteQueue:
+    """
+    Uma única thread aplica todas as escritas de um pool.
+
+    As sessões enfileiram a chamada e esperam o resultado em um Future. A thread
+    escritora pega tudo o que estiver na fila (até `max_batch` pedidos) e aplica
+    em UMA transação, com um SAVEPOINT por pedido: um pedido que falha (ex.:
+    estoque insuficiente) é desfeito sozinho e os demais seguem para o mesmo
+    COMMIT. Assim não há disputa pelo lock do SQLite entre sessões e o custo do
+    commit é dividido pelo grupo.
+    """
+
+    def __init__(self, pool, max_pending=WRITE_QUEUE_SIZE, max_batch=WRITE_BATCH_SIZE,
+                 timeout=WRITE_QUEUE_TIMEOUT):
+        self.pool = pool
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self._queue = queue.Queue(maxsize=max_pending)  # limite = contrapressão
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def on_writer_thread(self):
+        return threading.current_thread() is self._thread
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name="estoque-writer", daemon=True)
+                    self._thread.start()
+
+    def _put(self, func, args, kwargs, exclusive):
+        self._ensure_started()
+        future = Future()
+        try:
+            self._queue.put((func, args, kwargs, future, time.perf_counter(), exclusive), timeout=self.timeout)
+        except queue.Full:
+            raise WriteQueueFullError(
+                "Muitas gravações pendentes; tente novamente em alguns segundos."
+            ) from None
+        return future
+
+    def submit(self, func, *args, **kwargs):
+        """Enfileira `func(*args, **kwargs)` e retorna um Future com o resultado."""
+        return self._put(func, args, kwargs, False)
+
+    def submit_exclusive(self, func, *args, **kwargs):
+        """
+        Enfileira uma operação que não pode rodar dentro de uma transação (ex.:
+        VACUUM). A thread escritora grava antes os pedidos que estavam na fila à
+        frente dela e a roda sozinha, fora do grupo; os pedidos seguintes esperam.
+        """
+        return self._put(func, args, kwargs, True)
+
+    def run(self, func, *args, **kwargs):
+        """Enfileira e espera: devolve o resultado ou levanta a exceção do pedido."""
+        return self.submit(func, *args, **kwargs).result()
+
+    def run_exclusive(self, func, *args, **kwargs):
+        """Como run(), para uma operação exclusiva (ver submit_exclusive)."""
+        return self.submit_exclusive(func, *args, **kwargs).result()
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch and not batch[-1][5]:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            exclusive = batch.pop() if batch[-1][5] else None
+            if batch:
+                self._apply(batch)
+            if exclusive is not None:
+                self._apply_alone(exclusive)
+
+    def _apply_alone(self, request):
+        """Roda o pedido exclusivo sem transação aberta; nada mais grava enquanto ele roda."""
+        func, args, kwargs, future, queued_at, _ = request
+        if not future.set_running_or_notify_cancel():
+            return
+        metrics.REGISTRY.add_queue_wait(time.perf_counter() - queued_at)
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    def _apply(self, batch):
+        started = time.perf_counter()
+        outcomes = []
+        try:
+            with self.pool.transaction():
+                for func, args, kwargs, future, queued_at, _ in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    # Fila, BEGIN do grupo e pedidos anteriores: a espera deste pedido pela vez de gravar.
+                    metrics.REGISTRY.add_queue_wait(time.perf_counter() - queued_at)
+                    try:
+                        with self.pool.transaction():  # SAVEPOINT deste pedido
+                            outcomes.append((future, func(*args, **kwargs), None))
+                    except Exception as e:
+                        outcomes.append((future, None, e))
+        except Exception as e:
+            # A transação do grupo falhou (BEGIN ou COMMIT): nenhum pedido foi gravado.
+            errors = {id(future): error for future, _, error in outcomes if error is not None}
+            for _, _, _, future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(errors.get(id(future), e))
+            return
+        finally:
+            metrics.REGISTRY.observe("writer", "group_commit", (time.perf_counter() - started) * 1000,
+                                     rows=len(batch))
+        # Só responde depois do COMMIT, para quem espera ver a gravação já durável.
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)